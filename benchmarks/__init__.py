@@ -0,0 +1 @@
+"""Benchmarks for the myenergi API client which run offline using the example responses."""
@@ -0,0 +1,132 @@
+#!/usr/bin/env python3
+"""Benchmark the API client end to end with the HTTP layer answered from the example responses.
+
+Times the construction of the client, the parsing of the device status, the minute and hour history, the daily
+totals and the commands which change a Zappi. No network is used, so the times are the work done by the client
+for each call: decoding the json and building the dataclasses, plus the overhead of the request layer.
+
+Each benchmark makes a fixed number of calls with the same responses and the best of five runs is kept, so
+repeated runs on the same machine give close results. The results can be saved as a baseline and later runs
+compared with it to catch regressions in the parsing hot paths:
+
+    python -m benchmarks.bench_api --save
+    python -m benchmarks.bench_api --compare
+
+The comparison fails if any benchmark is more than the tolerance slower than the baseline. Baselines are only
+comparable on the same machine and Python version, which are recorded with them.
+"""
+
+import argparse
+import json
+import pathlib
+import platform
+import sys
+from itertools import cycle
+
+import myenergi
+import myenergi.confirm
+from myenergi.const import MyenergiType
+
+from benchmarks.fixtures import report
+from tests.fakehub import EDDI_SERIAL, SERIAL, ZAPPI_SERIAL, FakeHub, offline_api, offline_sessions
+
+BASELINE = pathlib.Path(__file__).parent / "baseline.json"
+# How much slower than the baseline a benchmark can be before the comparison fails
+TOLERANCE = 1.5
+
+
+def construct() -> None:
+    """Create a client, which finds the server and reads the status and boost times of every device."""
+    myenergi.API(SERIAL, "password").close()
+
+
+def benchmarks(api: myenergi.API) -> list:
+    """Return the name, function and number of calls for each benchmark using a client.
+
+    Args:
+        api (API): A client talking to a FakeSession
+    """
+    status = FakeHub(eddis=(EDDI_SERIAL,)).status
+    modes = cycle(["FAST", "ECO"])
+    percentages = cycle([50, 60])
+    return [
+        ("API construction", construct, 200),
+        ("_parse_api_results status", lambda: [api._parse_api_results(entry) for entry in status], 2000),
+        ("refresh_devices", api.refresh_devices, 1000),
+        ("refresh_status zappi", lambda: api.refresh_status(MyenergiType.ZAPPI, ZAPPI_SERIAL), 1000),
+        ("get_zappi_history minute", lambda: api.get_zappi_history(ZAPPI_SERIAL, myenergi.History.MINUTE,
+                                                                   "2021-03-25"), 20),
+        ("get_zappi_history hour", lambda: api.get_zappi_history(ZAPPI_SERIAL, myenergi.History.HOUR,
+                                                                 "2021-03-25"), 200),
+        ("get_zappi_daily_total 7 days", lambda: api.get_zappi_daily_total(ZAPPI_SERIAL, "2021-03-25", 7), 20),
+        ("set_zappi_mode", lambda: api.set_zappi_mode(ZAPPI_SERIAL, next(modes)), 200),
+        ("set_zappi_minimum_green_limit",
+         lambda: api.set_zappi_minimum_green_limit(ZAPPI_SERIAL, next(percentages)), 200),
+        ("set_zappi_boost stop", lambda: api.set_zappi_boost(ZAPPI_SERIAL, "STOP"), 1000),
+    ]
+
+
+def run() -> dict:
+    """Run every benchmark and return the best time per call in microseconds keyed by name."""
+    results = {}
+    with offline_api(FakeHub(eddis=(EDDI_SERIAL,))) as api, offline_sessions(eddis=(EDDI_SERIAL,)):
+        # Confirm changes without waiting between polls
+        api._confirmations = myenergi.confirm.ConfirmationEngine(api, initial_delay=0, workers=1)
+        for name, function, number in benchmarks(api):
+            results[name] = report(name, function, number, unit="us")
+    return results
+
+
+def environment() -> dict:
+    """Return the details of the machine and Python version the benchmarks ran on."""
+    return {"python": platform.python_version(), "machine": platform.machine(), "system": platform.system(),
+            "processor": platform.processor()}
+
+
+def compare(results: dict, baseline: dict, tolerance: float) -> list:
+    """Print the change from the baseline for each benchmark and return the names of those which regressed.
+
+    Args:
+        results (dict): The times from this run
+        baseline (dict): The saved baseline
+        tolerance (float): How much slower than the baseline a benchmark can be
+    """
+    if baseline["environment"] != environment():
+        print(f"Baseline was recorded on {baseline['environment']}, comparison may not be meaningful")
+    regressions = []
+    for name, elapsed in results.items():
+        before = baseline["results"].get(name)
+        if before is None:
+            print(f"{name:<45} no baseline")
+            continue
+        ratio = elapsed / before
+        print(f"{name:<45} {ratio:10.2f} x baseline")
+        if ratio > tolerance:
+            regressions.append(name)
+    return regressions
+
+
+def main() -> None:
+    """Run the benchmarks and save or compare with the baseline."""
+    parser = argparse.ArgumentParser(description="Benchmark the myenergi API client offline")
+    parser.add_argument("--save", action="store_true", help="save the results as the baseline")
+    parser.add_argument("--compare", action="store_true", help="compare the results with the baseline")
+    parser.add_argument("--tolerance", type=float, default=TOLERANCE,
+                        help="how much slower than the baseline a benchmark can be")
+    parser.add_argument("--baseline", type=pathlib.Path, default=BASELINE, help="the baseline file")
+    args = parser.parse_args()
+    results = run()
+    if args.save:
+        with open(args.baseline, "w") as file:
+            json.dump({"environment": environment(), "results": results}, file, indent=2)
+        print(f"Saved baseline to {args.baseline}")
+    if args.compare:
+        with open(args.baseline) as file:
+            regressions = compare(results, json.load(file), args.tolerance)
+        if regressions:
+            print(f"Slower than the baseline by more than {args.tolerance}x: {', '.join(regressions)}")
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,56 @@
+#!/usr/bin/env python3
+"""Benchmark the parsing of the example minute history.
+
+Compares building the timestamp for each record from a string with strptime, as was done previously,
+with building it directly from the integer fields, and times parsing the whole day into minute_data.
+
+Run from the top of the repository with: python -m benchmarks.bench_history
+"""
+
+from datetime import datetime, timedelta, timezone
+
+import myenergi.const
+
+from benchmarks.fixtures import report
+from tests.fakehub import load_example
+
+
+def load_minute_history() -> list:
+    """Return the records from the example minute history."""
+    return next(iter(load_example("zappihistory.json").values()))
+
+
+def strptime_timestamps(records: list) -> list:
+    """Build the timestamps the way minute_data used to."""
+    return [datetime.strptime(str(entry["dom"]) + ":" + str(entry["mon"]) + ":" + str(entry["yr"]) + ":" +
+                              str(entry.get("hr", 0)) + ":" + str(entry.get("min", 0)), "%d:%m:%Y:%H:%M")
+            for entry in records]
+
+
+def direct_timestamps(records: list, tz: timezone = None) -> list:
+    """Build the timestamps from the integer fields."""
+    return [myenergi.const.history_timestamp(entry["yr"], entry["mon"], entry["dom"], entry.get("hr", 0),
+                                             entry.get("min", 0), tz)
+            for entry in records]
+
+
+def parse_minute_data(records: list) -> list:
+    """Parse every record into minute_data."""
+    return [myenergi.const.minute_data(**entry) for entry in records]
+
+
+def main() -> None:
+    """Run the history parsing benchmarks."""
+    records = load_minute_history()
+    assert strptime_timestamps(records) == direct_timestamps(records)
+    print(f"Parsing {len(records)} minute history records from zappihistory.json")
+    before = report("timestamps with strptime", lambda: strptime_timestamps(records), 200)
+    after = report("timestamps from integer fields", lambda: direct_timestamps(records), 200)
+    report("timestamps from integer fields in UTC+1",
+           lambda: direct_timestamps(records, timezone(timedelta(hours=1))), 200)
+    report("minute_data for the whole day", lambda: parse_minute_data(records), 50)
+    print(f"Timestamp construction is {before / after:.1f}x faster")
+
+
+if __name__ == "__main__":
+    main()
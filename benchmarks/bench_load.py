@@ -0,0 +1,85 @@
+#!/usr/bin/env python3
+"""Measure the throughput of the API clients against a fake myenergi server with many devices.
+
+The fake server runs in a child process on localhost with digest authentication and a delay added to every
+response to stand in for the network. The benchmarks poll the status of the whole hub, refresh each Zappi and
+fetch a range of hourly history for every Zappi with the threaded and the asyncio clients.
+
+Run from the top of the repository with: python -m benchmarks.bench_load --zappis 200 --latency 0.02
+"""
+
+import argparse
+import asyncio
+import time
+from datetime import date, timedelta
+
+import myenergi
+from myenergi.const import MyenergiType
+
+from benchmarks.fixtures import print_result
+from tests.fakeserver import serve_in_process
+
+
+def print_throughput(name: str, requests: int, elapsed: float) -> None:
+    """Print how long the requests took with the number made and the requests per second."""
+    print_result(name, elapsed, "s", f" {requests:6d} requests {requests / elapsed:8.1f} requests/s")
+
+
+def timed(api, name: str, function) -> None:
+    """Call a function and print the number of requests the client made and the seconds taken."""
+    before = api.stats.snapshot()["requests"]
+    started = time.perf_counter()
+    function()
+    print_throughput(name, api.stats.snapshot()["requests"] - before, time.perf_counter() - started)
+
+
+async def timed_async(api, name: str, coroutine) -> None:
+    """Await a coroutine and print the number of requests the client made and the seconds taken."""
+    before = api.stats.snapshot()["requests"]
+    started = time.perf_counter()
+    await coroutine
+    print_throughput(name, api.stats.snapshot()["requests"] - before, time.perf_counter() - started)
+
+
+def run_threaded(url: str, args: argparse.Namespace, start: str, end: str) -> None:
+    """Run the benchmarks with the threaded client."""
+    with myenergi.API("12345678", "password", director_url=url, pool_size=args.workers) as api:
+        serials = list(api.get_zappi_serials())
+        timed(api, "status poll", lambda: [api.refresh_devices() for _ in range(args.polls)])
+        timed(api, "refresh_status for each zappi",
+              lambda: [api.refresh_status(MyenergiType.ZAPPI, serial, boost_times=False) for serial in serials])
+        timed(api, f"history range, {args.workers} workers",
+              lambda: api.get_zappi_history_range(serials, start, end, workers=args.workers))
+
+
+async def run_async(url: str, args: argparse.Namespace, start: str, end: str) -> None:
+    """Run the benchmarks with the asyncio client."""
+    async with myenergi.AsyncAPI("12345678", "password", concurrency=args.workers, director_url=url) as api:
+        serials = list(api.get_zappi_serials())
+        await timed_async(api, "async refresh_status for each zappi",
+                          asyncio.gather(*[api.refresh_status(MyenergiType.ZAPPI, serial, boost_times=False)
+                                           for serial in serials]))
+        await timed_async(api, f"async history range, concurrency {args.workers}",
+                          api.get_zappi_history_range(serials, start, end))
+
+
+def main() -> None:
+    """Start a fake server and run the load benchmarks against it."""
+    parser = argparse.ArgumentParser(description="Measure the throughput of the myenergi clients")
+    parser.add_argument("--zappis", type=int, default=200, help="the number of zappis on the fake hub")
+    parser.add_argument("--latency", type=float, default=0.02, help="seconds to delay each response")
+    parser.add_argument("--days", type=int, default=3, help="the days of history to fetch for each zappi")
+    parser.add_argument("--workers", type=int, default=16, help="threads or concurrent requests to use")
+    parser.add_argument("--polls", type=int, default=20, help="the number of status polls")
+    args = parser.parse_args()
+    end = date.today() - timedelta(days=1)
+    start = (end - timedelta(days=args.days - 1)).isoformat()
+    print(f"Fake hub with {args.zappis} zappis and {args.latency * 1000:.0f} ms latency")
+    with serve_in_process(zappis=args.zappis, latency=args.latency) as url:
+        run_threaded(url, args, start, end.isoformat())
+        if hasattr(myenergi, "AsyncAPI"):
+            asyncio.run(run_async(url, args, start, end.isoformat()))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,44 @@
+#!/usr/bin/env python3
+"""Benchmark the debug logging of the responses from the myenergi API.
+
+Compares formatting every response with json.dumps inside an f-string, as was done previously, with only
+formatting it when debug logging is enabled. The response is a day of minute history, the largest the API returns.
+
+Run from the top of the repository with: python -m benchmarks.bench_logging
+"""
+
+import json
+import logging
+
+import myenergi.api
+
+from benchmarks.fixtures import report
+from tests.fakehub import load_example
+
+
+def eager_log(logger: logging.Logger, data: dict) -> None:
+    """Log the response the way _api_request used to."""
+    logger.debug(f"Formatted API results:\n {json.dumps(data, indent=2)}")
+
+
+def main() -> None:
+    """Run the logging benchmarks with debug logging disabled and then enabled."""
+    data = load_example("zappihistory.json")
+    api = myenergi.api.APIBase("12345678", "password")
+    logger = api.logger
+    logger.propagate = False
+    logger.addHandler(logging.NullHandler())
+    print(f"Logging a {len(json.dumps(data))} byte minute history response")
+    logger.setLevel(logging.INFO)
+    before = report("f-string, debug disabled", lambda: eager_log(logger, data), 200, unit="us")
+    after = report("lazy, debug disabled", lambda: api._log_payload(data), 200, unit="us")
+    logger.setLevel(logging.DEBUG)
+    report("f-string, debug enabled", lambda: eager_log(logger, data), 20, unit="us")
+    report("lazy, debug enabled", lambda: api._log_payload(data), 20, unit="us")
+    api.payload_log_limit = 2000
+    report("lazy, debug enabled, limit 2000", lambda: api._log_payload(data), 20, unit="us")
+    print(f"With debug disabled the response is logged {before / after:.0f}x faster")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,110 @@
+#!/usr/bin/env python3
+"""Measure the memory held by months of minute history loaded into minute_data records.
+
+A synthetic dataset is built from the example minute history: a record for every minute of every day for each
+Zappi, with the energy fields rescaled by a factor fixed by the Zappi and day. The records are created one at a
+time so the raw json is freed as it goes, and the growth of the resident set size of the process while they are
+held is reported with the size of a single record.
+
+The same records are then built with a copy of minute_data which keeps an instance __dict__ rather than slots,
+and the memory allocated for each record by the two is reported side by side.
+
+Run from the top of the repository with: python -m benchmarks.bench_memory --zappis 3 --days 90
+"""
+
+import argparse
+import dataclasses
+import gc
+import os
+import random
+import resource
+import sys
+import tracemalloc
+from datetime import date, datetime, timedelta, tzinfo
+
+import myenergi.const
+
+from tests.fakehub import load_example
+
+
+def rss() -> int:
+    """Return the resident set size of the process in bytes."""
+    try:
+        with open("/proc/self/statm") as file:
+            return int(file.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    except OSError:
+        # Only the peak is available elsewhere, which is reported in kilobytes on Linux and bytes on macOS
+        peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        return peak if sys.platform == "darwin" else peak * 1024
+
+
+def synthetic_history(zappis: int, days: int, start: date):
+    """Yield a minute history record for every minute of every day for each zappi.
+
+    Args:
+        zappis (int): The number of zappis
+        days (int): The number of days
+        start (date): The first day
+    """
+    example = next(iter(load_example("zappihistory.json").values()))
+    for zappi in range(zappis):
+        for offset in range(days):
+            day = start + timedelta(days=offset)
+            scale = random.Random(f"{zappi}-{day}").uniform(0.5, 1.5)
+            for minute in range(24 * 60):
+                record = {key: round(value * scale) if isinstance(value, int) else value
+                          for key, value in example[minute % len(example)].items()}
+                record.update(yr=day.year, mon=day.month, dom=day.day, dow=day.strftime("%a"), hr=minute // 60,
+                              min=minute % 60)
+                yield record
+
+
+def dict_copy(record_type: type) -> type:
+    """Return a copy of a slots dataclass which keeps its fields in an instance __dict__ instead."""
+    spec = [(field.name, field.type, dataclasses.field(default=field.default, init=field.init))
+            for field in dataclasses.fields(record_type)]
+    spec.append(("tz", dataclasses.InitVar[tzinfo], None))
+    return dataclasses.make_dataclass(f"{record_type.__name__}_dict", spec,
+                                      namespace={"__post_init__": record_type.__post_init__})
+
+
+def allocated(record_type: type, zappis: int, days: int) -> float:
+    """Build the synthetic history with a record type and return the bytes allocated for each record held."""
+    gc.collect()
+    tracemalloc.start()
+    records = [record_type(**entry) for entry in synthetic_history(zappis, days, date(2024, 1, 1))]
+    held = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+    return held / len(records)
+
+
+def main() -> None:
+    """Load the synthetic history and report the memory it holds."""
+    parser = argparse.ArgumentParser(description="Measure the memory held by minute history records")
+    parser.add_argument("--zappis", type=int, default=3, help="the number of zappis")
+    parser.add_argument("--days", type=int, default=90, help="the days of minute history for each zappi")
+    args = parser.parse_args()
+    gc.collect()
+    before = rss()
+    records = [myenergi.const.minute_data(**entry) for entry in synthetic_history(args.zappis, args.days,
+                                                                                 date(2024, 1, 1))]
+    gc.collect()
+    held = rss() - before
+    sample = records[0]
+    print(f"{len(records)} minute_data records for {args.zappis} zappis over {args.days} days")
+    print(f"Resident set size grew by {held / 1024 / 1024:.1f} MB, {held / len(records):.0f} bytes per record")
+    print(f"Record object {sys.getsizeof(sample)} bytes, "
+          f"instance dict {sys.getsizeof(sample.__dict__) if hasattr(sample, '__dict__') else 0} bytes")
+    assert isinstance(sample.timestamp, datetime)
+    del records, sample
+    with_dict = dict_copy(myenergi.const.minute_data)
+    entry = next(synthetic_history(1, 1, date(2024, 1, 1)))
+    assert dataclasses.asdict(with_dict(**entry)) == dataclasses.asdict(myenergi.const.minute_data(**entry))
+    dict_bytes = allocated(with_dict, args.zappis, args.days)
+    slots_bytes = allocated(myenergi.const.minute_data, args.zappis, args.days)
+    print(f"Allocated per record: {dict_bytes:.0f} bytes with an instance dict, {slots_bytes:.0f} bytes with "
+          f"slots, {(1 - slots_bytes / dict_bytes) * 100:.0f}% less")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,69 @@
+#!/usr/bin/env python3
+"""Benchmark totalling a year of history into monthly and daily reports.
+
+Compares totalling a year of hourly_data one attribute at a time, as get_zappi_daily_total does for each day, with
+HistoryFrame.rollup on the same hourly history and on a year of minute history. The history is synthetic, built
+from the examples in the same way as bench_memory.
+
+Run from the top of the repository with: python -m benchmarks.bench_rollup
+"""
+
+import random
+from datetime import date, timedelta
+
+import myenergi.const
+from myenergi.const import History, Rollup, ZappiStats
+from myenergi.frame import HistoryFrame
+
+from benchmarks.bench_memory import synthetic_history
+from benchmarks.fixtures import report
+from tests.fakehub import load_example
+
+START = date(2024, 1, 1)
+DAYS = 365
+# The raw energy fields of a history record, which are rescaled for each day
+ENERGY_FIELDS = {"imp", "exp", "gep", "gen", "h1d", "h1b"}
+
+
+def synthetic_hourly_history(days: int, start: date) -> list:
+    """Return the example hourly history for each day rescaled by a factor fixed by the day."""
+    example = next(iter(load_example("zappihistoryhour.json").values()))
+    records = []
+    for offset in range(days):
+        day = start + timedelta(days=offset)
+        scale = random.Random(str(day)).uniform(0.5, 1.5)
+        for record in example:
+            record = {key: round(value * scale) if key in ENERGY_FIELDS else value for key, value in record.items()}
+            record.update(yr=day.year, mon=day.month, dom=day.day, dow=day.strftime("%a"))
+            records.append(record)
+    return records
+
+
+def monthly_totals(history: list) -> dict:
+    """Total hourly_data by month one attribute at a time, rounding as each hour is added."""
+    months = {}
+    for data in history:
+        summary = months.setdefault((data.timestamp.year, data.timestamp.month),
+                                    myenergi.const.daily_data(data.timestamp))
+        for stat in ZappiStats:
+            setattr(summary, stat.value, round(getattr(summary, stat.value) + getattr(data, stat.value), 2))
+    return months
+
+
+def main() -> None:
+    """Run the rollup benchmarks."""
+    hourly_records = synthetic_hourly_history(DAYS, START)
+    hourly = [myenergi.const.hourly_data(**record) for record in hourly_records]
+    hourly_frame = HistoryFrame.from_records(1, History.HOUR, hourly_records)
+    minute_frame = HistoryFrame.from_records(1, History.MINUTE, list(synthetic_history(1, DAYS, START)))
+    print(f"{len(hourly_frame)} hours and {len(minute_frame)} minutes of history over {DAYS} days")
+    before = report("monthly totals of hourly_data", lambda: monthly_totals(hourly), 5)
+    after = report("monthly rollup of the hourly frame", lambda: hourly_frame.rollup(Rollup.MONTH), 50)
+    report("daily rollup of the hourly frame", lambda: hourly_frame.rollup(Rollup.DAY), 50)
+    report("monthly rollup of the minute frame", lambda: minute_frame.rollup(Rollup.MONTH), 5)
+    report("15 minute rollup of the minute frame", lambda: minute_frame.rollup(Rollup.QUARTER_HOUR), 5)
+    print(f"Monthly totals are {before / after:.0f}x faster from the frame")
+
+
+if __name__ == "__main__":
+    main()
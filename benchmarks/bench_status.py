@@ -0,0 +1,94 @@
+#!/usr/bin/env python3
+"""Benchmark the parsing of device status into the zappi, harvi and eddi dataclasses.
+
+This is the work done on every refresh by a status poller: the output of cgi-jstatus-* is converted
+field by field into the device dataclasses.
+
+Each parse is timed with the converters compiled once for each dataclass and with a reference copy of the previous
+__post_init__, which walked fields() checking the type of every field on every instance and parsed the dates and
+times with dateutil, so the speedup can be measured again.
+
+Run from the top of the repository with: python -m benchmarks.bench_status
+"""
+
+import copy
+from dataclasses import fields, is_dataclass
+from datetime import date, datetime, time
+from enum import Enum
+from typing import get_origin
+from unittest import mock
+
+import dateutil.parser
+
+import myenergi.const
+from myenergi.apiconstruct import baseclass
+
+from benchmarks.fixtures import report
+from tests.fakehub import EDDI, load_status
+
+
+def reference_post_init(self) -> None:
+    """Convert the fields of a device dataclass the way baseclass.__post_init__ used to."""
+    for entry in fields(self):
+        if entry.type in (str, int, float, bool) or issubclass(entry.type.__class__, range):
+            pass
+        elif entry.type == date:
+            if getattr(self, entry.name) is not None:
+                setattr(self, entry.name, dateutil.parser.parse(getattr(self, entry.name)).date())
+        elif entry.type == time:
+            if getattr(self, entry.name) is not None:
+                setattr(self, entry.name, dateutil.parser.parse(getattr(self, entry.name)).time())
+        elif entry.type == datetime:
+            if getattr(self, entry.name) is not None:
+                setattr(self, entry.name, dateutil.parser.parse(getattr(self, entry.name)))
+        elif get_origin(entry.type) == list:
+            if is_dataclass(entry.type.__args__[0]):
+                for index, data in enumerate(getattr(self, entry.name)):
+                    getattr(self, entry.name)[index] = entry.type.__args__[0](**data)
+        elif is_dataclass(entry.type) and bool(getattr(self, entry.name)):
+            setattr(self, entry.name, entry.type(**getattr(self, entry.name)))
+        elif issubclass(entry.type, Enum):
+            try:
+                setattr(self, entry.name, entry.type[getattr(self, entry.name)])
+            except KeyError:
+                setattr(self, entry.name, entry.type(getattr(self, entry.name)))
+            except TypeError:
+                pass
+        elif get_origin(entry.type) == dict and bool(getattr(self, entry.name)):
+            key_type, value_type = entry.type.__args__
+            setattr(self, entry.name, {getattr(key_type, key) if issubclass(key_type, Enum) else key:
+                                       value_type(**data) if is_dataclass(value_type) else data
+                                       for key, data in getattr(self, entry.name).items()})
+    # Each device dataclass then set its timestamp from the date and time
+    self.timestamp = datetime.combine(self.dat, self.tim)
+
+
+def parse_status(zappi: dict, harvi: dict) -> tuple:
+    """Parse one refresh worth of status for a zappi, harvi and eddi."""
+    return (myenergi.const.zappi(**copy.copy(zappi)), myenergi.const.harvi(**copy.copy(harvi)),
+            myenergi.const.eddi(**copy.copy(EDDI)))
+
+
+def main() -> None:
+    """Run the status parsing benchmarks with the compiled converters and with the reference walk."""
+    zappi, harvi = load_status()
+    # The results are not compared as the reference walk reads ambiguous dates such as 07-11-2020 month first
+    with mock.patch.object(baseclass, "__post_init__", reference_post_init):
+        before = {"zappi": report("zappi, reference walk", lambda: myenergi.const.zappi(**copy.copy(zappi)), 2000,
+                                  unit="us"),
+                  "harvi": report("harvi, reference walk", lambda: myenergi.const.harvi(**copy.copy(harvi)), 2000,
+                                  unit="us"),
+                  "eddi": report("eddi, reference walk", lambda: myenergi.const.eddi(**copy.copy(EDDI)), 2000,
+                                 unit="us"),
+                  "refresh": report("refresh, reference walk", lambda: parse_status(zappi, harvi), 2000, unit="us")}
+    after = {"zappi": report("zappi", lambda: myenergi.const.zappi(**copy.copy(zappi)), 2000, unit="us"),
+             "harvi": report("harvi", lambda: myenergi.const.harvi(**copy.copy(harvi)), 2000, unit="us"),
+             "eddi": report("eddi", lambda: myenergi.const.eddi(**copy.copy(EDDI)), 2000, unit="us"),
+             "refresh": report("refresh of zappi, harvi and eddi", lambda: parse_status(zappi, harvi), 2000,
+                               unit="us")}
+    for name, elapsed in after.items():
+        print(f"{name:<10} {before[name] / elapsed:5.1f}x faster with the compiled converters")
+
+
+if __name__ == "__main__":
+    main()
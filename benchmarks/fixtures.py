@@ -0,0 +1,40 @@
+"""Timers shared by the benchmarks.
+
+The example responses and the offline HTTP layer the benchmarks run against are in tests.fakehub.
+"""
+
+import timeit
+
+# The number of each unit of time in a second
+UNITS = {"s": 1, "ms": 1000, "us": 1000000}
+
+
+def measure(function, number: int, repeat: int = 5) -> float:
+    """Return the best time per call of a function in seconds over repeat runs of number calls."""
+    return min(timeit.repeat(function, number=number, repeat=repeat)) / number
+
+
+def print_result(name: str, elapsed: float, unit: str, detail: str = "") -> None:
+    """Print the result of a benchmark in the layout shared by the benchmarks.
+
+    Args:
+        name (str): The name of the benchmark
+        elapsed (float): The time taken in the unit given
+        unit (str): The unit of the time, "s", "ms" or "us"
+        detail (str, optional): Further results to print after the time. Defaults to "".
+    """
+    print(f"{name:<45} {elapsed:10.3f} {unit}{detail}")
+
+
+def report(name: str, function, number: int, unit: str = "ms") -> float:
+    """Time a function and print the best time per call, which is returned in the unit given.
+
+    Args:
+        name (str): The name of the benchmark
+        function: The function to time
+        number (int): The number of calls in each run
+        unit (str, optional): The unit of the time, "s", "ms" or "us". Defaults to "ms".
+    """
+    elapsed = measure(function, number) * UNITS[unit]
+    print_result(name, elapsed, unit)
+    return elapsed
@@ -38,8 +38,8 @@ def get_options() -> dict:
                         choices=[logging.DEBUG, logging.INFO, logging.WARNING, logging.ERROR, logging.CRITICAL])
     parser.add_argument('-b', '--boost', required=True, choices=myenergi.ZappiBoost._member_names_,
                         help='boost action to take')
-    parser.add_argument('-z', '--zappi', required=False, type=str, default=None, help='Zappi serial Number to boost')
-    parser.add_argument('-k', '--kwh', required=False, default=None, type=float, help='kWh to boost')
+    parser.add_argument('-z', '--zappi', required=False, type=int, default=None, help='Zappi serial Number to boost')
+    parser.add_argument('-k', '--kwh', required=False, default=None, type=int, help='kWh to boost')
     parser.add_argument('-t', '--time', required=False, default=None, type=valid_time,
                         help='target time for Smart Boost in format HHMM')
     args = parser.parse_args()
@@ -58,6 +58,15 @@ def get_options() -> dict:
     return args
 
 
+def boost_command(serial: int, args: argparse.Namespace):
+    """Create the command for the boost action requested for a Zappi."""
+    if args.boost == myenergi.ZappiBoost.START.name:
+        return myenergi.const.zappi_boost_command(serial, args.boost, args.kwh)
+    if args.boost == myenergi.ZappiBoost.SMART.name:
+        return myenergi.const.zappi_smart_boost_command(serial, args.kwh, args.time)
+    return myenergi.const.zappi_boost_command(serial, args.boost)
+
+
 def main() -> None:
     """Set the boost mode as requested."""
     args = get_options()
@@ -66,15 +75,19 @@ def main() -> None:
     # Setup the local logger
     logger = get_logger(args.logger)
 
-    with myenergi.API(args.serial, args.password) as mye:
-        if mye.get_zappi_serials() is None:
+    with myenergi.API(args.serial, args.password, asn_cache=myenergi.ASNCache(), eager=False) as mye:
+        if not mye.get_zappi_serials():
             logger.error('No Zappi Detected')
-        elif args.zappi is None:
-            logger.info('No serial number provided. All Zappis will be boosted')
-            for zappi in mye.get_zappi_serials():
-                mye.set_zappi_boost(zappi, boost=args.boost, kwh=args.kwh, boost_time=args.time)
         else:
-            mye.set_zappi_boost(args.zappi, boost=args.boost, kwh=args.kwh, boost_time=args.time)
+            if args.zappi is None:
+                logger.info('No serial number provided. All Zappis will be boosted')
+                serials = mye.get_zappi_serials()
+            else:
+                serials = [args.zappi]
+            # Boost all of the Zappis at once rather than one after another
+            for result in mye.apply([boost_command(serial, args) for serial in serials]):
+                if not result.succeeded:
+                    logger.error("Unable to boost Zappi SN:%s: %s", result.command.serial, result.error)
 
 
 if __name__ == '__main__':
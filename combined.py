@@ -109,7 +109,7 @@ async def main():
     typelist = ['imp', 'exp', 'gen', 'gep', 'h1d', 'h1b', 'hom']
     total = {}
 
-    with myenergi.API(args.serial, args.password) as mye:
+    with myenergi.API(args.serial, args.password, asn_cache=myenergi.ASNCache()) as mye:
         zappiserial = mye.get_serials("ZAPPI")[0]
         logger.debug("querying Zappi")
         for daysago in range(args.start, args.end):
@@ -8,6 +8,7 @@ It will then import a summary of this information into an influxdb database.
 import argparse
 import logging
 import logging.handlers
+import os
 from datetime import datetime, timedelta
 
 import myenergi
@@ -22,6 +23,8 @@ def get_options() -> dict:
     parser.add_argument('-p', '--password', help='myenergi password', default=(env.get('myenergi_password')))
     parser.add_argument('-t', '--start', required=False, type=int, default=1, help='starting number of days ago')
     parser.add_argument('-e', '--end', required=False, type=int, default=4, help='ending number of days ago')
+    parser.add_argument('-c', '--cache', required=False, type=str, help='history cache file',
+                        default=os.path.join(myenergi.cache.DEFAULT_CACHE_DIR, "history.sqlite"))
     parser.add_argument('-l', '--logger', help='logging mode', default='syslog', choices=['syslog', 'stdout'])
     parser.add_argument('-v', '--verbosity', help='logging verbosity', default=logging.INFO)
     args = parser.parse_args()
@@ -37,7 +40,8 @@ def main() -> None:
     logger = get_logger(args.logger)
 
     with InfluxConnection(database="myenergi", reset=False) as connection:
-        with myenergi.API(args.serial, args.password) as mye:
+        with myenergi.API(args.serial, args.password, cache=myenergi.HistoryCache(args.cache),
+                          asn_cache=myenergi.ASNCache(), eager=False) as mye:
             # If no zappi detected then exit
             zappilist = mye.get_serials(myenergi.MyenergiType.ZAPPI) 
             if zappilist is None:
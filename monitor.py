@@ -0,0 +1,59 @@
+#!/usr/bin/env python3
+"""Python script to monitor the myenergi devices.
+
+This script keeps a single connection to the myenergi API open and logs each change in the status of the devices
+It polls more often while a car is charging and less often when nothing is changing
+"""
+
+import argparse
+import logging
+
+import myenergi
+from utilities import get_env, get_logger
+
+
+def get_options() -> dict:
+    """Get the required options using argparse with defaults from a dotenv file.
+    Returns:
+        dict: A dictionary of the options to be used.
+    """
+    env = get_env()
+    parser = argparse.ArgumentParser(description='Logs changes to the status of myenergi devices')
+    parser.add_argument('-s', '--serial', help='myenergi hub serial number', default=(env.get('myenergi_serial')))
+    parser.add_argument('-p', '--password', help='myenergi password', default=(env.get('myenergi_password')))
+    parser.add_argument('-l', '--logger', help='logging mode', default='stdout', choices=['syslog', 'stdout'])
+    parser.add_argument('-v', '--verbosity', help='logging verbosity', default=logging.INFO)
+    parser.add_argument('-i', '--interval', help='seconds between polls after a change', type=float, default=60)
+    parser.add_argument('--min-interval', help='seconds between polls while charging', type=float, default=10)
+    parser.add_argument('--max-interval', help='longest time between polls', type=float, default=600)
+    args = parser.parse_args()
+    if not args.serial or not args.password:
+        parser.error("Please provide both myenergi hub serial number and password.")
+    return args
+
+
+def main() -> None:
+    """Log each change in the status of the myenergi devices until interrupted."""
+    args = get_options()
+    # Set the logging level for the myenergi api client
+    logging.getLogger('myenergi.api').setLevel(args.verbosity)
+    # Set up the local logger
+    logger = get_logger(args.logger)
+
+    def log_changes(changes: list) -> None:
+        for change in changes:
+            for name, (before, after) in change.changes.items():
+                logger.info("%s %s %s: %s -> %s", change.device.name, change.serial, name, before, after)
+
+    with myenergi.API(args.serial, args.password, asn_cache=myenergi.ASNCache()) as mye:
+        monitor = myenergi.Monitor(mye, interval=args.interval, min_interval=args.min_interval,
+                                   max_interval=args.max_interval)
+        monitor.subscribe(log_changes)
+        try:
+            monitor.run()
+        except KeyboardInterrupt:
+            monitor.stop()
+
+
+if __name__ == "__main__":
+    main()
@@ -3,9 +3,23 @@
 import logging
 
 from .api import API  # noqa: F401
+# The asyncio client is only available when the optional httpx dependency is installed
+try:
+    from .asyncapi import AsyncAPI  # noqa: F401
+except ImportError:
+    pass
+# The columnar history is only available when the optional numpy dependency is installed
+try:
+    from .frame import HistoryFrame  # noqa: F401
+except ImportError:
+    pass
 # Import constants that are used by external users
 
-from .const import ZappiMode, ZappiBoost, History, ZappiStats, MyenergiType  # noqa: F401
+from .const import ZappiMode, ZappiBoost, History, Rollup, ZappiStats, EddiStats, MyenergiType  # noqa: F401
+from .cache import ASNCache, HistoryCache  # noqa: F401
+from .metrics import LogExporter, Metrics  # noqa: F401
+from .monitor import Monitor  # noqa: F401
+from .resilience import RetryPolicy  # noqa: F401
 
 # Set default logging handler to avoid "No handler found" warnings.
 logging.getLogger(__name__).addHandler(logging.NullHandler())
@@ -12,82 +12,118 @@ set_zappi_boost).
 
 It is also possible to retrieve historical data from the zappi.
 
+The parts of the client which do not make requests (the getters, URL construction and parsing of results)
+live in the APIBase class so that they can be shared with the asyncio client in myenergi.asyncapi.
+
 Helper Methods: There are internal helper methods such as _api_request for making API calls, _create_url
 for constructing the API URLs, and _check_serial for validating device serial numbers.
 """
 
+import contextlib
 import json
 import logging
+import math
+import threading
 import time
-from datetime import datetime, timedelta
+from concurrent.futures import Future, ThreadPoolExecutor
+from dataclasses import fields
+from datetime import datetime, timedelta, timezone
+from urllib.parse import urlsplit
 
 import requests
-import requests.auth
+import requests.adapters
 
 import myenergi.error
+from myenergi.auth import SharedDigestAuth
+from myenergi.cache import ASNCache, HistoryCache
+from myenergi.metrics import Metrics
+from myenergi.stream import STREAM_CHUNK_SIZE, ArrayParser, batched
+from myenergi.resilience import (DEFAULT_TIMEOUT, CircuitBreaker, RequestStats,
+                                 RetryPolicy, is_busy, is_idempotent)
+from myenergi.confirm import TIMEOUT, ConfirmationEngine, confirmed
+# The columnar history is only available when the optional numpy dependency is installed
+try:
+    from myenergi.frame import HistoryFrame
+except ImportError:
+    HistoryFrame = None
 from myenergi.const import (EddiData, EddiMode, HarviData, History, LibbiData,
                             MyEnergiEndpoint, MyenergiType, ZappiBoost,
                             ZappiData, ZappiMode, ZappiModeParm,
                             ZappiStateDisplay)
 
-# from pprint import pprint
-
-
-
 # Only export the myenergi API
 __all__ = ["API"]
 
+# The endpoint for each type of device and resolution of history
+HISTORY_ENDPOINTS = {(MyenergiType.ZAPPI, History.MINUTE): MyEnergiEndpoint.ZAPPI_HISTORY_MINUTE,
+                     (MyenergiType.ZAPPI, History.HOUR): MyEnergiEndpoint.ZAPPI_HISTORY_HOUR,
+                     (MyenergiType.EDDI, History.MINUTE): MyEnergiEndpoint.EDDI_HISTORY_MINUTE,
+                     (MyenergiType.EDDI, History.HOUR): MyEnergiEndpoint.EDDI_HISTORY_HOUR}
+# The dataclass each record of history is loaded into for each type of device and resolution
+HISTORY_RECORDS = {(MyenergiType.ZAPPI, History.MINUTE): myenergi.const.minute_data,
+                   (MyenergiType.ZAPPI, History.HOUR): myenergi.const.hourly_data,
+                   (MyenergiType.EDDI, History.MINUTE): myenergi.const.eddi_minute_data,
+                   (MyenergiType.EDDI, History.HOUR): myenergi.const.eddi_hourly_data}
+# The dataclass the status of each type of device is loaded into
+DEVICE_CLASSES = {MyenergiType.EDDI: myenergi.const.eddi, MyenergiType.HARVI: myenergi.const.harvi,
+                  MyenergiType.LIBBI: myenergi.const.libbi, MyenergiType.ZAPPI: myenergi.const.zappi}
 
-class API:
+
+class APIBase:
     """
-    A Python module that enables the use of the myenergi API.
+    The parts of the myenergi client which do not depend on how requests are made.
 
     Args:
         serial (str): The serial number of the hub
         password (str): The password for the account
     """
 
-    def __init__(self, serial: str = None, password: str = None) -> None:
-        """Initialise the Myenergi client and perform an initial query.
+    # The longest debug dump of a response in characters, None to log responses in full
+    payload_log_limit = None
+
+    def __init__(self, serial: str = None, password: str = None, cache: HistoryCache = None,
+                 asn_cache: ASNCache = None, retry: RetryPolicy = None,
+                 request_timeout: tuple = DEFAULT_TIMEOUT, metrics: Metrics = None,
+                 director_url: str = MyEnergiEndpoint.DIRECTOR_URL.value) -> None:
+        """Check the credentials and set up an empty set of devices.
 
         Args:
             serial (str, optional): Serial number of the myenergi hub. Defaults to None.
             password (str, optional): password for the myenergi hub. Defaults to None.
+            cache (HistoryCache, optional): Cache to read history through. Defaults to None.
+            asn_cache (ASNCache, optional): Cache of the server for the hub. Defaults to None.
+            retry (RetryPolicy, optional): How failed requests are retried. Defaults to RetryPolicy().
+            request_timeout (tuple, optional): Connect and read timeouts in seconds. Defaults to DEFAULT_TIMEOUT.
+            metrics (Metrics, optional): Where to record per endpoint metrics. Defaults to None.
+            director_url (str, optional): The director which names the server for the hub, the servers are
+                called with the same scheme. Defaults to MyEnergiEndpoint.DIRECTOR_URL.
         """
         assert serial is not None and password is not None
         # Setup a logger instance
         self.logger = logging.getLogger(__name__)
-        self.logger.info(f"Initialising Myenergi API Client for hub:{serial}")
-        # Create a session for the API requests
-        self._session = requests.Session()
-        self._session.headers.update(MyEnergiEndpoint.API_HEADERS.value)
-        self._session.auth = requests.auth.HTTPDigestAuth(serial, password)
-        # Call the director URL to get the URL for this hub which is returned in a header field
-        results = self._session.get(MyEnergiEndpoint.DIRECTOR_URL.value)
-        self._url = f"https://{results.headers[MyEnergiEndpoint.ASN_HEADER_FIELD.value]}/"
-        # Perform an initial query to the hub to get the list of devices and their attributes
-        results = self._api_request(self._create_url())
+        self.logger.info("Initialising Myenergi API Client for hub:%s", serial)
+        self._serial = serial
+        self._url = None
+        self._cache = cache
+        self._asn_cache = asn_cache
+        # A server from the ASN cache is not trusted until it has responded
+        self._asn_verified = True
+        self.retry = retry or RetryPolicy()
+        self.request_timeout = request_timeout
+        self.stats = RequestStats()
+        self.metrics = metrics
+        self.director_url = director_url
+        self._scheme = urlsplit(director_url).scheme
+        self._breakers = {}
         self._devices = myenergi.const.devices()
-        for entry in results:
-            self._parse_api_results(entry)
-        # Get the boost times for all Zappis
-        for serial in self.get_serials(MyenergiType.ZAPPI):
-            self._get_zappi_boost_times(serial)
-        # Get the boost times for all Eddis
-        for serial in self.get_serials(MyenergiType.EDDI):
-            self._get_eddi_boost_times(serial)
-
-    def __enter__(self) -> "API":
-        """Entry function for the myenergi API."""
-        return self
-
-    def __exit__(self, exc_type, exc_value, exc_traceback) -> None:
-        """Exit function for the myenergi API."""
-        self._session.close()
-
-    def close(self) -> None:
-        """Close the requests session."""
-        self._session.close()
+        # Every device by serial number with its type, kept in step with _devices
+        self._registry = {}
+        # The status last returned by the API for each device, to find the fields which change
+        self._statuses = {}
+        # Counts the status results which changed a device, so a monitor can tell it missed a refresh
+        self._status_version = 0
+        # Status results are applied one at a time so that each refresh knows which versions it produced
+        self._status_lock = threading.RLock()
 
     def get_zappi_info(self, serial: int, info: ZappiData) -> str | int:
         """Return the Zappi information previously queried using the API.
@@ -96,7 +132,9 @@ class API:
             serial (int): The serial number of the zappi
             info (ZappiData): The human-readable name of the information  to be returned
         """
-        self._check_serial(MyenergiType.ZAPPI, serial)
+        serial = self._check_serial(MyenergiType.ZAPPI, serial)
+        if info == ZappiData.BOOST_TIMES:
+            self._ensure_boost_times(MyenergiType.ZAPPI, serial)
         return getattr(self._devices.zappi[serial], info.value)
 
     def get_zappi_status(self, serial: int) -> str:
@@ -105,7 +143,7 @@ class API:
         Args:
             serial (int): The serial number of the zappi
         """
-        self._check_serial(MyenergiType.ZAPPI, serial)
+        serial = self._check_serial(MyenergiType.ZAPPI, serial)
         myzappi = self._devices.zappi[serial]
         return  ZappiStateDisplay[getattr(myzappi, ZappiData.CHARGE_STATUS.value)
                                            + str(getattr(myzappi, ZappiData.STATUS.value))].value
@@ -117,7 +155,7 @@ class API:
             serial (int): The serial number of the harvi
             info (HarviData): The human-readable name of the information  to be returned
         """
-        self._check_serial(MyenergiType.HARVI, serial)
+        serial = self._check_serial(MyenergiType.HARVI, serial)
         return getattr(self._devices.harvi[serial], info.value)
 
     def get_eddi_info(self, serial: int, info: EddiData) -> str:
@@ -127,7 +165,9 @@ class API:
             serial (int): The serial number of the eddi
             info (EddiData): The human-readable name of the information  to be returned
         """
-        self._check_serial(MyenergiType.EDDI, serial)
+        serial = self._check_serial(MyenergiType.EDDI, serial)
+        if info == EddiData.BOOST_TIMES:
+            self._ensure_boost_times(MyenergiType.EDDI, serial)
         return getattr(self._devices.eddi[serial], info.value)
 
     def get_serials(self, device: MyenergiType) -> list:
@@ -136,6 +176,7 @@ class API:
         Args:
             device (MyenergiType): The type of device to return
         """
+        self._ensure_devices()
         if getattr(self._devices, device.value) is not None:
             return getattr(self._devices, device.value).keys()
         else:
@@ -149,243 +190,530 @@ class API:
         """
         return self.get_serials(MyenergiType.ZAPPI)
 
-    def refresh_status(self, device: MyenergiType, serial: int) -> None:
-        """Refresh the information stored for a device by calling the myenergi API.
+    def _ensure_devices(self) -> None:
+        """Make sure the devices have been queried before they are used.
+        The asyncio client queries the devices when it connects so there is nothing to do."""
+
+    def _ensure_boost_times(self, device: MyenergiType, serial: int) -> None:
+        """Make sure the boost times for a device have been queried before they are used.
+        The asyncio client queries the boost times when it connects so there is nothing to do.
 
         Args:
-            device (str): The type of device to return
+            device (MyenergiType): The type of device
             serial (int): The serial number of the device
         """
-        self._check_serial(device, serial)
-        results = self._api_request(self._create_url(endpoint=MyEnergiEndpoint[device.name], serial=serial))
-        self._parse_api_results(results)
-        if device == MyenergiType.ZAPPI:
-            self._get_zappi_boost_times(serial)
-        if device == MyenergiType.EDDI:
-            self._get_eddi_boost_times(serial)
 
-    def _get_eddi_boost_times(self, serial: int) -> None:
-        """Get the current Eddi boost times.
+    def _set_boost_times(self, device: MyenergiType, serial: int, results: json) -> None:
+        """Store the boost times returned by the API against the device.
 
         Args:
-            serial (int): The serial number of the Eddi
+            device (MyenergiType): The type of device the boost times are for
+            serial (int): The serial number of the device
+            results (json): Output from the myenergi boost time endpoint
         """
-        self._check_serial(MyenergiType.EDDI, serial)
-        results = self._api_request(self._create_url(endpoint=MyEnergiEndpoint.EDDI_BOOST_TIME, serial=serial))
         boost = myenergi.const.boosttimes(**results)
-        self._devices.eddi[serial].boost_times = boost.boost_times
+        getattr(self._devices, device.value)[serial].boost_times = boost.boost_times
 
-    def _get_zappi_boost_times(self, serial: int) -> None:
-        """Get the current Zappi boost times.
+    def _build_timer(self, endpoint: MyEnergiEndpoint):
+        """Return a context manager which records the time taken to build the results from a response, or which
+        does nothing if metrics are not being recorded.
 
         Args:
-            serial (int): The serial number of the zappi
+            endpoint (MyEnergiEndpoint): The endpoint the response came from
         """
-        self._check_serial(MyenergiType.ZAPPI, serial)
-        results = self._api_request(self._create_url(endpoint=MyEnergiEndpoint.ZAPPI_BOOST_TIME, serial=serial))
-        boost = myenergi.const.boosttimes(**results)
-        self._devices.zappi[serial].boost_times = boost.boost_times
+        if self.metrics is None:
+            return contextlib.nullcontext()
+        return self.metrics.build_timer(endpoint)
+
+    def _record_metrics(self, url: str, results, started: float, decode_started: float) -> None:
+        """Record the latency, size and JSON decode time of a successful request if metrics are being recorded.
 
-    def get_zappi_daily_total(self, serial: int, date: str, querydays: int = 1) -> myenergi.const.daily_history:
-        """Get the daily total history information for the date and serial provided
         Args:
-            serial (int): The serial number of the zappi
-            date (datetime): The date for which to obtain the history
-            querydays (int): The number of days to query counting back from today
+            url (str): The URL of the request
+            results: The response to the request
+            started (float): The monotonic time the request was made
+            decode_started (float): The monotonic time the JSON decoding started
         """
-        self._check_serial(MyenergiType.ZAPPI, serial)
-        daily_history = myenergi.const.daily_history(serial)
-        thedate = datetime.strptime(date, "%Y-%m-%d")
-        for day in range(querydays-1):
-            today = thedate - timedelta(days=day)
-            history = self.get_zappi_history(serial, History.HOUR, datetime.strftime(today, "%Y-%m-%d"))
-            summary_data = myenergi.const.daily_data(today)
-            for data in history.history_data:
-                for stat in myenergi.const.ZappiStats:
-                    setattr(summary_data, stat.value, round(getattr(summary_data, stat.value) +
-                                                            getattr(data, stat.value), 2))
-            daily_history.history_data.append(summary_data)
-        return daily_history
+        if self.metrics is not None:
+            self.metrics.record_request(url, decode_started - started, len(results.content),
+                                        time.monotonic() - decode_started)
 
-    def get_eddi_history(self, serial: int, history_type: History, date: str) -> myenergi.const.hourly_history:
-        """Get Eddi history of the relevant type using the Myenergi API.
+    def _log_payload(self, data: json) -> None:
+        """Log the json returned by the REST API at debug level, cut to payload_log_limit characters.
+        The json is only formatted when debug logging is enabled as a day of minute history is large, and with a
+        limit the formatting stops once the limit has been reached.
 
         Args:
-            serial (int): The serial number of the eddi
-            history_type (str): Whether to get history by Minute or by Hour
-            date (datetime): The date for which to obtain the history
+            data (json): The json returned by the REST API
         """
-        self._check_serial(MyenergiType.EDDI, serial)
-        results = self._api_request(self._create_url(endpoint=MyEnergiEndpoint[history_type.value], serial=serial,
-                                                     parm=f"-{date}"))
-        serstring = f"U{serial}"
-        if history_type == History.MINUTE:
-            myhistory = myenergi.const.minute_history(serial)
-            for entry in results[serstring]:
-                myhistory.history_data.append(myenergi.const.minute_data(**entry))
-        elif history_type == History.HOUR:
-            myhistory = myenergi.const.hourly_history(serial)
-            for entry in results[serstring]:
-                myhistory.history_data.append(myenergi.const.hourly_data(**entry))
-        return myhistory
+        if not self.logger.isEnabledFor(logging.DEBUG):
+            return
+        if self.payload_log_limit is None:
+            payload = json.dumps(data, indent=2)
+        else:
+            chunks = []
+            length = 0
+            for chunk in json.JSONEncoder(indent=2).iterencode(data):
+                chunks.append(chunk)
+                length += len(chunk)
+                if length > self.payload_log_limit:
+                    break
+            payload = "".join(chunks)
+            if length > self.payload_log_limit:
+                payload = f"{payload[:self.payload_log_limit]}... (truncated at {self.payload_log_limit} characters)"
+        self.logger.debug("Formatted API results:\n %s", payload)
 
-    def get_zappi_history(self, serial: int, history_type: History, date: str) -> myenergi.const.hourly_history:
-        """Get Zappi history of the relevant type using the Myenergi API.
+    def _store_device(self, device: MyenergiType, serial: int, status: dict) -> set:
+        """Apply the status of a device returned by the API and return the names of the fields which changed.
+        Only the fields which differ from the previous status are converted and set on the existing dataclass, so
+        the boost times which are not part of the status are kept. A new device, or one whose status has gained or
+        lost fields, is loaded into a new dataclass.
+
+        Args:
+            device (MyenergiType): The type of device the status is for
+            serial (int): The serial number of the device
+            status (dict): The status of the device returned by the API
+        """
+        devices = getattr(self._devices, device.value)
+        if devices is None:
+            devices = {}
+            setattr(self._devices, device.value, devices)
+        current = devices.get(serial)
+        previous = self._statuses.get(serial)
+        self._statuses[serial] = dict(status)
+        if current is not None and previous is not None and previous.keys() == status.keys():
+            return current.update({name: value for name, value in status.items() if previous[name] != value})
+        data = DEVICE_CLASSES[device](**status)
+        if getattr(current, "boost_times", None) is not None:
+            data.boost_times = current.boost_times
+        devices[serial] = data
+        self._registry[serial] = (device, data)
+        return {entry.name for entry in fields(data)
+                if current is None or getattr(current, entry.name) != getattr(data, entry.name)}
+
+    def _clear_devices(self, device: MyenergiType) -> dict:
+        """Forget every device of a type when the hub reports none.
+
+        Args:
+            device (MyenergiType): The type of device
+        Returns:
+            dict: The names of the fields of each device which was removed by serial number
+        """
+        removed = {}
+        for serial, data in (getattr(self._devices, device.value) or {}).items():
+            self._registry.pop(serial, None)
+            self._statuses.pop(serial, None)
+            removed[serial] = {entry.name for entry in fields(data)}
+        setattr(self._devices, device.value, None)
+        return removed
+
+    @property
+    def status_version(self) -> int:
+        """Return the number of status results which have changed a device."""
+        return self._status_version
+
+    def get_device_type(self, serial: int) -> MyenergiType:
+        """Return the type of a device previously queried.
+
+        Args:
+            serial (int): The serial number of the device, as an int or str
+        """
+        self._ensure_devices()
+        entry = self._registry.get(self._normalise_serial(serial))
+        if entry is None:
+            raise myenergi.error.ParameterError("Serial number does not exist")
+        return entry[0]
+
+    def get_device(self, serial: int):
+        """Return the information previously queried for a device of any type.
+
+        Args:
+            serial (int): The serial number of the device, as an int or str
+        """
+        self._ensure_devices()
+        entry = self._registry.get(self._normalise_serial(serial))
+        if entry is None:
+            raise myenergi.error.ParameterError("Serial number does not exist")
+        return entry[1]
+
+    def _cached_history(self, endpoint: MyEnergiEndpoint, serial: int, date: str) -> json:
+        """Return the results for a day of history from the cache or None if it is not available.
+
+        Args:
+            endpoint (MyEnergiEndpoint): The history endpoint
+            serial (int): The serial number of the device
+            date (str): The date of the history
+        """
+        if self._cache is None:
+            return None
+        results = self._cache.get(serial, endpoint.name, date)
+        if results is not None:
+            self.logger.debug("Using cached %s history for SN: %s on %s", endpoint.name, serial, date)
+        return results
+
+    def _cache_history(self, endpoint: MyEnergiEndpoint, serial: int, date: str, results: json) -> None:
+        """Store the results for a day of history in the cache if there is one.
+
+        Args:
+            endpoint (MyEnergiEndpoint): The history endpoint
+            serial (int): The serial number of the device
+            date (str): The date of the history
+            results (json): Output from the myenergi history endpoint
+        """
+        if self._cache is not None:
+            self._cache.put(serial, endpoint.name, date, results)
+
+    def get_zappi_timezone(self, serial: int) -> timezone:
+        """Return the timezone of the zappi from its UTC offset (tz) and daylight savings (dst) settings.
 
         Args:
             serial (int): The serial number of the zappi
-            history_type (str): Whether to get history by Minute or by Hour
-            date (datetime): The date for which to obtain the history
         """
-        self._check_serial(MyenergiType.ZAPPI, serial)
-        results = self._api_request(self._create_url(endpoint=MyEnergiEndpoint[history_type.value], serial=serial,
-                                                     parm=f"-{date}"))
-        serstring = f"U{serial}"
+        serial = self._check_serial(MyenergiType.ZAPPI, serial)
+        myzappi = self._devices.zappi[serial]
+        return timezone(timedelta(hours=myzappi.tz + myzappi.dst))
+
+    def _build_history(self, serial: int, history_type: History, results: json, tz: timezone = None,
+                       device: MyenergiType = MyenergiType.ZAPPI) -> myenergi.const.hourly_history:
+        """Load the output of a history call into the history dataclass of the relevant type.
+
+        Args:
+            serial (int): The serial number of the device
+            history_type (History): Whether the history is by Minute or by Hour
+            results (json): Output from the myenergi history endpoint
+            tz (timezone, optional): Timezone to convert the UTC timestamps to. Defaults to None.
+            device (MyenergiType, optional): The type of device, a Zappi or an Eddi. Defaults to ZAPPI.
+        """
         if history_type == History.MINUTE:
             myhistory = myenergi.const.minute_history(serial)
-            for entry in results[serstring]:
-                myhistory.history_data.append(myenergi.const.minute_data(**entry))
-        elif history_type == History.HOUR:
+        else:
             myhistory = myenergi.const.hourly_history(serial)
-            for entry in results[serstring]:
-                myhistory.history_data.append(myenergi.const.hourly_data(**entry))
+        record_type = HISTORY_RECORDS[(device, history_type)]
+        for entry in results[f"U{serial}"]:
+            myhistory.history_data.append(record_type(**entry, tz=tz))
         return myhistory
 
-    def set_zappi_minimum_green_limit(self, serial: int, percentage: int) -> None:
-        """Set the Zappi minimum green limit.
+    @staticmethod
+    def _build_frame(serial: int, history_type: History, results: json,
+                     device: MyenergiType = MyenergiType.ZAPPI) -> HistoryFrame:
+        """Load the output of a history call into a HistoryFrame.
 
         Args:
-            serial (int): The serial number of the zappi
-            percentage (int): The percentage to get the minimum green limit to
+            serial (int): The serial number of the device
+            history_type (History): Whether the history is by Minute or by Hour
+            results (json): Output from the myenergi history endpoint
+            device (MyenergiType, optional): The type of device, a Zappi or an Eddi. Defaults to ZAPPI.
         """
-        self._check_serial(MyenergiType.ZAPPI, serial)
-        current_percentage = self.get_zappi_info(serial, ZappiData.MINIMUM_GREEN_LIMIT)
-        if percentage == current_percentage:
-            self.logger.info(f"Minimum green limit for Zappi SN: {serial} is already {percentage}")
-        else:
-            # set the Zappi minimum green limit as requested
-            self.logger.info(f"Setting minimum green limit for Zappi SN:"
-                             f"{serial} to {percentage} from {current_percentage}")
-            self._api_request(self._create_url(endpoint=MyEnergiEndpoint.ZAPPI_MINGREEN, serial=serial,
-                                               parm=f"-{percentage}"))
-            while percentage != self.get_zappi_info(serial, ZappiData.MINIMUM_GREEN_LIMIT):
-                time.sleep(3)
-                self.refresh_status(MyenergiType.ZAPPI, serial)
-            self.logger.info(f"Minimum green limit for Zappi SN:{serial} has been switched to {percentage}")
+        if HistoryFrame is None:
+            raise ImportError("numpy is required to use HistoryFrame")
+        return HistoryFrame.from_records(serial, history_type, results[f"U{serial}"], device)
 
-    def set_eddi_mode(self, serial: int, mode: EddiMode) -> None:
-        """Set the Zappi mode and wait until the mode has changed
+    def _history_items(self, device: MyenergiType, serial: int, history_type: History, records,
+                       chunk_size: int = None, tz: timezone = None):
+        """Yield history records as data entries, or as HistoryFrames of up to chunk_size records.
 
         Args:
-            serial (int): The serial number of the Eddi
-            mode (ZappiMode): The mode to set the Eddi to from the list in ZappiMode
+            device (MyenergiType): The type of device, a Zappi or an Eddi
+            serial (int): The serial number of the device
+            history_type (History): Whether the history is by Minute or by Hour
+            records: The records of the history as returned by the myenergi history endpoint
+            chunk_size (int, optional): The records in each HistoryFrame, or None for data entries.
+                Defaults to None.
+            tz (timezone, optional): Timezone to convert the UTC timestamps of data entries to. Defaults to None.
         """
-        self._check_serial(MyenergiType.EDDI, serial)
-        self.logger.info(f"Setting mode for Eddi SN: {serial} to {mode.name}")
-        self._api_request(self._create_url(endpoint=MyEnergiEndpoint.EDDI_MODE, serial=serial,
-                                           parm=f"{mode.value}"))
+        if chunk_size is None:
+            record_type = HISTORY_RECORDS[(device, history_type)]
+            for entry in records:
+                yield record_type(**entry, tz=tz)
+            return
+        for chunk in batched(records, chunk_size):
+            with self._build_timer(HISTORY_ENDPOINTS[(device, history_type)]):
+                frame = self._build_frame(serial, history_type, {f"U{serial}": chunk}, device)
+            yield frame
 
-    def set_zappi_mode(self, serial: int, mode: ZappiMode) -> None:
-        """Set the Zappi mode and wait until the mode has changed
+    @classmethod
+    def _join_frames(cls, serial: int, history: myenergi.const.history_range,
+                     device: MyenergiType = MyenergiType.ZAPPI) -> HistoryFrame:
+        """Join the frames for each day of a range of history into one frame.
 
         Args:
-            serial (int): The serial number of the zappi
-            mode (ZappiMode): The mode to set the Zappi to from the list in ZappiMode
+            serial (int): The serial number of the device
+            history (history_range): The frames for each day of the range
+            device (MyenergiType, optional): The type of device, a Zappi or an Eddi. Defaults to ZAPPI.
         """
-        self._check_serial(MyenergiType.ZAPPI, serial)
-        current_mode = self.get_zappi_info(serial, ZappiData.MODE)
-        if ZappiMode[mode] == current_mode:
-            self.logger.info(f"Mode for Zappi SN: {serial} is already {mode}")
-        else:
-            # set the Zappi mode as requested
-            self.logger.info(f"Setting mode for Zappi SN: {serial} to {mode} from {ZappiMode(current_mode).name}")
-            self._api_request(self._create_url(endpoint=MyEnergiEndpoint.ZAPPI_MODE, serial=serial,
-                                               parm=f"{ZappiModeParm[mode].value}"))
-            start_time = time.monotonic()
-            while ZappiMode[mode] != self.get_zappi_info(serial, ZappiData.MODE):
-                time.sleep(3)
-                self.refresh_status(MyenergiType.ZAPPI, serial)
-                if time.monotonic() > (start_time + 60):
-                    raise myenergi.error.TimeoutError(f"Timed out waiting for mode for Zappi SN:{serial} to switch")
-            self.logger.info(f"Mode for Zappi SN:{serial} has been switched to {mode}")
+        frames = list(history.history[serial].values())
+        if not frames:
+            return cls._build_frame(serial, history.history_type, {f"U{serial}": []}, device)
+        return HistoryFrame.concat(frames)
 
-    def set_eddi_boost(self, serial: int, heater: int = 1, boost_time: int = 0) -> None:
-        """Start or stop the Eddi boost.
+    @staticmethod
+    def _summarise_day(today: datetime, history: myenergi.const.hourly_history) -> myenergi.const.daily_data:
+        """Total the hourly history for a day into a daily data entry, rounding each total once it is summed.
 
         Args:
-            serial (int): Serial number of the Zappi to boost - or all will be boosted
-            heater (int) : Number of the heater to boost
-            boost_time (int, optional): time for boost. Defaults to 0 which cancels boost
+            today (datetime): The date which the history is for
+            history (hourly_history): The hourly history for the day
         """
-        self._check_serial(MyenergiType.ZAPPI, serial)
-        # set the Zappi to boost for the desired kWh
-        if boost_time == 0:
-            parm = f"-1-{heater}-{boost_time}"
-            self.logger.info(f"Stopping boost for Eddi SN: {serial}")
-        else:
-            parm = f"-10-{heater}-{boost_time}"
-            self.logger.info(f"Starting boost for Eddi SN:{serial} for {boost_time} minutes")
-        self._api_request(self._create_url(endpoint=MyEnergiEndpoint.EDDI_BOOST, serial=serial, parm=parm))
+        summary_data = myenergi.const.daily_data(today)
+        for stat in myenergi.const.ZappiStats:
+            setattr(summary_data, stat.value, round(math.fsum(getattr(data, stat.value)
+                                                              for data in history.history_data), 2))
+        return summary_data
 
-    def set_zappi_boost(self, serial: int, boost: ZappiBoost = ZappiBoost.STOP,
-                        kwh: int = 0, boost_time: str = None) -> None:
-        """Start or stop the Zappi boost.
+    @staticmethod
+    def _date_range(start: str, end: str) -> list:
+        """Return the list of date strings from start to end inclusive in date order.
 
         Args:
-            serial (int): Serial number of the Zappi to boost - or all will be boosted
-            boost (ZappiBoost, optional): Start, Stop or Smart boost. Defaults to ZappiBoost.STOP.
-            kwh (int, optional): kwn to boost. Defaults to 0.
-            boost_time (int, optional): time for smart boost. Defaults to None.
+            start (str): The first date in the format YYYY-MM-DD
+            end (str): The last date in the format YYYY-MM-DD
+        """
+        first = datetime.strptime(start, "%Y-%m-%d")
+        last = datetime.strptime(end, "%Y-%m-%d")
+        if first > last:
+            raise myenergi.error.ParameterError(f"Start date {start} is after end date {end}")
+        return [datetime.strftime(first + timedelta(days=day), "%Y-%m-%d") for day in range((last - first).days + 1)]
+
+    def _collect_range(self, history: myenergi.const.history_range, results: dict) -> myenergi.const.history_range:
+        """Sort the results of fetching a range of history into the history and the failures.
+
+        Args:
+            history (history_range): The history range to add the results to
+            results (dict): The history or the error raised for each (serial, date) in date order
+        """
+        for (serial, day), result in results.items():
+            history.history.setdefault(serial, {})
+            if isinstance(result, BaseException):
+                self.logger.error("Unable to get history for SN: %s on %s: %s", serial, day, result)
+                history.failures.setdefault(serial, {})[day] = result
+            else:
+                history.history[serial][day] = result
+        return history
+
+    def _daily_totals(self, serial: int, history: myenergi.const.history_range) -> myenergi.const.daily_history:
+        """Total each day of a range of hourly history into the daily history for a device.
+
+        Args:
+            serial (int): The serial number of the device
+            history (history_range): The hourly history for the range of days
+        """
+        daily_history = myenergi.const.daily_history(serial)
+        for day, hourly in history.history[serial].items():
+            daily_history.history_data.append(self._summarise_day(datetime.strptime(day, "%Y-%m-%d"), hourly))
+        return daily_history
+
+    def _zappi_boost_parm(self, serial: int, boost: ZappiBoost, kwh: int, boost_time: str) -> str:
+        """Create the API parameter needed to start or stop a Zappi boost.
+
+        Args:
+            serial (int): Serial number of the Zappi to boost
+            boost (ZappiBoost): Start, Stop or Smart boost
+            kwh (int): kwh to boost
+            boost_time (int): time for smart boost
         """
-        self._check_serial(MyenergiType.ZAPPI, serial)
-        # set the Zappi to boost for the desired kWh
         if boost == ZappiBoost.START.name:
             if kwh == 0:
                 raise myenergi.error.ParameterError("START boost specified without required values")
             else:
                 parm = f"{ZappiBoost[boost].value}{kwh}-0000"
-                self.logger.info(f"Starting boost for Zappi SN:{serial} to charge {kwh} kWh")
+                self.logger.info("Starting boost for Zappi SN:%s to charge %s kWh", serial, kwh)
         elif boost == ZappiBoost.SMART.name:
             if (kwh == 0) or (boost_time is None):
                 raise myenergi.error.ParameterError("SMART boost specified without required values")
             else:
                 parm = f"{ZappiBoost[boost].value}{kwh}-{boost_time}"
-                self.logger.info(f"Starting smart boost for Zappi SN: {serial} to charge {kwh} kWh by {boost_time}")
+                self.logger.info("Starting smart boost for Zappi SN: %s to charge %s kWh by %s", serial, kwh,
+                                 boost_time)
         elif boost == ZappiBoost.STOP.name:
             parm = f"{ZappiBoost[boost].value}"
-            self.logger.info(f"Stopping boost for Zappi SN: {serial}")
-        self._api_request(self._create_url(endpoint=MyEnergiEndpoint.ZAPPI_MODE, serial=serial, parm=parm))
+            self.logger.info("Stopping boost for Zappi SN: %s", serial)
+        return parm
+
+    def _eddi_boost_parm(self, serial: int, heater: int, boost_time: int) -> str:
+        """Create the API parameter needed to start or stop an Eddi boost.
 
-    def _api_request(self, url: str) -> json:
-        """Call the REST API with the passed URL and check the response before returning the JSON results.
         Args:
-            url (str): URL to be passed to the REST API
-        Returns:
-            json: The json returned by the REST API
+            serial (int): Serial number of the Eddi to boost
+            heater (int) : Number of the heater to boost
+            boost_time (int): time for boost, 0 cancels boost
+        """
+        if boost_time == 0:
+            parm = f"-1-{heater}-{boost_time}"
+            self.logger.info("Stopping boost for Eddi SN: %s", serial)
+        else:
+            parm = f"-10-{heater}-{boost_time}"
+            self.logger.info("Starting boost for Eddi SN:%s for %s minutes", serial, boost_time)
+        return parm
+
+    def _command_call(self, command, timeout: float) -> tuple:
+        """Return the setter which carries out a command and the arguments to call it with.
+
+        The setters which confirm their changes are called without waiting so that they return a future.
+
+        Args:
+            command: One of the command dataclasses from myenergi.const
+            timeout (float): Seconds to wait for a change to be confirmed
+        """
+        if isinstance(command, myenergi.const.zappi_mode_command):
+            return self.set_zappi_mode, {"serial": command.serial, "mode": command.mode,
+                                         "wait": False, "timeout": timeout}
+        if isinstance(command, myenergi.const.zappi_boost_command):
+            return self.set_zappi_boost, {"serial": command.serial, "boost": command.boost, "kwh": command.kwh}
+        if isinstance(command, myenergi.const.zappi_smart_boost_command):
+            return self.set_zappi_boost, {"serial": command.serial, "boost": ZappiBoost.SMART.name,
+                                          "kwh": command.kwh, "boost_time": command.boost_time}
+        if isinstance(command, myenergi.const.zappi_min_green_command):
+            return self.set_zappi_minimum_green_limit, {"serial": command.serial, "percentage": command.percentage,
+                                                        "wait": False, "timeout": timeout}
+        if isinstance(command, myenergi.const.eddi_boost_command):
+            return self.set_eddi_boost, {"serial": command.serial, "heater": command.heater,
+                                         "boost_time": command.boost_time}
+        if isinstance(command, myenergi.const.eddi_mode_command):
+            return self.set_eddi_mode, {"serial": command.serial, "mode": command.mode}
+        raise myenergi.error.ParameterError(f"Unknown command {command}")
+
+    @staticmethod
+    def _command_queues(commands: list) -> list:
+        """Group the positions of the commands by device, keeping the order of the commands for each device.
+
+        Args:
+            commands (list): The commands to group
+        """
+        queues = {}
+        for index, command in enumerate(commands):
+            queues.setdefault((command.device, str(command.serial)), []).append(index)
+        return list(queues.values())
+
+    def _check_response(self, data: json) -> None:
+        """Check if the API returned a non-zero status response - status is not always returned.
+
+        Args:
+            data (json): The json returned by the REST API
         """
-        try:
-            self.logger.debug(f"Calling Myenergi API with URL: {url}")
-            results = self._session.get(url)
-            # Check the REST API response status
-            if results.status_code != requests.codes.ok:
-                self.logger.error(f"Myenergi API returned status code: {results.status_code}")
-                results.raise_for_status()
-        except requests.exceptions.HTTPError as err:
-            self.close()
-            raise SystemExit(err) from err
-        except requests.exceptions.RequestException as err:
-            self.close()
-            raise SystemExit(err) from err
-        # Get the JSON data from the results of the API call.
-        data = results.json()
-        self.logger.debug(f"Formatted API results:\n {json.dumps(data, indent=2)}")
-        # Then check if there is a non-zero status response provided - status is not always returned
         if MyenergiType.STATUS.value in data:
             if data.get(MyenergiType.STATUS.value) != 0:
-                self.logger.error(f"Myenergi API returned status: {data.get(MyenergiType.STATUS.value)}")
-                self.close()
+                self.logger.error("Myenergi API returned status: %s", data.get(MyenergiType.STATUS.value))
                 raise myenergi.error.ResponseError(data.get(MyenergiType.STATUS.value))
-        return data
+
+    def _cached_asn(self) -> str | None:
+        """Return the server cached for the hub or None if there is no cache or nothing cached."""
+        if self._asn_cache is None:
+            return None
+        return self._asn_cache.get(self._serial)
+
+    def _server_url(self, asn: str) -> str:
+        """Return the base URL of a server named by the director.
+
+        Args:
+            asn (str): The host name of the server
+        """
+        return f"{self._scheme}://{asn}/"
+
+    def _set_asn(self, asn: str) -> None:
+        """Send the following requests to a server and remember it for the hub if it has changed.
+
+        Args:
+            asn (str): The host name of the server named by the director or a response
+        """
+        url = self._server_url(asn)
+        if url != self._url:
+            self.logger.debug("Using myenergi server %s for hub:%s", asn, self._serial)
+            self._url = url
+            if self._asn_cache is not None:
+                self._asn_cache.put(self._serial, asn)
+
+    def _breaker(self, url: str) -> CircuitBreaker:
+        """Return the circuit breaker for the server a URL is on.
+
+        Args:
+            url (str): The URL of the request
+        """
+        host = urlsplit(url).netloc
+        breaker = self._breakers.get(host)
+        if breaker is None:
+            breaker = self._breakers.setdefault(host, CircuitBreaker(host))
+        return breaker
+
+    def _check_breaker(self, breaker: CircuitBreaker) -> None:
+        """Raise CircuitOpenError if requests to the server are currently refused.
+
+        Args:
+            breaker (CircuitBreaker): The circuit breaker for the server
+        """
+        try:
+            breaker.check()
+        except myenergi.error.CircuitOpenError:
+            self.stats.count("rejected")
+            raise
+
+    def _record_request(self, url: str, breaker: CircuitBreaker, started: float,
+                        error: myenergi.error.MyEnergiError = None) -> None:
+        """Count a request against the stats and the circuit breaker and raise the error if it failed.
+        A client error such as a bad password shows the server is working so it is not counted as a failure.
+
+        Args:
+            url (str): The URL of the request
+            breaker (CircuitBreaker): The circuit breaker for the server
+            started (float): The monotonic time the request was made
+            error (MyEnergiError, optional): The error if the request failed. Defaults to None.
+        """
+        self.stats.record(time.monotonic() - started, error is not None)
+        if error is not None and self.metrics is not None:
+            self.metrics.record_request(url, time.monotonic() - started, failed=True)
+        if error is None or (isinstance(error, myenergi.error.HTTPError) and error.status_code < 500):
+            breaker.record_success()
+        else:
+            breaker.record_failure()
+        if error is not None:
+            self.logger.error("Myenergi API request failed: %s", error)
+            raise error
+
+    def _retry_delay(self, url: str, error: myenergi.error.MyEnergiError, attempt: int) -> float | None:
+        """Return the seconds to wait before retrying a failed request or None if it should not be retried.
+        Only requests which read data are retried, after timeouts, connection failures and server errors.
+
+        Args:
+            url (str): The URL of the request
+            error (MyEnergiError): The error the request failed with
+            attempt (int): The number of the retry starting from 1
+        """
+        retriable = (isinstance(error, (myenergi.error.RequestTimeoutError, myenergi.error.ConnectionError)) or
+                     (isinstance(error, myenergi.error.HTTPError) and error.status_code >= 500))
+        if not retriable or not is_idempotent(url) or attempt > self.retry.retries:
+            return None
+        self.stats.count("retries")
+        delay = self.retry.delay(attempt)
+        self.logger.warning("Retrying %s in %.1f seconds after error: %s", url, delay, error)
+        return delay
+
+    def _busy_delay(self, data: json, attempt: int) -> float | None:
+        """Return the seconds to wait before retrying a request refused because the server is busy sending another
+        command to the device, or None if the request was not refused or has been retried enough.
+
+        Args:
+            data (json): The json returned by the REST API
+            attempt (int): The number of the retry starting from 1
+        """
+        if not is_busy(data) or attempt > self.retry.busy_retries:
+            return None
+        self.stats.count("busy")
+        delay = self.retry.busy_wait(attempt)
+        self.logger.warning("Myenergi server busy sending a command to the device, retrying in %s seconds", delay)
+        return delay
+
+    def _check_status(self, url: str, data: json) -> None:
+        """Check the status returned by a request, counting a non-zero status as an error of the endpoint.
+
+        Args:
+            url (str): The URL of the request
+            data (json): The json returned by the REST API
+        """
+        try:
+            self._check_response(data)
+        except myenergi.error.ResponseError:
+            if self.metrics is not None:
+                self.metrics.record_error(url)
+            raise
 
     def _create_url(self, serial: str = "", parm: str = "",
                     endpoint: MyEnergiEndpoint = MyEnergiEndpoint.DEVICES) -> str:
@@ -399,62 +727,849 @@ class API:
         """
         return f"{self._url}{endpoint.value}{serial}{parm}"
 
-    def _check_serial(self, device: MyenergiType, serial: str) -> None:
+    @staticmethod
+    def _normalise_serial(serial: int | str) -> int:
+        """Return a serial number given as an int or str as the int used by the API.
+
+        Args:
+            serial (int | str): The serial number
+        """
+        try:
+            return int(str(serial).strip())
+        except ValueError:
+            raise myenergi.error.ParameterError(f"Serial number {serial} is not a number") from None
+
+    def _check_serial(self, device: MyenergiType, serial: int | str) -> int:
         """Check whether the serial number exists and is the type of device specified.
         Args:
             device (MyenergiType): The type of device to look for
-            serial (str): the serial number to look for
+            serial (int | str): the serial number to look for
+        Returns:
+            int: The serial number as used by the API
         """
-        for key in getattr(self._devices, device.value).keys():
-            if str(key) == str(serial):
-                return
-        raise myenergi.error.ParameterError("Serial number does not exist")
+        self._ensure_devices()
+        serial = self._normalise_serial(serial)
+        entry = self._registry.get(serial)
+        if entry is None or entry[0] != device:
+            raise myenergi.error.ParameterError("Serial number does not exist")
+        return serial
+
+    def _apply_results(self, entries: list) -> myenergi.const.status_changes:
+        """Parse the results of a status query holding the status lock, recording the versions before and after.
 
-    def _parse_api_results(self, entry: json) -> None:
+        Args:
+            entries (list): The entries returned by the myenergi API
+        Returns:
+            status_changes: The names of the fields which changed for each device with the status versions
+        """
+        with self._status_lock:
+            previous = self._status_version
+            changed = {}
+            for entry in entries:
+                changed.update(self._parse_api_results(entry))
+            return myenergi.const.status_changes(changed, previous, self._status_version)
+
+    def _parse_api_results(self, entry: json) -> dict:
         """Parses the output of an API call that provides information about myenergi devices
         The output is loaded into dataclass instances for the different device types
         which will validate the data received and create a default for missing values
 
         Args:
             entry (json): Output from the myenergi API providing device information
+        Returns:
+            dict: The names of the fields which changed for each device which changed, appeared or was removed
         """
+        changed = {}
         for key, val in entry.items():
             if key == MyenergiType.EDDI.value:
                 if val:
                     for device in val:
-                        sno = device[EddiData.SERIAL_NUMBER.value]
-                        self.logger.debug(f"Eddi data discovered with serial number: {sno}")
-                        self._devices.eddi.update({sno: myenergi.const.eddi(**device)})
+                        sno = self._normalise_serial(device[EddiData.SERIAL_NUMBER.value])
+                        self.logger.debug("Eddi data discovered with serial number: %s", sno)
+                        if fields_changed := self._store_device(MyenergiType.EDDI, sno, device):
+                            changed[sno] = fields_changed
                 else:
-                    self._devices.eddi = None
+                    changed.update(self._clear_devices(MyenergiType.EDDI))
             elif key == MyenergiType.HARVI.value:
                 if val:
                     for device in val:
-                        sno = device[HarviData.SERIAL_NUMBER.value]
-                        self.logger.debug(f"Harvi data discovered with serial number: {sno}")
-                        self._devices.harvi.update({sno: myenergi.const.harvi(**device)})
+                        sno = self._normalise_serial(device[HarviData.SERIAL_NUMBER.value])
+                        self.logger.debug("Harvi data discovered with serial number: %s", sno)
+                        if fields_changed := self._store_device(MyenergiType.HARVI, sno, device):
+                            changed[sno] = fields_changed
                 else:
-                    self._devices.harvi = None
+                    changed.update(self._clear_devices(MyenergiType.HARVI))
             elif key == MyenergiType.LIBBI.value:
                 if val:
                     for device in val:
-                        sno = device[LibbiData.SERIAL_NUMBER.value]
-                        self.logger.debug(f"Libbi data discovered with serial number: {sno}")
-                        self._devices.libbi.update({sno: myenergi.const.libbi(**device)})
+                        sno = self._normalise_serial(device[LibbiData.SERIAL_NUMBER.value])
+                        self.logger.debug("Libbi data discovered with serial number: %s", sno)
+                        if fields_changed := self._store_device(MyenergiType.LIBBI, sno, device):
+                            changed[sno] = fields_changed
                 else:
-                    self._devices.libbi = None
+                    changed.update(self._clear_devices(MyenergiType.LIBBI))
             elif key == MyenergiType.ZAPPI.value:
                 if val:
                     for device in val:
-                        sno = device[ZappiData.SERIAL_NUMBER.value]
-                        self.logger.debug(f"Zappi data discovered with serial number: {sno}")
-                        self._devices.zappi.update({sno: myenergi.const.zappi(**device)})
+                        sno = self._normalise_serial(device[ZappiData.SERIAL_NUMBER.value])
+                        self.logger.debug("Zappi data discovered with serial number: %s", sno)
+                        if fields_changed := self._store_device(MyenergiType.ZAPPI, sno, device):
+                            changed[sno] = fields_changed
                 else:
-                    self._devices.zappi = None
+                    changed.update(self._clear_devices(MyenergiType.ZAPPI))
             elif key == MyenergiType.URL.value:
-                self._url = f"https://{val}/"
+                self._set_asn(val)
                 self._devices.asn = val
             elif key == MyenergiType.FIRMWARE.value:
                 self._devices.fwv = val
             else:
-                self.logger.error(f"Unknown api results returned: key= {key} value= {val}")
+                self.logger.error("Unknown api results returned: key= %s value= %s", key, val)
+        if changed:
+            self._status_version += 1
+        return changed
+
+
+class API(APIBase):
+    """
+    A Python module that enables the use of the myenergi API.
+
+    Args:
+        serial (str): The serial number of the hub
+        password (str): The password for the account
+    """
+
+    def __init__(self, serial: str = None, password: str = None, cache: HistoryCache = None,
+                 asn_cache: ASNCache = None, eager: bool = True, retry: RetryPolicy = None,
+                 request_timeout: tuple = DEFAULT_TIMEOUT, pool_size: int = 8, metrics: Metrics = None,
+                 director_url: str = MyEnergiEndpoint.DIRECTOR_URL.value, confirm_workers: int = None) -> None:
+        """Initialise the Myenergi client and perform an initial query.
+
+        With eager=False the initial query is not made. The devices are queried the first time they are needed
+        and the boost times for each device the first time they are asked for.
+
+        Args:
+            serial (str, optional): Serial number of the myenergi hub. Defaults to None.
+            password (str, optional): password for the myenergi hub. Defaults to None.
+            cache (HistoryCache, optional): Cache to read history through. Defaults to None.
+            asn_cache (ASNCache, optional): Cache of the server for the hub. Defaults to None.
+            eager (bool, optional): Query the devices and their boost times now. Defaults to True.
+            retry (RetryPolicy, optional): How failed requests are retried. Defaults to RetryPolicy().
+            request_timeout (tuple, optional): Connect and read timeouts in seconds. Defaults to DEFAULT_TIMEOUT.
+            pool_size (int, optional): Connections to keep open to each server, which should be at least the
+                number of workers used to fetch history or send commands. Defaults to 8.
+            metrics (Metrics, optional): Where to record per endpoint metrics. Defaults to None.
+            director_url (str, optional): The director which names the server for the hub, such as a local
+                test server. Defaults to MyEnergiEndpoint.DIRECTOR_URL.
+            confirm_workers (int, optional): Number of changes confirmed in parallel, which should be at least the
+                number of workers used to send commands. Defaults to pool_size.
+        """
+        super().__init__(serial, password, cache, asn_cache, retry, request_timeout, metrics, director_url)
+        self._confirmations = None
+        self._confirm_workers = pool_size if confirm_workers is None else confirm_workers
+        self._devices_loaded = False
+        self._boost_times_loaded = set()
+        # The devices may be queried lazily by the threads used to send commands or fetch history
+        self._lazy_lock = threading.RLock()
+        # Create a session for the API requests
+        self._session = requests.Session()
+        self._session.mount(f"{self._scheme}://", requests.adapters.HTTPAdapter(pool_maxsize=pool_size))
+        self._session.headers.update(MyEnergiEndpoint.API_HEADERS.value)
+        # Share the digest nonce between threads so that only the first request to each server is challenged
+        self._session.auth = SharedDigestAuth(serial, password, self.stats)
+        # Find the server for this hub
+        self._connect()
+        if eager:
+            # Perform an initial query to the hub to get the list of devices and their attributes
+            self.refresh_devices()
+            # Get the boost times for all Zappis
+            for serial in self.get_serials(MyenergiType.ZAPPI):
+                self._get_zappi_boost_times(serial)
+            # Get the boost times for all Eddis
+            for serial in self.get_serials(MyenergiType.EDDI):
+                self._get_eddi_boost_times(serial)
+
+    def __enter__(self) -> "API":
+        """Entry function for the myenergi API."""
+        return self
+
+    def __exit__(self, exc_type, exc_value, exc_traceback) -> None:
+        """Exit function for the myenergi API."""
+        self.close()
+
+    def close(self) -> None:
+        """Wait for any outstanding confirmations and close the requests session."""
+        with self._lazy_lock:
+            confirmations, self._confirmations = self._confirmations, None
+        if confirmations is not None:
+            confirmations.close()
+        self._session.close()
+
+    @property
+    def confirmations(self) -> ConfirmationEngine:
+        """Return the engine used to confirm changes to the Zappis, creating it when first used."""
+        if self._confirmations is None:
+            with self._lazy_lock:
+                if self._confirmations is None:
+                    self._confirmations = ConfirmationEngine(self, workers=self._confirm_workers)
+        return self._confirmations
+
+    def _connect(self) -> None:
+        """Use the server cached for this hub, asking the director for the server if none is cached.
+        A cached server is not trusted until it has responded, see _api_request."""
+        asn = self._cached_asn()
+        if asn is None:
+            self._resolve_asn()
+        else:
+            self._url = self._server_url(asn)
+            self._asn_verified = False
+
+    def _resolve_asn(self) -> None:
+        """Call the director URL to get the server for this hub which is returned in a header field."""
+        try:
+            results = self._session.get(self.director_url, timeout=self.request_timeout)
+        except requests.exceptions.RequestException as err:
+            raise myenergi.error.ConnectionError(f"Unable to reach the myenergi director: {err}") from err
+        asn = results.headers.get(MyEnergiEndpoint.ASN_HEADER_FIELD.value)
+        if asn is None:
+            raise myenergi.error.HTTPError(results.status_code, "the director did not return a server for the hub")
+        self._set_asn(asn)
+        self._asn_verified = True
+
+    def _ensure_devices(self) -> None:
+        """Query the devices the first time they are needed if they were not queried on initialisation."""
+        if not self._devices_loaded:
+            with self._lazy_lock:
+                if not self._devices_loaded:
+                    self.refresh_devices()
+
+    def _ensure_boost_times(self, device: MyenergiType, serial: int) -> None:
+        """Query the boost times for a device the first time they are needed if they were not queried on
+        initialisation.
+
+        Args:
+            device (MyenergiType): The type of device
+            serial (int): The serial number of the device
+        """
+        if (device, serial) not in self._boost_times_loaded:
+            with self._lazy_lock:
+                if (device, serial) not in self._boost_times_loaded:
+                    if device == MyenergiType.ZAPPI:
+                        self._get_zappi_boost_times(serial)
+                    else:
+                        self._get_eddi_boost_times(serial)
+
+    def refresh_devices(self) -> myenergi.const.status_changes:
+        """Refresh the information stored for all devices with a single call to the myenergi API.
+        The boost times are not refreshed.
+
+        Returns:
+            status_changes: The names of the fields which changed for each device which changed, appeared or was
+                removed, with the status versions before and after the refresh
+        """
+        results = self._api_request(self._create_url())
+        with self._build_timer(MyEnergiEndpoint.DEVICES):
+            changed = self._apply_results(results)
+        self._devices_loaded = True
+        return changed
+
+    def refresh_status(self, device: MyenergiType, serial: int, boost_times: bool = True) -> set:
+        """Refresh the information stored for a device by calling the myenergi API.
+
+        Args:
+            device (str): The type of device to return
+            serial (int): The serial number of the device
+            boost_times (bool, optional): Whether to refresh the boost times as well. Defaults to True.
+        Returns:
+            set: The names of the status fields which changed, the boost times are not compared
+        """
+        serial = self._check_serial(device, serial)
+        results = self._api_request(self._create_url(endpoint=MyEnergiEndpoint[device.name], serial=serial))
+        with self._build_timer(MyEnergiEndpoint[device.name]):
+            changed = self._apply_results([results])
+        if boost_times and device == MyenergiType.ZAPPI:
+            self._get_zappi_boost_times(serial)
+        if boost_times and device == MyenergiType.EDDI:
+            self._get_eddi_boost_times(serial)
+        return changed.get(serial, set())
+
+    def _get_eddi_boost_times(self, serial: int) -> None:
+        """Get the current Eddi boost times.
+
+        Args:
+            serial (int): The serial number of the Eddi
+        """
+        serial = self._check_serial(MyenergiType.EDDI, serial)
+        results = self._api_request(self._create_url(endpoint=MyEnergiEndpoint.EDDI_BOOST_TIME, serial=serial))
+        with self._build_timer(MyEnergiEndpoint.EDDI_BOOST_TIME):
+            self._set_boost_times(MyenergiType.EDDI, serial, results)
+        self._boost_times_loaded.add((MyenergiType.EDDI, serial))
+
+    def _get_zappi_boost_times(self, serial: int) -> None:
+        """Get the current Zappi boost times.
+
+        Args:
+            serial (int): The serial number of the zappi
+        """
+        serial = self._check_serial(MyenergiType.ZAPPI, serial)
+        results = self._api_request(self._create_url(endpoint=MyEnergiEndpoint.ZAPPI_BOOST_TIME, serial=serial))
+        with self._build_timer(MyEnergiEndpoint.ZAPPI_BOOST_TIME):
+            self._set_boost_times(MyenergiType.ZAPPI, serial, results)
+        self._boost_times_loaded.add((MyenergiType.ZAPPI, serial))
+
+    def get_zappi_daily_total(self, serial: int, date: str, querydays: int = 1) -> myenergi.const.daily_history:
+        """Get the daily total history information for the date and serial provided
+        The days are returned in date order and any days which could not be obtained are logged and left out.
+
+        Args:
+            serial (int): The serial number of the zappi
+            date (datetime): The date for which to obtain the history
+            querydays (int): The number of days to query counting back from today
+        """
+        serial = self._check_serial(MyenergiType.ZAPPI, serial)
+        start = datetime.strptime(date, "%Y-%m-%d") - timedelta(days=querydays-1)
+        history = self.get_zappi_history_range([serial], datetime.strftime(start, "%Y-%m-%d"), date)
+        return self._daily_totals(serial, history)
+
+    def get_zappi_history_range(self, serials: list, start: str, end: str, history_type: History = History.HOUR,
+                                workers: int = 4) -> myenergi.const.history_range:
+        """Get Zappi history of the relevant type for a range of dates for one or more Zappis.
+        The days are fetched in parallel using a pool of worker threads and each request is retried by the retry
+        policy of the client. Days which still fail are reported in the failures of the result without losing the
+        other days.
+
+        Args:
+            serials (list): The serial numbers of the zappis
+            start (str): The first date for which to obtain the history in the format YYYY-MM-DD
+            end (str): The last date for which to obtain the history in the format YYYY-MM-DD
+            history_type (History, optional): Whether to get history by Minute or by Hour. Defaults to Hour.
+            workers (int, optional): The number of days to fetch at once. Defaults to 4.
+        """
+        serials = [self._check_serial(MyenergiType.ZAPPI, serial) for serial in serials]
+        return self._fetch_range(self.get_zappi_history, serials, start, end, history_type, workers)
+
+    def get_zappi_history_frame(self, serial: int, history_type: History, start: str, end: str = None,
+                                workers: int = 4) -> HistoryFrame:
+        """Get Zappi history of the relevant type as a HistoryFrame holding one array per field.
+        The days from start to end are fetched in parallel and joined in date order. Days which cannot be
+        obtained are logged and left out.
+
+        Args:
+            serial (int): The serial number of the zappi
+            history_type (History): Whether to get history by Minute or by Hour
+            start (str): The first date for which to obtain the history in the format YYYY-MM-DD
+            end (str, optional): The last date for which to obtain the history. Defaults to the start date.
+            workers (int, optional): The number of days to fetch at once. Defaults to 4.
+        """
+        serial = self._check_serial(MyenergiType.ZAPPI, serial)
+        history = self._fetch_range(self._get_zappi_frame, [serial], start, end or start, history_type, workers)
+        return self._join_frames(serial, history)
+
+    def get_eddi_history_range(self, serials: list, start: str, end: str, history_type: History = History.HOUR,
+                               workers: int = 4) -> myenergi.const.history_range:
+        """Get Eddi history of the relevant type for a range of dates for one or more Eddis.
+        The days are fetched in parallel using a pool of worker threads and each request is retried by the retry
+        policy of the client. Days which still fail are reported in the failures of the result without losing the
+        other days.
+
+        Args:
+            serials (list): The serial numbers of the eddis
+            start (str): The first date for which to obtain the history in the format YYYY-MM-DD
+            end (str): The last date for which to obtain the history in the format YYYY-MM-DD
+            history_type (History, optional): Whether to get history by Minute or by Hour. Defaults to Hour.
+            workers (int, optional): The number of days to fetch at once. Defaults to 4.
+        """
+        serials = [self._check_serial(MyenergiType.EDDI, serial) for serial in serials]
+        return self._fetch_range(self.get_eddi_history, serials, start, end, history_type, workers)
+
+    def get_eddi_history_frame(self, serial: int, history_type: History, start: str, end: str = None,
+                               workers: int = 4) -> HistoryFrame:
+        """Get Eddi history of the relevant type as a HistoryFrame holding one array per field.
+        The days from start to end are fetched in parallel and joined in date order. Days which cannot be
+        obtained are logged and left out.
+
+        Args:
+            serial (int): The serial number of the eddi
+            history_type (History): Whether to get history by Minute or by Hour
+            start (str): The first date for which to obtain the history in the format YYYY-MM-DD
+            end (str, optional): The last date for which to obtain the history. Defaults to the start date.
+            workers (int, optional): The number of days to fetch at once. Defaults to 4.
+        """
+        serial = self._check_serial(MyenergiType.EDDI, serial)
+        history = self._fetch_range(self._get_eddi_frame, [serial], start, end or start, history_type, workers)
+        return self._join_frames(serial, history, MyenergiType.EDDI)
+
+    def _get_eddi_frame(self, serial: int, history_type: History, date: str) -> HistoryFrame:
+        """Get a single day of Eddi history as a HistoryFrame.
+
+        Args:
+            serial (int): The serial number of the eddi
+            history_type (History): Whether to get history by Minute or by Hour
+            date (str): The date for which to obtain the history
+        """
+        endpoint = HISTORY_ENDPOINTS[(MyenergiType.EDDI, history_type)]
+        results = self._get_history_results(endpoint, serial, date)
+        with self._build_timer(endpoint):
+            return self._build_frame(serial, history_type, results, MyenergiType.EDDI)
+
+    def _get_zappi_frame(self, serial: int, history_type: History, date: str) -> HistoryFrame:
+        """Get a single day of Zappi history as a HistoryFrame.
+
+        Args:
+            serial (int): The serial number of the zappi
+            history_type (History): Whether to get history by Minute or by Hour
+            date (str): The date for which to obtain the history
+        """
+        results = self._get_history_results(HISTORY_ENDPOINTS[(MyenergiType.ZAPPI, history_type)], serial, date)
+        with self._build_timer(HISTORY_ENDPOINTS[(MyenergiType.ZAPPI, history_type)]):
+            return self._build_frame(serial, history_type, results)
+
+    def _fetch_range(self, method, serials: list, start: str, end: str, history_type: History,
+                     workers: int) -> myenergi.const.history_range:
+        """Call a method to get a day of history for each day in a range for each serial using a pool of threads.
+        Each request is retried by the retry policy of the client, so a day which still fails is only reported.
+
+        Args:
+            method: The method used to get the history for a day
+            serials (list): The serial numbers of the devices
+            start (str): The first date for which to obtain the history in the format YYYY-MM-DD
+            end (str): The last date for which to obtain the history in the format YYYY-MM-DD
+            history_type (History): Whether to get history by Minute or by Hour
+            workers (int): The number of days to fetch at once
+        """
+        days = self._date_range(start, end)
+        with ThreadPoolExecutor(max_workers=workers) as executor:
+            futures = {(serial, day): executor.submit(self._get_history_or_error, method, serial, history_type, day)
+                       for serial in serials for day in days}
+        results = {key: future.result() for key, future in futures.items()}
+        return self._collect_range(myenergi.const.history_range(history_type), results)
+
+    def _get_history_or_error(self, method, serial: int, history_type: History,
+                              date: str) -> myenergi.const.hourly_history | BaseException:
+        """Get the history for a single day, returning the error rather than raising it if the day fails.
+
+        Args:
+            method: The method used to get the history for a day
+            serial (int): The serial number of the device
+            history_type (History): Whether to get history by Minute or by Hour
+            date (str): The date for which to obtain the history
+        """
+        try:
+            return method(serial, history_type, date)
+        except myenergi.error.MyEnergiError as err:
+            return err
+
+    def get_eddi_history(self, serial: int, history_type: History, date: str) -> myenergi.const.hourly_history:
+        """Get Eddi history of the relevant type using the Myenergi API.
+
+        Args:
+            serial (int): The serial number of the eddi
+            history_type (str): Whether to get history by Minute or by Hour
+            date (datetime): The date for which to obtain the history
+        """
+        serial = self._check_serial(MyenergiType.EDDI, serial)
+        results = self._get_history_results(HISTORY_ENDPOINTS[(MyenergiType.EDDI, history_type)], serial, date)
+        with self._build_timer(HISTORY_ENDPOINTS[(MyenergiType.EDDI, history_type)]):
+            return self._build_history(serial, history_type, results, device=MyenergiType.EDDI)
+
+    def get_zappi_history(self, serial: int, history_type: History, date: str,
+                          local_time: bool = False) -> myenergi.const.hourly_history:
+        """Get Zappi history of the relevant type using the Myenergi API.
+
+        Args:
+            serial (int): The serial number of the zappi
+            history_type (str): Whether to get history by Minute or by Hour
+            date (datetime): The date for which to obtain the history
+            local_time (bool, optional): Give timezone aware timestamps in the zappi timezone rather than naive
+                UTC timestamps. Defaults to False.
+        """
+        serial = self._check_serial(MyenergiType.ZAPPI, serial)
+        results = self._get_history_results(HISTORY_ENDPOINTS[(MyenergiType.ZAPPI, history_type)], serial, date)
+        with self._build_timer(HISTORY_ENDPOINTS[(MyenergiType.ZAPPI, history_type)]):
+            return self._build_history(serial, history_type, results,
+                                       self.get_zappi_timezone(serial) if local_time else None)
+
+    def _get_history_results(self, endpoint: MyEnergiEndpoint, serial: int, date: str) -> json:
+        """Get the results for a day of history from the cache or else by calling the API.
+
+        Args:
+            endpoint (MyEnergiEndpoint): The history endpoint
+            serial (int): The serial number of the device
+            date (str): The date for which to obtain the history
+        """
+        results = self._cached_history(endpoint, serial, date)
+        if results is None:
+            results = self._api_request(self._create_url(endpoint=endpoint, serial=serial, parm=f"-{date}"))
+            self._cache_history(endpoint, serial, date, results)
+        return results
+
+    def stream_eddi_history(self, serial: int, history_type: History, date: str, chunk_size: int = None):
+        """Stream Eddi history of the relevant type, yielding each record as it is downloaded.
+
+        Args:
+            serial (int): The serial number of the eddi
+            history_type (History): Whether to get history by Minute or by Hour
+            date (str): The date for which to obtain the history
+            chunk_size (int, optional): Yield HistoryFrames of up to this many records rather than data entries.
+                Defaults to None.
+        Returns:
+            A generator of eddi_minute_data or eddi_hourly_data entries, or of HistoryFrames
+        """
+        serial = self._check_serial(MyenergiType.EDDI, serial)
+        return self._stream_history(MyenergiType.EDDI, serial, history_type, date, chunk_size)
+
+    def stream_zappi_history(self, serial: int, history_type: History, date: str, chunk_size: int = None,
+                             local_time: bool = False):
+        """Stream Zappi history of the relevant type, yielding each record as it is downloaded.
+        Only one chunk of the response is held in memory at a time rather than the whole day.
+
+        Args:
+            serial (int): The serial number of the zappi
+            history_type (History): Whether to get history by Minute or by Hour
+            date (str): The date for which to obtain the history
+            chunk_size (int, optional): Yield HistoryFrames of up to this many records rather than data entries.
+                Defaults to None.
+            local_time (bool, optional): Give timezone aware timestamps in the zappi timezone rather than naive
+                UTC timestamps. Defaults to False.
+        Returns:
+            A generator of minute_data or hourly_data entries, or of HistoryFrames
+        """
+        serial = self._check_serial(MyenergiType.ZAPPI, serial)
+        tz = self.get_zappi_timezone(serial) if local_time else None
+        return self._stream_history(MyenergiType.ZAPPI, serial, history_type, date, chunk_size, tz)
+
+    def iter_eddi_history(self, serial: int, history_type: History, start: str, end: str = None):
+        """Iterate over Eddi history of the relevant type from start to end a day at a time.
+
+        Args:
+            serial (int): The serial number of the eddi
+            history_type (History): Whether to get history by Minute or by Hour
+            start (str): The first date for which to obtain the history in the format YYYY-MM-DD
+            end (str, optional): The last date for which to obtain the history. Defaults to the start date.
+        Returns:
+            A generator of eddi_minute_data or eddi_hourly_data entries in time order
+        """
+        serial = self._check_serial(MyenergiType.EDDI, serial)
+        return self._iter_history(MyenergiType.EDDI, serial, history_type, self._date_range(start, end or start))
+
+    def iter_zappi_history(self, serial: int, history_type: History, start: str, end: str = None,
+                           local_time: bool = False):
+        """Iterate over Zappi history of the relevant type from start to end a day at a time.
+        Each day is fetched while the rows of the previous day are being consumed and only those two days are held
+        in memory, so months of minute history can be processed without building a history list.
+
+        Args:
+            serial (int): The serial number of the zappi
+            history_type (History): Whether to get history by Minute or by Hour
+            start (str): The first date for which to obtain the history in the format YYYY-MM-DD
+            end (str, optional): The last date for which to obtain the history. Defaults to the start date.
+            local_time (bool, optional): Give timezone aware timestamps in the zappi timezone rather than naive
+                UTC timestamps. Defaults to False.
+        Returns:
+            A generator of minute_data or hourly_data entries in time order
+        """
+        serial = self._check_serial(MyenergiType.ZAPPI, serial)
+        tz = self.get_zappi_timezone(serial) if local_time else None
+        return self._iter_history(MyenergiType.ZAPPI, serial, history_type, self._date_range(start, end or start),
+                                  tz)
+
+    def _iter_history(self, device: MyenergiType, serial: int, history_type: History, dates: list,
+                      tz: timezone = None):
+        """Yield the history for each date in turn, fetching the next date in the background.
+
+        Args:
+            device (MyenergiType): The type of device, a Zappi or an Eddi
+            serial (int): The serial number of the device
+            history_type (History): Whether the history is by Minute or by Hour
+            dates (list): The dates for which to obtain the history in order
+            tz (timezone, optional): Timezone to convert the UTC timestamps to. Defaults to None.
+        """
+        endpoint = HISTORY_ENDPOINTS[(device, history_type)]
+        executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="myenergi-history")
+        try:
+            pending = executor.submit(self._get_history_results, endpoint, serial, dates[0])
+            for following in dates[1:] + [None]:
+                results = pending.result()
+                if following is not None:
+                    pending = executor.submit(self._get_history_results, endpoint, serial, following)
+                yield from self._history_items(device, serial, history_type, results[f"U{serial}"], tz=tz)
+        finally:
+            # Do not wait for a prefetched day if the caller stops early
+            executor.shutdown(wait=False, cancel_futures=True)
+
+    def _stream_history(self, device: MyenergiType, serial: int, history_type: History, date: str,
+                        chunk_size: int = None, tz: timezone = None):
+        """Yield a day of history from the cache or else as it is downloaded from the API.
+        Streamed history is not stored in the cache as the whole day is never held in memory.
+
+        Args:
+            device (MyenergiType): The type of device, a Zappi or an Eddi
+            serial (int): The serial number of the device
+            history_type (History): Whether the history is by Minute or by Hour
+            date (str): The date for which to obtain the history
+            chunk_size (int, optional): The records in each HistoryFrame, or None for data entries.
+                Defaults to None.
+            tz (timezone, optional): Timezone to convert the UTC timestamps of data entries to. Defaults to None.
+        """
+        endpoint = HISTORY_ENDPOINTS[(device, history_type)]
+        results = self._cached_history(endpoint, serial, date)
+        if results is not None:
+            records = results[f"U{serial}"]
+        else:
+            records = self._stream_records(self._create_url(endpoint=endpoint, serial=serial, parm=f"-{date}"),
+                                           f"U{serial}")
+        yield from self._history_items(device, serial, history_type, records, chunk_size, tz)
+
+    def _stream_records(self, url: str, key: str):
+        """Yield the elements of the array in a response as they are downloaded.
+
+        Args:
+            url (str): URL to be passed to the REST API
+            key (str): The key of the array in the response
+        """
+        started = time.monotonic()
+        results = self._api_request(url, stream=True)
+        received = time.monotonic()
+        parser = ArrayParser(key)
+        size = 0
+        try:
+            with results:
+                for chunk in results.iter_content(STREAM_CHUNK_SIZE):
+                    size += len(chunk)
+                    yield from parser.feed(chunk)
+            parser.close()
+        except requests.exceptions.RequestException as err:
+            raise myenergi.error.ConnectionError(f"Download of {url} failed: {err}") from err
+        except ValueError as err:
+            raise myenergi.error.MyEnergiError(f"Incomplete response from {url}: {err}") from err
+        if self.metrics is not None:
+            self.metrics.record_request(url, received - started, size)
+        if parser.document is not None:
+            # The response had no history, such as a non-zero status
+            self._check_status(url, parser.document)
+
+    def set_zappi_minimum_green_limit(self, serial: int, percentage: int, wait: bool = True,
+                                      timeout: float = TIMEOUT) -> Future:
+        """Set the Zappi minimum green limit and confirm that it has changed.
+
+        Args:
+            serial (int): The serial number of the zappi
+            percentage (int): The percentage to get the minimum green limit to
+            wait (bool, optional): Wait until the change has been confirmed. Defaults to True.
+            timeout (float, optional): Seconds to wait for the change. Defaults to TIMEOUT.
+
+        Returns:
+            Future: Completes when the Zappi reports the new limit or fails with TimeoutError
+        """
+        serial = self._check_serial(MyenergiType.ZAPPI, serial)
+        current_percentage = self.get_zappi_info(serial, ZappiData.MINIMUM_GREEN_LIMIT)
+        if percentage == current_percentage:
+            self.logger.info("Minimum green limit for Zappi SN: %s is already %s", serial, percentage)
+            return confirmed()
+        # set the Zappi minimum green limit as requested
+        self.logger.info("Setting minimum green limit for Zappi SN:%s to %s from %s", serial, percentage,
+                         current_percentage)
+        self._api_request(self._create_url(endpoint=MyEnergiEndpoint.ZAPPI_MINGREEN, serial=serial,
+                                           parm=f"-{percentage}"))
+        future = self.confirmations.submit(serial, ZappiData.MINIMUM_GREEN_LIMIT, percentage, timeout)
+        if wait:
+            future.result()
+        return future
+
+    def apply(self, commands: list, workers: int = 4, timeout: float = TIMEOUT) -> list:
+        """Carry out a list of commands, sending the commands for different devices concurrently.
+
+        The myenergi server only sends one command to a device at a time, so the commands for each device are sent
+        in order and each change is confirmed before the next command for that device. A command which is refused
+        because the server is busy sending a command to the device is retried as set out by the retry policy.
+
+        Args:
+            commands (list): Command dataclasses from myenergi.const such as zappi_mode_command
+            workers (int, optional): Number of devices to send commands to at once, up to the confirm_workers of
+                the client. Defaults to 4.
+            timeout (float, optional): Seconds to wait for each change to be confirmed. Defaults to TIMEOUT.
+
+        Returns:
+            list: A command_result for each command in the same order as the commands
+        """
+        results = [None] * len(commands)
+
+        def run_queue(queue: list) -> None:
+            for index in queue:
+                results[index] = self._apply_command(commands[index], timeout)
+
+        with ThreadPoolExecutor(max_workers=workers) as executor:
+            list(executor.map(run_queue, self._command_queues(commands)))
+        return results
+
+    def _apply_command(self, command, timeout: float) -> myenergi.const.command_result:
+        """Carry out a command and wait for it to be confirmed, returning any error in the result.
+
+        Args:
+            command: One of the command dataclasses from myenergi.const
+            timeout (float): Seconds to wait for the change to be confirmed
+        """
+        try:
+            method, kwargs = self._command_call(command, timeout)
+            pending = method(**kwargs)
+            if pending is not None:
+                pending.result()
+            return myenergi.const.command_result(command)
+        except myenergi.error.MyEnergiError as err:
+            return myenergi.const.command_result(command, err)
+
+    def set_eddi_mode(self, serial: int, mode: EddiMode) -> None:
+        """Set the Zappi mode and wait until the mode has changed
+
+        Args:
+            serial (int): The serial number of the Eddi
+            mode (ZappiMode): The mode to set the Eddi to from the list in ZappiMode
+        """
+        serial = self._check_serial(MyenergiType.EDDI, serial)
+        self.logger.info("Setting mode for Eddi SN: %s to %s", serial, mode.name)
+        self._api_request(self._create_url(endpoint=MyEnergiEndpoint.EDDI_MODE, serial=serial,
+                                           parm=f"{mode.value}"))
+
+    def set_zappi_mode(self, serial: int, mode: ZappiMode, wait: bool = True, timeout: float = TIMEOUT) -> Future:
+        """Set the Zappi mode and confirm that the mode has changed.
+
+        Pass wait=False to set the mode of several Zappis and confirm the changes in parallel.
+
+        Args:
+            serial (int): The serial number of the zappi
+            mode (ZappiMode): The mode to set the Zappi to from the list in ZappiMode
+            wait (bool, optional): Wait until the change has been confirmed. Defaults to True.
+            timeout (float, optional): Seconds to wait for the change. Defaults to TIMEOUT.
+
+        Returns:
+            Future: Completes when the Zappi reports the new mode or fails with TimeoutError
+        """
+        serial = self._check_serial(MyenergiType.ZAPPI, serial)
+        current_mode = self.get_zappi_info(serial, ZappiData.MODE)
+        if ZappiMode[mode] == current_mode:
+            self.logger.info("Mode for Zappi SN: %s is already %s", serial, mode)
+            return confirmed()
+        # set the Zappi mode as requested
+        self.logger.info("Setting mode for Zappi SN: %s to %s from %s", serial, mode, ZappiMode(current_mode).name)
+        self._api_request(self._create_url(endpoint=MyEnergiEndpoint.ZAPPI_MODE, serial=serial,
+                                           parm=f"{ZappiModeParm[mode].value}"))
+        future = self.confirmations.submit(serial, ZappiData.MODE, ZappiMode[mode], timeout)
+        if wait:
+            future.result()
+        return future
+
+    def set_eddi_boost(self, serial: int, heater: int = 1, boost_time: int = 0) -> None:
+        """Start or stop the Eddi boost.
+
+        Args:
+            serial (int): Serial number of the Zappi to boost - or all will be boosted
+            heater (int) : Number of the heater to boost
+            boost_time (int, optional): time for boost. Defaults to 0 which cancels boost
+        """
+        serial = self._check_serial(MyenergiType.EDDI, serial)
+        parm = self._eddi_boost_parm(serial, heater, boost_time)
+        self._api_request(self._create_url(endpoint=MyEnergiEndpoint.EDDI_BOOST, serial=serial, parm=parm))
+
+    def set_zappi_boost(self, serial: int, boost: ZappiBoost = ZappiBoost.STOP,
+                        kwh: int = 0, boost_time: str = None) -> None:
+        """Start or stop the Zappi boost.
+
+        Args:
+            serial (int): Serial number of the Zappi to boost - or all will be boosted
+            boost (ZappiBoost, optional): Start, Stop or Smart boost. Defaults to ZappiBoost.STOP.
+            kwh (int, optional): kwn to boost. Defaults to 0.
+            boost_time (int, optional): time for smart boost. Defaults to None.
+        """
+        serial = self._check_serial(MyenergiType.ZAPPI, serial)
+        parm = self._zappi_boost_parm(serial, boost, kwh, boost_time)
+        self._api_request(self._create_url(endpoint=MyEnergiEndpoint.ZAPPI_MODE, serial=serial, parm=parm))
+
+    def _api_request(self, url: str, stream: bool = False) -> json:
+        """Call the REST API with the passed URL and check the response before returning the JSON results.
+
+        Requests which read data are retried after timeouts, connection failures and server errors, and requests
+        refused because the server is busy are retried, as set out by the retry policy. If a cached server does
+        not respond the director is asked for the server and the request is sent there.
+
+        Args:
+            url (str): URL to be passed to the REST API
+            stream (bool, optional): Return the response as soon as the headers have been received, leaving the
+                body to be read and checked by the caller. Defaults to False.
+        Returns:
+            json: The json returned by the REST API, or the open response if streaming
+        """
+        attempt = busy = 0
+        while True:
+            try:
+                data = self._send(url, stream=True) if stream else self._get(url)
+            except myenergi.error.MyEnergiError as err:
+                if isinstance(err, myenergi.error.ConnectionError) and not self._asn_verified:
+                    # The server cached for this hub did not respond so ask the director where the hub is now
+                    self.logger.warning("Cached myenergi server %s did not respond, asking the director", self._url)
+                    cached_url = self._url
+                    self._resolve_asn()
+                    url = url.replace(cached_url, self._url, 1)
+                    continue
+                attempt += 1
+                delay = self._retry_delay(url, err, attempt)
+                if delay is None:
+                    raise
+                time.sleep(delay)
+                continue
+            if stream:
+                return data
+            busy += 1
+            delay = self._busy_delay(data, busy)
+            if delay is None:
+                # Check if there is a non-zero status response provided - status is not always returned
+                self._check_status(url, data)
+                return data
+            time.sleep(delay)
+
+    def _get(self, url: str) -> json:
+        """Make a single request to the REST API and decode the JSON returned.
+
+        Args:
+            url (str): URL to be passed to the REST API
+        Returns:
+            json: The json returned by the REST API
+        """
+        started = time.monotonic()
+        results = self._send(url)
+        # Get the JSON data from the results of the API call.
+        decode_started = time.monotonic()
+        data = results.json()
+        self._record_metrics(url, results, started, decode_started)
+        self._log_payload(data)
+        return data
+
+    def _send(self, url: str, stream: bool = False) -> requests.Response:
+        """Make a single request to the REST API, counting it against the stats and the circuit breaker.
+
+        Args:
+            url (str): URL to be passed to the REST API
+            stream (bool, optional): Return once the headers have been received. Defaults to False.
+        Returns:
+            requests.Response: The successful response
+        """
+        breaker = self._breaker(url)
+        self._check_breaker(breaker)
+        self.logger.debug("Calling Myenergi API with URL: %s", url)
+        started = time.monotonic()
+        error = None
+        try:
+            results = self._session.get(url, timeout=self.request_timeout, stream=stream)
+            if results.status_code != requests.codes.ok:
+                error = myenergi.error.HTTPError(results.status_code, url)
+                results.close()
+        except requests.exceptions.Timeout as err:
+            error = myenergi.error.RequestTimeoutError(f"Request to {url} timed out: {err}")
+        except requests.exceptions.ConnectionError as err:
+            error = myenergi.error.ConnectionError(f"Unable to connect for {url}: {err}")
+        except requests.exceptions.RequestException as err:
+            error = myenergi.error.MyEnergiError(f"Request to {url} failed: {err}")
+        self._record_request(url, breaker, started, error)
+        self._asn_verified = True
+        # A response naming a different server means the hub has moved
+        if asn := results.headers.get(MyEnergiEndpoint.ASN_HEADER_FIELD.value):
+            self._set_asn(asn)
+        return results
@@ -12,77 +12,186 @@ from typing import get_origin
 import dateutil.parser
 
 
-@dataclass
+def _to_date(value):
+    """Convert a string to a date object.
+
+    The myenergi API returns dates as dd-mm-yyyy so that format is parsed directly. Any other format
+    is tried as an ISO date and then left to dateutil, reading ambiguous dates day first."""
+    if value is None:
+        return value
+    if len(value) == 10 and value[2] == "-" and value[5] == "-":
+        try:
+            return date(int(value[6:]), int(value[3:5]), int(value[:2]))
+        except ValueError:
+            pass
+    try:
+        return date.fromisoformat(value)
+    except ValueError:
+        return dateutil.parser.parse(value, dayfirst=True).date()
+
+
+def _to_time(value):
+    """Convert a string to a time object.
+
+    The myenergi API returns times as HH:MM:SS so that format is parsed directly, otherwise dateutil is used."""
+    if value is None:
+        return value
+    if len(value) == 8 and value[2] == ":" and value[5] == ":":
+        try:
+            return time(int(value[:2]), int(value[3:5]), int(value[6:]))
+        except ValueError:
+            pass
+    return dateutil.parser.parse(value).time()
+
+
+def _to_datetime(value):
+    """Convert a string to a datetime object, trying the ISO format before dateutil."""
+    if value is None:
+        return value
+    try:
+        return datetime.fromisoformat(value)
+    except ValueError:
+        return dateutil.parser.parse(value, dayfirst=True)
+
+
+def _enum_converter(enum: type):
+    """Return a converter which looks up an Enum entry by name and then by value."""
+    def convert(value):
+        try:
+            return enum[value]
+        except KeyError:
+            return enum(value)
+        except TypeError:
+            return value
+    return convert
+
+
+def _dataclass_converter(cls: type):
+    """Return a converter which parses a non-null entry into the dataclass."""
+    def convert(value):
+        return cls(**value) if value else value
+    return convert
+
+
+def _list_converter(entry_type: type):
+    """Return a converter which parses each entry of a list into a dataclass or an Enum entry."""
+    if is_dataclass(entry_type):
+        def convert(value):
+            for index, data in enumerate(value):
+                value[index] = entry_type(**data)
+            return value
+        return convert
+    if isinstance(entry_type, type) and issubclass(entry_type, Enum):
+        convert_entry = _enum_converter(entry_type)
+
+        def convert(value):
+            for index, data in enumerate(value):
+                value[index] = convert_entry(data)
+            return value
+        return convert
+    return None
+
+
+def _dict_converter(key_type: type, value_type: type):
+    """Return a converter which parses the values of a non-null dict into a dataclass and the keys into an Enum."""
+    enum_keys = isinstance(key_type, type) and issubclass(key_type, Enum)
+    dataclass_values = is_dataclass(value_type)
+
+    def convert(value):
+        if not value:
+            return value
+        # Create a new dict in case we have to change the index
+        new_dict = {}
+        for key, data in value.items():
+            if dataclass_values:
+                data = value_type(**data)
+            new_dict[getattr(key_type, key) if enum_keys else key] = data
+        return new_dict
+    return convert
+
+
+def _field_converter(field_type):
+    """Work out how to convert the value for a field of the type passed.
+
+    Returns None if the value is used as it is, otherwise a function which takes the value and returns it converted.
+    """
+    if field_type in (str, int, float, bool) or isinstance(field_type, range):
+        return None
+    # If the entry type is date, time or datetime then convert it from a string
+    if field_type == date:
+        return _to_date
+    if field_type == time:
+        return _to_time
+    if field_type == datetime:
+        return _to_datetime
+    # If the entry type is a list then parse each entry of the list into the dataclass or Enum
+    if get_origin(field_type) == list:
+        return _list_converter(field_type.__args__[0])
+    # If the entry type is a dict then parse its values into a dataclass and its keys into an Enum
+    if get_origin(field_type) == dict:
+        return _dict_converter(*field_type.__args__)
+    # If the entry type is a dataclass then parse the entry into the dataclass
+    if is_dataclass(field_type):
+        return _dataclass_converter(field_type)
+    # If the entry type is an Enum then convert it to an Enum entry
+    if isinstance(field_type, type) and issubclass(field_type, Enum):
+        return _enum_converter(field_type)
+    return None
+
+
+# The converters for each dataclass, worked out the first time an instance of the dataclass is created
+_converters = {}
+# Dataclasses with all of these fields have the timestamp set from the date (dat) and time (tim)
+TIMESTAMP_FIELDS = {"dat", "tim", "timestamp"}
+
+
+def _class_converters(cls: type) -> tuple:
+    """Return the (field name, converter) pairs for the fields of a dataclass which need converting
+    and whether the dataclass has a timestamp to set from its date and time."""
+    converters = _converters.get(cls)
+    if converters is None:
+        names = {entry.name for entry in fields(cls)}
+        converters = (tuple((entry.name, converter) for entry in fields(cls)
+                            if entry.name != "timestamp" and (converter := _field_converter(entry.type)) is not None),
+                      TIMESTAMP_FIELDS <= names)
+        _converters[cls] = converters
+    return converters
+
+
+@dataclass(slots=True)
 class baseclass:
     """This dataclass provides the post_init code to handle the nested dataclasses
-    and formatting of datetime entries"""
+    and formatting of datetime entries.
+
+    The way each field is converted is worked out from its type once for each dataclass
+    and kept so that creating further instances only has to call the converters.
+    If the dataclass has dat, tim and timestamp fields the timestamp is set from the date and time."""
 
     def __post_init__(self):
-        for entry in fields(self):
-            if entry.type == str:
-                pass
-            elif entry.type == int:
-                pass
-            elif entry.type == float:
-                pass
-            elif entry.type == bool:
-                pass
-            elif issubclass(entry.type.__class__, range):
-                pass
-            # If the entry type is date then convert it from a string to a date object
-            elif entry.type == date:
-                if getattr(self, entry.name) is not None:
-                    setattr(self, entry.name, dateutil.parser.parse(getattr(self, entry.name)).date())
-            # If the entry type is time then convert it from a string to a time object
-            elif entry.type == time:
-                if getattr(self, entry.name) is not None:
-                    setattr(self, entry.name, dateutil.parser.parse(getattr(self, entry.name)).time())
-            # If the entry type is datetime then convert it from a string to a datetime object
-            elif entry.type == datetime:
-                if getattr(self, entry.name) is not None:
-                    setattr(self, entry.name, dateutil.parser.parse(getattr(self, entry.name)))
-            # If the entry type is a list
-            elif get_origin(entry.type) == list:
-                # If the type of the list entry is a dataclass then parse each entry of the list into the dataclass
-                if is_dataclass(entry.type.__args__[0]):
-                    for index, data in enumerate(getattr(self, entry.name)):
-                        getattr(self, entry.name)[index] = entry.type.__args__[0](**(getattr(self, entry.name)[index]))
-                # If the type of the list entry is an Enum then convert it to an Enum entry
-                if issubclass(entry.type.__args__[0], Enum):
-                    try:
-                        getattr(self, entry.name)[index] = entry.type.__args__[0][data]
-                    except KeyError:
-                        setattr(self, entry.name, entry.type(getattr(self, entry.name)))
-                    except TypeError:
-                        pass
-            # If the entry type is a dataclass and the entry is not null then parse the entry into the dataclass
-            elif (is_dataclass(entry.type)) & (bool(getattr(self, entry.name)) is True):
-                setattr(self, entry.name, entry.type(**(getattr(self, entry.name))))
-            # If the entry type is an Enum then convert it to an Enum entry
-            elif issubclass(entry.type, Enum):
-                try:
-                    setattr(self, entry.name, entry.type[getattr(self, entry.name)])
-                except KeyError:
-                    setattr(self, entry.name, entry.type(getattr(self, entry.name)))
-                except TypeError:
-                    pass
-            # If the entry type is a dict and the entry is not null
-            elif (get_origin(entry.type) == dict) & (bool(getattr(self, entry.name)) is True):
-                # Create a new dict in case we have to change the index
-                new_dict = {}
-                for index, data in enumerate(getattr(self, entry.name)):
-                    # if the dict value is a dataclass
-                    if is_dataclass(entry.type.__args__[1]):
-                        getattr(self, entry.name)[data] = entry.type.__args__[1](**(getattr(self, entry.name)[data]))
-                    # if the dict index is an enum
-                    if issubclass(entry.type.__args__[0], Enum):
-                        # print(getattr(entry.type.__args__[0], data))
-                        new_dict[getattr(entry.type.__args__[0], data)] = getattr(self, entry.name)[data]
-                        # for index, data in enumerate(getattr(self, entry.name)):
-                        #    getattr(self, entry.name)[index] = entry.type.__args__[0][entry.name]
-                    else:
-                        new_dict[data] = getattr(self, entry.name)[data]
-                setattr(self, entry.name, new_dict)
+        converters, timestamped = _class_converters(type(self))
+        for name, converter in converters:
+            setattr(self, name, converter(getattr(self, name)))
+        if timestamped and self.dat is not None and self.tim is not None:
+            self.timestamp = datetime.combine(self.dat, self.tim)
+
+    def update(self, changes: dict) -> set:
+        """Set fields from the raw values returned by the API, converting only the fields given.
+
+        Args:
+            changes (dict): The raw values of the fields which have changed
+        Returns:
+            set: The names of the fields which were set, including the timestamp if it was set again
+        """
+        converters, timestamped = _class_converters(type(self))
+        converters = dict(converters)
+        for name, value in changes.items():
+            converter = converters.get(name)
+            setattr(self, name, value if converter is None else converter(value))
+        changed = set(changes)
+        if timestamped and changed & {"dat", "tim"} and self.dat is not None and self.tim is not None:
+            self.timestamp = datetime.combine(self.dat, self.tim)
+            changed.add("timestamp")
+        return changed
 
 
 @dataclass(frozen=True)
@@ -0,0 +1,765 @@
+"""This is a Python module that enables the use of the myenergi API from asyncio code.
+
+The AsyncAPI class provides the same methods as myenergi.api.API but each method which calls the API is a
+coroutine. Requests are made using an httpx AsyncClient with digest authentication.
+
+Requests which do not depend on each other, such as the boost times for each device or the history for each
+day, are run concurrently. The number of requests in flight at any one time is limited by the concurrency
+argument so that a site with many devices does not flood the myenergi servers.
+
+    async with myenergi.AsyncAPI(serial="123456", password="passw0rd") as mye:
+        await mye.refresh_all()
+        print(mye.get_zappi_serials())
+"""
+
+import asyncio
+import json
+import time
+from datetime import datetime, timedelta, timezone
+
+import httpx
+
+import myenergi.error
+from myenergi.api import HISTORY_ENDPOINTS, APIBase, HistoryFrame
+from myenergi.cache import ASNCache, HistoryCache
+from myenergi.confirm import TIMEOUT, wait_for
+from myenergi.metrics import Metrics
+from myenergi.resilience import DEFAULT_TIMEOUT, RetryPolicy
+from myenergi.stream import STREAM_CHUNK_SIZE, ArrayParser
+from myenergi.const import (EddiMode, History, MyEnergiEndpoint, MyenergiType,
+                            ZappiBoost, ZappiData, ZappiMode, ZappiModeParm)
+
+# Only export the asyncio myenergi API
+__all__ = ["AsyncAPI"]
+
+
+class AsyncAPI(APIBase):
+    """
+    An asyncio version of the myenergi API client.
+
+    Args:
+        serial (str): The serial number of the hub
+        password (str): The password for the account
+        concurrency (int): The maximum number of requests to have in flight at once
+    """
+
+    def __init__(self, serial: str = None, password: str = None, concurrency: int = 4,
+                 cache: HistoryCache = None, asn_cache: ASNCache = None, retry: RetryPolicy = None,
+                 request_timeout: tuple = DEFAULT_TIMEOUT, metrics: Metrics = None,
+                 director_url: str = MyEnergiEndpoint.DIRECTOR_URL.value) -> None:
+        """Initialise the Myenergi client. The initial query is made by connect or on entry to the context.
+
+        Args:
+            serial (str, optional): Serial number of the myenergi hub. Defaults to None.
+            password (str, optional): password for the myenergi hub. Defaults to None.
+            concurrency (int, optional): Maximum number of concurrent requests. Defaults to 4.
+            cache (HistoryCache, optional): Cache to read history through. Defaults to None.
+            asn_cache (ASNCache, optional): Cache of the server for the hub. Defaults to None.
+            retry (RetryPolicy, optional): How failed requests are retried. Defaults to RetryPolicy().
+            request_timeout (tuple, optional): Connect and read timeouts in seconds. Defaults to DEFAULT_TIMEOUT.
+            metrics (Metrics, optional): Where to record per endpoint metrics. Defaults to None.
+            director_url (str, optional): The director which names the server for the hub, such as a local
+                test server. Defaults to MyEnergiEndpoint.DIRECTOR_URL.
+        """
+        super().__init__(serial, password, cache, asn_cache, retry, request_timeout, metrics, director_url)
+        assert concurrency > 0
+        self._limit = asyncio.Semaphore(concurrency)
+        # Create a client for the API requests
+        connect_timeout, read_timeout = request_timeout
+        self._client = httpx.AsyncClient(auth=httpx.DigestAuth(serial, password),
+                                         headers=MyEnergiEndpoint.API_HEADERS.value,
+                                         limits=httpx.Limits(max_connections=concurrency),
+                                         timeout=httpx.Timeout(read_timeout, connect=connect_timeout),
+                                         event_hooks={"response": [self._count_challenge]})
+
+    async def _count_challenge(self, response: httpx.Response) -> None:
+        """Count the 401 responses asking for digest authentication. httpx reuses the nonce from the last
+        challenge so in steady state each request should be a single HTTP exchange."""
+        if response.status_code == httpx.codes.UNAUTHORIZED:
+            self.stats.count("challenges")
+
+    async def __aenter__(self) -> "AsyncAPI":
+        """Entry function for the myenergi API which performs the initial query."""
+        await self.connect()
+        return self
+
+    async def __aexit__(self, exc_type, exc_value, exc_traceback) -> None:
+        """Exit function for the myenergi API."""
+        await self.close()
+
+    async def close(self) -> None:
+        """Close the httpx client."""
+        await self._client.aclose()
+
+    async def connect(self) -> None:
+        """Find the server for this hub and then query the devices and their boost times.
+
+        The server cached for this hub is used if there is one, asking the director if none is cached or the
+        cached server does not respond."""
+        asn = self._cached_asn()
+        if asn is None:
+            await self._resolve_asn()
+        else:
+            self._url = self._server_url(asn)
+            self._asn_verified = False
+        await self.refresh_all()
+
+    async def _resolve_asn(self) -> None:
+        """Call the director URL to get the server for this hub which is returned in a header field."""
+        try:
+            results = await self._client.get(self.director_url)
+        except httpx.HTTPError as err:
+            raise myenergi.error.ConnectionError(f"Unable to reach the myenergi director: {err}") from err
+        asn = results.headers.get(MyEnergiEndpoint.ASN_HEADER_FIELD.value)
+        if asn is None:
+            raise myenergi.error.HTTPError(results.status_code, "the director did not return a server for the hub")
+        self._set_asn(asn)
+        self._asn_verified = True
+
+    async def refresh_all(self) -> None:
+        """Refresh every device with a single status query and then the boost times of all devices concurrently."""
+        await self.refresh_devices()
+        await asyncio.gather(*[self._get_zappi_boost_times(serial) for serial in self.get_serials(MyenergiType.ZAPPI)],
+                             *[self._get_eddi_boost_times(serial) for serial in self.get_serials(MyenergiType.EDDI)])
+
+    async def refresh_devices(self) -> myenergi.const.status_changes:
+        """Refresh the information stored for all devices with a single call to the myenergi API.
+        The boost times are not refreshed.
+
+        Returns:
+            status_changes: The names of the fields which changed for each device which changed, appeared or was
+                removed, with the status versions before and after the refresh
+        """
+        results = await self._api_request(self._create_url())
+        with self._build_timer(MyEnergiEndpoint.DEVICES):
+            return self._apply_results(results)
+
+    async def refresh_status(self, device: MyenergiType, serial: int, boost_times: bool = True) -> set:
+        """Refresh the information stored for a device by calling the myenergi API.
+
+        Args:
+            device (str): The type of device to return
+            serial (int): The serial number of the device
+            boost_times (bool, optional): Whether to refresh the boost times as well. Defaults to True.
+        Returns:
+            set: The names of the status fields which changed, the boost times are not compared
+        """
+        serial = self._check_serial(device, serial)
+        results = await self._api_request(self._create_url(endpoint=MyEnergiEndpoint[device.name], serial=serial))
+        with self._build_timer(MyEnergiEndpoint[device.name]):
+            changed = self._apply_results([results])
+        if boost_times and device == MyenergiType.ZAPPI:
+            await self._get_zappi_boost_times(serial)
+        if boost_times and device == MyenergiType.EDDI:
+            await self._get_eddi_boost_times(serial)
+        return changed.get(serial, set())
+
+    async def _get_eddi_boost_times(self, serial: int) -> None:
+        """Get the current Eddi boost times.
+
+        Args:
+            serial (int): The serial number of the Eddi
+        """
+        serial = self._check_serial(MyenergiType.EDDI, serial)
+        results = await self._api_request(self._create_url(endpoint=MyEnergiEndpoint.EDDI_BOOST_TIME, serial=serial))
+        with self._build_timer(MyEnergiEndpoint.EDDI_BOOST_TIME):
+            self._set_boost_times(MyenergiType.EDDI, serial, results)
+
+    async def _get_zappi_boost_times(self, serial: int) -> None:
+        """Get the current Zappi boost times.
+
+        Args:
+            serial (int): The serial number of the zappi
+        """
+        serial = self._check_serial(MyenergiType.ZAPPI, serial)
+        results = await self._api_request(self._create_url(endpoint=MyEnergiEndpoint.ZAPPI_BOOST_TIME,
+                                                           serial=serial))
+        with self._build_timer(MyEnergiEndpoint.ZAPPI_BOOST_TIME):
+            self._set_boost_times(MyenergiType.ZAPPI, serial, results)
+
+    async def get_zappi_daily_total(self, serial: int, date: str,
+                                    querydays: int = 1) -> myenergi.const.daily_history:
+        """Get the daily total history information for the date and serial provided
+        The history for each day is requested concurrently and the days are returned in date order.
+
+        Args:
+            serial (int): The serial number of the zappi
+            date (datetime): The date for which to obtain the history
+            querydays (int): The number of days to query counting back from today
+        """
+        serial = self._check_serial(MyenergiType.ZAPPI, serial)
+        start = datetime.strptime(date, "%Y-%m-%d") - timedelta(days=querydays-1)
+        history = await self.get_zappi_history_range([serial], datetime.strftime(start, "%Y-%m-%d"), date)
+        return self._daily_totals(serial, history)
+
+    async def get_zappi_history_range(self, serials: list, start: str, end: str,
+                                      history_type: History = History.HOUR) -> myenergi.const.history_range:
+        """Get Zappi history of the relevant type for a range of dates for one or more Zappis.
+        The days are fetched concurrently and each request is retried by the retry policy of the client.
+        Days which still fail are reported in the failures of the result without losing the other days.
+
+        Args:
+            serials (list): The serial numbers of the zappis
+            start (str): The first date for which to obtain the history in the format YYYY-MM-DD
+            end (str): The last date for which to obtain the history in the format YYYY-MM-DD
+            history_type (History, optional): Whether to get history by Minute or by Hour. Defaults to Hour.
+        """
+        serials = [self._check_serial(MyenergiType.ZAPPI, serial) for serial in serials]
+        return await self._fetch_range(self.get_zappi_history, serials, start, end, history_type)
+
+    async def get_zappi_history_frame(self, serial: int, history_type: History, start: str,
+                                      end: str = None) -> HistoryFrame:
+        """Get Zappi history of the relevant type as a HistoryFrame holding one array per field.
+        The days from start to end are fetched concurrently and joined in date order. Days which cannot be
+        obtained are logged and left out.
+
+        Args:
+            serial (int): The serial number of the zappi
+            history_type (History): Whether to get history by Minute or by Hour
+            start (str): The first date for which to obtain the history in the format YYYY-MM-DD
+            end (str, optional): The last date for which to obtain the history. Defaults to the start date.
+        """
+        serial = self._check_serial(MyenergiType.ZAPPI, serial)
+        history = await self._fetch_range(self._get_zappi_frame, [serial], start, end or start, history_type)
+        return self._join_frames(serial, history)
+
+    async def get_eddi_history_range(self, serials: list, start: str, end: str,
+                                     history_type: History = History.HOUR) -> myenergi.const.history_range:
+        """Get Eddi history of the relevant type for a range of dates for one or more Eddis.
+        The days are fetched concurrently and each request is retried by the retry policy of the client.
+        Days which still fail are reported in the failures of the result without losing the other days.
+
+        Args:
+            serials (list): The serial numbers of the eddis
+            start (str): The first date for which to obtain the history in the format YYYY-MM-DD
+            end (str): The last date for which to obtain the history in the format YYYY-MM-DD
+            history_type (History, optional): Whether to get history by Minute or by Hour. Defaults to Hour.
+        """
+        serials = [self._check_serial(MyenergiType.EDDI, serial) for serial in serials]
+        return await self._fetch_range(self.get_eddi_history, serials, start, end, history_type)
+
+    async def get_eddi_history_frame(self, serial: int, history_type: History, start: str,
+                                     end: str = None) -> HistoryFrame:
+        """Get Eddi history of the relevant type as a HistoryFrame holding one array per field.
+        The days from start to end are fetched concurrently and joined in date order. Days which cannot be
+        obtained are logged and left out.
+
+        Args:
+            serial (int): The serial number of the eddi
+            history_type (History): Whether to get history by Minute or by Hour
+            start (str): The first date for which to obtain the history in the format YYYY-MM-DD
+            end (str, optional): The last date for which to obtain the history. Defaults to the start date.
+        """
+        serial = self._check_serial(MyenergiType.EDDI, serial)
+        history = await self._fetch_range(self._get_eddi_frame, [serial], start, end or start, history_type)
+        return self._join_frames(serial, history, MyenergiType.EDDI)
+
+    async def _get_eddi_frame(self, serial: int, history_type: History, date: str) -> HistoryFrame:
+        """Get a single day of Eddi history as a HistoryFrame.
+
+        Args:
+            serial (int): The serial number of the eddi
+            history_type (History): Whether to get history by Minute or by Hour
+            date (str): The date for which to obtain the history
+        """
+        endpoint = HISTORY_ENDPOINTS[(MyenergiType.EDDI, history_type)]
+        results = await self._get_history_results(endpoint, serial, date)
+        with self._build_timer(endpoint):
+            return self._build_frame(serial, history_type, results, MyenergiType.EDDI)
+
+    async def _get_zappi_frame(self, serial: int, history_type: History, date: str) -> HistoryFrame:
+        """Get a single day of Zappi history as a HistoryFrame.
+
+        Args:
+            serial (int): The serial number of the zappi
+            history_type (History): Whether to get history by Minute or by Hour
+            date (str): The date for which to obtain the history
+        """
+        results = await self._get_history_results(HISTORY_ENDPOINTS[(MyenergiType.ZAPPI, history_type)], serial, date)
+        with self._build_timer(HISTORY_ENDPOINTS[(MyenergiType.ZAPPI, history_type)]):
+            return self._build_frame(serial, history_type, results)
+
+    async def _fetch_range(self, method, serials: list, start: str, end: str,
+                           history_type: History) -> myenergi.const.history_range:
+        """Call a coroutine to get a day of history for each day in a range for each serial concurrently.
+        Each request is retried by the retry policy of the client, so a day which still fails is only reported.
+
+        Args:
+            method: The coroutine used to get the history for a day
+            serials (list): The serial numbers of the devices
+            start (str): The first date for which to obtain the history in the format YYYY-MM-DD
+            end (str): The last date for which to obtain the history in the format YYYY-MM-DD
+            history_type (History): Whether to get history by Minute or by Hour
+        """
+        keys = [(serial, day) for serial in serials for day in self._date_range(start, end)]
+        results = await asyncio.gather(*[self._get_history_or_error(method, serial, history_type, day)
+                                         for serial, day in keys])
+        return self._collect_range(myenergi.const.history_range(history_type), dict(zip(keys, results)))
+
+    async def _get_history_or_error(self, method, serial: int, history_type: History,
+                                    date: str) -> myenergi.const.hourly_history | BaseException:
+        """Get the history for a single day, returning the error rather than raising it if the day fails.
+
+        Args:
+            method: The coroutine used to get the history for a day
+            serial (int): The serial number of the device
+            history_type (History): Whether to get history by Minute or by Hour
+            date (str): The date for which to obtain the history
+        """
+        try:
+            return await method(serial, history_type, date)
+        except myenergi.error.MyEnergiError as err:
+            return err
+
+    async def get_eddi_history(self, serial: int, history_type: History,
+                               date: str) -> myenergi.const.hourly_history:
+        """Get Eddi history of the relevant type using the Myenergi API.
+
+        Args:
+            serial (int): The serial number of the eddi
+            history_type (str): Whether to get history by Minute or by Hour
+            date (datetime): The date for which to obtain the history
+        """
+        serial = self._check_serial(MyenergiType.EDDI, serial)
+        results = await self._get_history_results(HISTORY_ENDPOINTS[(MyenergiType.EDDI, history_type)], serial, date)
+        with self._build_timer(HISTORY_ENDPOINTS[(MyenergiType.EDDI, history_type)]):
+            return self._build_history(serial, history_type, results, device=MyenergiType.EDDI)
+
+    async def get_zappi_history(self, serial: int, history_type: History, date: str,
+                                local_time: bool = False) -> myenergi.const.hourly_history:
+        """Get Zappi history of the relevant type using the Myenergi API.
+
+        Args:
+            serial (int): The serial number of the zappi
+            history_type (str): Whether to get history by Minute or by Hour
+            date (datetime): The date for which to obtain the history
+            local_time (bool, optional): Give timezone aware timestamps in the zappi timezone rather than naive
+                UTC timestamps. Defaults to False.
+        """
+        serial = self._check_serial(MyenergiType.ZAPPI, serial)
+        results = await self._get_history_results(HISTORY_ENDPOINTS[(MyenergiType.ZAPPI, history_type)], serial, date)
+        with self._build_timer(HISTORY_ENDPOINTS[(MyenergiType.ZAPPI, history_type)]):
+            return self._build_history(serial, history_type, results,
+                                       self.get_zappi_timezone(serial) if local_time else None)
+
+    async def _get_history_results(self, endpoint: MyEnergiEndpoint, serial: int, date: str) -> json:
+        """Get the results for a day of history from the cache or else by calling the API.
+
+        Args:
+            endpoint (MyEnergiEndpoint): The history endpoint
+            serial (int): The serial number of the device
+            date (str): The date for which to obtain the history
+        """
+        results = self._cached_history(endpoint, serial, date)
+        if results is None:
+            results = await self._api_request(self._create_url(endpoint=endpoint, serial=serial, parm=f"-{date}"))
+            self._cache_history(endpoint, serial, date, results)
+        return results
+
+    def stream_eddi_history(self, serial: int, history_type: History, date: str, chunk_size: int = None):
+        """Stream Eddi history of the relevant type, yielding each record as it is downloaded.
+
+        Args:
+            serial (int): The serial number of the eddi
+            history_type (History): Whether to get history by Minute or by Hour
+            date (str): The date for which to obtain the history
+            chunk_size (int, optional): Yield HistoryFrames of up to this many records rather than data entries.
+                Defaults to None.
+        Returns:
+            An async generator of eddi_minute_data or eddi_hourly_data entries, or of HistoryFrames
+        """
+        serial = self._check_serial(MyenergiType.EDDI, serial)
+        return self._stream_history(MyenergiType.EDDI, serial, history_type, date, chunk_size)
+
+    def stream_zappi_history(self, serial: int, history_type: History, date: str, chunk_size: int = None,
+                             local_time: bool = False):
+        """Stream Zappi history of the relevant type, yielding each record as it is downloaded.
+        Only one chunk of the response is held in memory at a time rather than the whole day.
+
+        Args:
+            serial (int): The serial number of the zappi
+            history_type (History): Whether to get history by Minute or by Hour
+            date (str): The date for which to obtain the history
+            chunk_size (int, optional): Yield HistoryFrames of up to this many records rather than data entries.
+                Defaults to None.
+            local_time (bool, optional): Give timezone aware timestamps in the zappi timezone rather than naive
+                UTC timestamps. Defaults to False.
+        Returns:
+            An async generator of minute_data or hourly_data entries, or of HistoryFrames
+        """
+        serial = self._check_serial(MyenergiType.ZAPPI, serial)
+        tz = self.get_zappi_timezone(serial) if local_time else None
+        return self._stream_history(MyenergiType.ZAPPI, serial, history_type, date, chunk_size, tz)
+
+    def iter_eddi_history(self, serial: int, history_type: History, start: str, end: str = None):
+        """Iterate over Eddi history of the relevant type from start to end a day at a time.
+
+        Args:
+            serial (int): The serial number of the eddi
+            history_type (History): Whether to get history by Minute or by Hour
+            start (str): The first date for which to obtain the history in the format YYYY-MM-DD
+            end (str, optional): The last date for which to obtain the history. Defaults to the start date.
+        Returns:
+            An async generator of eddi_minute_data or eddi_hourly_data entries in time order
+        """
+        serial = self._check_serial(MyenergiType.EDDI, serial)
+        return self._iter_history(MyenergiType.EDDI, serial, history_type, self._date_range(start, end or start))
+
+    def iter_zappi_history(self, serial: int, history_type: History, start: str, end: str = None,
+                           local_time: bool = False):
+        """Iterate over Zappi history of the relevant type from start to end a day at a time.
+        Each day is fetched while the rows of the previous day are being consumed and only those two days are held
+        in memory, so months of minute history can be processed without building a history list.
+
+        Args:
+            serial (int): The serial number of the zappi
+            history_type (History): Whether to get history by Minute or by Hour
+            start (str): The first date for which to obtain the history in the format YYYY-MM-DD
+            end (str, optional): The last date for which to obtain the history. Defaults to the start date.
+            local_time (bool, optional): Give timezone aware timestamps in the zappi timezone rather than naive
+                UTC timestamps. Defaults to False.
+        Returns:
+            An async generator of minute_data or hourly_data entries in time order
+        """
+        serial = self._check_serial(MyenergiType.ZAPPI, serial)
+        tz = self.get_zappi_timezone(serial) if local_time else None
+        return self._iter_history(MyenergiType.ZAPPI, serial, history_type, self._date_range(start, end or start),
+                                  tz)
+
+    async def _iter_history(self, device: MyenergiType, serial: int, history_type: History, dates: list,
+                            tz: timezone = None):
+        """Yield the history for each date in turn, fetching the next date in the background.
+
+        Args:
+            device (MyenergiType): The type of device, a Zappi or an Eddi
+            serial (int): The serial number of the device
+            history_type (History): Whether the history is by Minute or by Hour
+            dates (list): The dates for which to obtain the history in order
+            tz (timezone, optional): Timezone to convert the UTC timestamps to. Defaults to None.
+        """
+        endpoint = HISTORY_ENDPOINTS[(device, history_type)]
+        pending = asyncio.ensure_future(self._get_history_results(endpoint, serial, dates[0]))
+        try:
+            for following in dates[1:] + [None]:
+                results = await pending
+                if following is not None:
+                    pending = asyncio.ensure_future(self._get_history_results(endpoint, serial, following))
+                for item in self._history_items(device, serial, history_type, results[f"U{serial}"], tz=tz):
+                    yield item
+        finally:
+            # Do not leave a prefetched day running if the caller stops early
+            pending.cancel()
+
+    async def _stream_history(self, device: MyenergiType, serial: int, history_type: History, date: str,
+                              chunk_size: int = None, tz: timezone = None):
+        """Yield a day of history from the cache or else as it is downloaded from the API.
+        Streamed history is not stored in the cache as the whole day is never held in memory.
+
+        Args:
+            device (MyenergiType): The type of device, a Zappi or an Eddi
+            serial (int): The serial number of the device
+            history_type (History): Whether the history is by Minute or by Hour
+            date (str): The date for which to obtain the history
+            chunk_size (int, optional): The records in each HistoryFrame, or None for data entries.
+                Defaults to None.
+            tz (timezone, optional): Timezone to convert the UTC timestamps of data entries to. Defaults to None.
+        """
+        endpoint = HISTORY_ENDPOINTS[(device, history_type)]
+        results = self._cached_history(endpoint, serial, date)
+        if results is not None:
+            for item in self._history_items(device, serial, history_type, results[f"U{serial}"], chunk_size, tz):
+                yield item
+            return
+        records = []
+        url = self._create_url(endpoint=endpoint, serial=serial, parm=f"-{date}")
+        async for entry in self._stream_records(url, f"U{serial}"):
+            records.append(entry)
+            if len(records) == (chunk_size or 1):
+                for item in self._history_items(device, serial, history_type, records, chunk_size, tz):
+                    yield item
+                records = []
+        for item in self._history_items(device, serial, history_type, records, chunk_size, tz):
+            yield item
+
+    async def _stream_records(self, url: str, key: str):
+        """Yield the elements of the array in a response as they are downloaded.
+
+        Args:
+            url (str): URL to be passed to the REST API
+            key (str): The key of the array in the response
+        """
+        started = time.monotonic()
+        results = await self._api_request(url, stream=True)
+        received = time.monotonic()
+        parser = ArrayParser(key)
+        size = 0
+        try:
+            async for chunk in results.aiter_bytes(STREAM_CHUNK_SIZE):
+                size += len(chunk)
+                for entry in parser.feed(chunk):
+                    yield entry
+            parser.close()
+        except httpx.HTTPError as err:
+            raise myenergi.error.ConnectionError(f"Download of {url} failed: {err}") from err
+        except ValueError as err:
+            raise myenergi.error.MyEnergiError(f"Incomplete response from {url}: {err}") from err
+        finally:
+            await results.aclose()
+            # Free the request slot which _send kept while the body was read
+            self._limit.release()
+        if self.metrics is not None:
+            self.metrics.record_request(url, received - started, size)
+        if parser.document is not None:
+            # The response had no history, such as a non-zero status
+            self._check_status(url, parser.document)
+
+    async def set_zappi_minimum_green_limit(self, serial: int, percentage: int, wait: bool = True,
+                                            timeout: float = TIMEOUT) -> asyncio.Future:
+        """Set the Zappi minimum green limit and confirm that it has changed.
+
+        Args:
+            serial (int): The serial number of the zappi
+            percentage (int): The percentage to get the minimum green limit to
+            wait (bool, optional): Wait until the change has been confirmed. Defaults to True.
+            timeout (float, optional): Seconds to wait for the change. Defaults to TIMEOUT.
+
+        Returns:
+            asyncio.Future: Completes when the Zappi reports the new limit or fails with TimeoutError
+        """
+        serial = self._check_serial(MyenergiType.ZAPPI, serial)
+        current_percentage = self.get_zappi_info(serial, ZappiData.MINIMUM_GREEN_LIMIT)
+        if percentage == current_percentage:
+            self.logger.info("Minimum green limit for Zappi SN: %s is already %s", serial, percentage)
+            return self._confirmed()
+        # set the Zappi minimum green limit as requested
+        self.logger.info("Setting minimum green limit for Zappi SN:%s to %s from %s", serial, percentage,
+                         current_percentage)
+        await self._api_request(self._create_url(endpoint=MyEnergiEndpoint.ZAPPI_MINGREEN, serial=serial,
+                                                 parm=f"-{percentage}"))
+        return await self._confirm(serial, ZappiData.MINIMUM_GREEN_LIMIT, percentage, wait, timeout)
+
+    async def apply(self, commands: list, timeout: float = TIMEOUT) -> list:
+        """Carry out a list of commands, sending the commands for different devices concurrently.
+
+        The myenergi server only sends one command to a device at a time, so the commands for each device are sent
+        in order and each change is confirmed before the next command for that device. A command which is refused
+        because the server is busy sending a command to the device is retried as set out by the retry policy.
+
+        Args:
+            commands (list): Command dataclasses from myenergi.const such as zappi_mode_command
+            timeout (float, optional): Seconds to wait for each change to be confirmed. Defaults to TIMEOUT.
+
+        Returns:
+            list: A command_result for each command in the same order as the commands
+        """
+        results = [None] * len(commands)
+
+        async def run_queue(queue: list) -> None:
+            for index in queue:
+                results[index] = await self._apply_command(commands[index], timeout)
+
+        await asyncio.gather(*(run_queue(queue) for queue in self._command_queues(commands)))
+        return results
+
+    async def _apply_command(self, command, timeout: float) -> myenergi.const.command_result:
+        """Carry out a command and wait for it to be confirmed, returning any error in the result.
+
+        Args:
+            command: One of the command dataclasses from myenergi.const
+            timeout (float): Seconds to wait for the change to be confirmed
+        """
+        try:
+            method, kwargs = self._command_call(command, timeout)
+            pending = await method(**kwargs)
+            if pending is not None:
+                await pending
+            return myenergi.const.command_result(command)
+        except myenergi.error.MyEnergiError as err:
+            return myenergi.const.command_result(command, err)
+
+    async def set_eddi_mode(self, serial: int, mode: EddiMode) -> None:
+        """Set the Eddi mode
+
+        Args:
+            serial (int): The serial number of the Eddi
+            mode (EddiMode): The mode to set the Eddi to from the list in EddiMode
+        """
+        serial = self._check_serial(MyenergiType.EDDI, serial)
+        self.logger.info("Setting mode for Eddi SN: %s to %s", serial, mode.name)
+        await self._api_request(self._create_url(endpoint=MyEnergiEndpoint.EDDI_MODE, serial=serial,
+                                                 parm=f"{mode.value}"))
+
+    async def set_zappi_mode(self, serial: int, mode: ZappiMode, wait: bool = True,
+                             timeout: float = TIMEOUT) -> asyncio.Future:
+        """Set the Zappi mode and confirm that the mode has changed.
+
+        Pass wait=False to set the mode of several Zappis and confirm the changes concurrently.
+
+        Args:
+            serial (int): The serial number of the zappi
+            mode (ZappiMode): The mode to set the Zappi to from the list in ZappiMode
+            wait (bool, optional): Wait until the change has been confirmed. Defaults to True.
+            timeout (float, optional): Seconds to wait for the change. Defaults to TIMEOUT.
+
+        Returns:
+            asyncio.Future: Completes when the Zappi reports the new mode or fails with TimeoutError
+        """
+        serial = self._check_serial(MyenergiType.ZAPPI, serial)
+        current_mode = self.get_zappi_info(serial, ZappiData.MODE)
+        if ZappiMode[mode] == current_mode:
+            self.logger.info("Mode for Zappi SN: %s is already %s", serial, mode)
+            return self._confirmed()
+        # set the Zappi mode as requested
+        self.logger.info("Setting mode for Zappi SN: %s to %s from %s", serial, mode, ZappiMode(current_mode).name)
+        await self._api_request(self._create_url(endpoint=MyEnergiEndpoint.ZAPPI_MODE, serial=serial,
+                                                 parm=f"{ZappiModeParm[mode].value}"))
+        return await self._confirm(serial, ZappiData.MODE, ZappiMode[mode], wait, timeout)
+
+    async def _confirm(self, serial: int, info: ZappiData, expected, wait: bool, timeout: float) -> asyncio.Future:
+        """Confirm that a Zappi reports the expected value, either waiting for it or in a background task.
+
+        Args:
+            serial (int): The serial number of the zappi
+            info (ZappiData): The field which should change
+            expected: The value the field should change to
+            wait (bool): Wait until the change has been confirmed
+            timeout (float): Seconds to wait for the change
+        """
+        task = asyncio.ensure_future(wait_for(self, serial, info, expected, timeout))
+        if wait:
+            await task
+        return task
+
+    @staticmethod
+    def _confirmed() -> asyncio.Future:
+        """Return a future which has already completed, for changes which did not need to be made."""
+        future = asyncio.get_running_loop().create_future()
+        future.set_result(None)
+        return future
+
+    async def set_eddi_boost(self, serial: int, heater: int = 1, boost_time: int = 0) -> None:
+        """Start or stop the Eddi boost.
+
+        Args:
+            serial (int): Serial number of the Eddi to boost
+            heater (int) : Number of the heater to boost
+            boost_time (int, optional): time for boost. Defaults to 0 which cancels boost
+        """
+        serial = self._check_serial(MyenergiType.EDDI, serial)
+        parm = self._eddi_boost_parm(serial, heater, boost_time)
+        await self._api_request(self._create_url(endpoint=MyEnergiEndpoint.EDDI_BOOST, serial=serial, parm=parm))
+
+    async def set_zappi_boost(self, serial: int, boost: ZappiBoost = ZappiBoost.STOP,
+                              kwh: int = 0, boost_time: str = None) -> None:
+        """Start or stop the Zappi boost.
+
+        Args:
+            serial (int): Serial number of the Zappi to boost
+            boost (ZappiBoost, optional): Start, Stop or Smart boost. Defaults to ZappiBoost.STOP.
+            kwh (int, optional): kwn to boost. Defaults to 0.
+            boost_time (int, optional): time for smart boost. Defaults to None.
+        """
+        serial = self._check_serial(MyenergiType.ZAPPI, serial)
+        parm = self._zappi_boost_parm(serial, boost, kwh, boost_time)
+        await self._api_request(self._create_url(endpoint=MyEnergiEndpoint.ZAPPI_MODE, serial=serial, parm=parm))
+
+    async def _api_request(self, url: str, stream: bool = False) -> json:
+        """Call the REST API with the passed URL and check the response before returning the JSON results.
+
+        Requests which read data are retried after timeouts, connection failures and server errors, and requests
+        refused because the server is busy are retried, as set out by the retry policy. If a cached server does
+        not respond the director is asked for the server and the request is sent there.
+
+        Args:
+            url (str): URL to be passed to the REST API
+            stream (bool, optional): Return the response as soon as the headers have been received, leaving the
+                body to be read, checked and closed by the caller. Defaults to False.
+        Returns:
+            json: The json returned by the REST API, or the open response if streaming
+        """
+        attempt = busy = 0
+        while True:
+            try:
+                data = await (self._send(url, stream=True) if stream else self._get(url))
+            except myenergi.error.MyEnergiError as err:
+                if isinstance(err, myenergi.error.ConnectionError) and not self._asn_verified:
+                    # The server cached for this hub did not respond so ask the director where the hub is now
+                    self.logger.warning("Cached myenergi server %s did not respond, asking the director", self._url)
+                    cached_url = self._url
+                    await self._resolve_asn()
+                    url = url.replace(cached_url, self._url, 1)
+                    continue
+                attempt += 1
+                delay = self._retry_delay(url, err, attempt)
+                if delay is None:
+                    raise
+                await asyncio.sleep(delay)
+                continue
+            if stream:
+                return data
+            busy += 1
+            delay = self._busy_delay(data, busy)
+            if delay is None:
+                # Check if there is a non-zero status response provided - status is not always returned
+                self._check_status(url, data)
+                return data
+            await asyncio.sleep(delay)
+
+    async def _get(self, url: str) -> json:
+        """Make a single request to the REST API and decode the JSON returned.
+
+        Args:
+            url (str): URL to be passed to the REST API
+        Returns:
+            json: The json returned by the REST API
+        """
+        started = time.monotonic()
+        results = await self._send(url)
+        # Get the JSON data from the results of the API call.
+        decode_started = time.monotonic()
+        data = results.json()
+        self._record_metrics(url, results, started, decode_started)
+        self._log_payload(data)
+        return data
+
+    async def _send(self, url: str, stream: bool = False) -> httpx.Response:
+        """Make a single request to the REST API, counting it against the stats and the circuit breaker.
+        At most concurrency requests are in flight at once, other requests wait for a free slot.
+
+        Args:
+            url (str): URL to be passed to the REST API
+            stream (bool, optional): Return once the headers have been received, keeping the slot until the caller
+                has closed the response and released it. Defaults to False.
+        Returns:
+            httpx.Response: The successful response
+        """
+        breaker = self._breaker(url)
+        self._check_breaker(breaker)
+        error = None
+        held = False
+        await self._limit.acquire()
+        try:
+            self.logger.debug("Calling Myenergi API with URL: %s", url)
+            started = time.monotonic()
+            try:
+                results = await self._client.send(self._client.build_request("GET", url), stream=stream)
+                if results.status_code != httpx.codes.OK:
+                    error = myenergi.error.HTTPError(results.status_code, url)
+                    await results.aclose()
+            except httpx.TimeoutException as err:
+                error = myenergi.error.RequestTimeoutError(f"Request to {url} timed out: {err}")
+            except httpx.TransportError as err:
+                error = myenergi.error.ConnectionError(f"Unable to connect for {url}: {err}")
+            except httpx.HTTPError as err:
+                error = myenergi.error.MyEnergiError(f"Request to {url} failed: {err}")
+            # A streamed body is read after the headers so the slot is kept until the response is closed
+            held = stream and error is None
+        finally:
+            if not held:
+                self._limit.release()
+        self._record_request(url, breaker, started, error)
+        self._asn_verified = True
+        # A response naming a different server means the hub has moved
+        if asn := results.headers.get(MyEnergiEndpoint.ASN_HEADER_FIELD.value):
+            self._set_asn(asn)
+        return results
@@ -0,0 +1,74 @@
+"""Provide digest authentication which reuses the server's nonce across threads.
+
+requests.auth.HTTPDigestAuth keeps the nonce from the last challenge in thread local storage. Each new thread,
+such as the workers used to fetch a range of history or confirm changes, starts without a nonce and so pays for
+an extra request which is answered with a 401 challenge. SharedDigestAuth keeps the challenge for each server in
+one place so that every thread can send the Authorization header with its first request. The nonce count (nc) is
+shared as well so that it keeps increasing for each use of the nonce, as the server expects.
+
+The number of 401 challenges is counted in the RequestStats passed so that it can be checked that steady-state
+polling needs a single HTTP exchange for each call.
+"""
+
+import threading
+from urllib.parse import urlsplit
+
+import requests.auth
+
+from myenergi.resilience import RequestStats
+
+# Only export the digest authentication
+__all__ = ["SharedDigestAuth"]
+
+
+class SharedDigestAuth(requests.auth.HTTPDigestAuth):
+    """
+    HTTP digest authentication which shares the challenge for each server between threads.
+
+    Args:
+        username (str): The user name, the serial number of the hub
+        password (str): The password for the account
+        stats (RequestStats): Where to count the 401 challenges received
+    """
+
+    def __init__(self, username: str, password: str, stats: RequestStats = None) -> None:
+        """Set up the shared challenge state.
+
+        Args:
+            username (str): The user name, the serial number of the hub
+            password (str): The password for the account
+            stats (RequestStats, optional): Where to count the 401 challenges. Defaults to None.
+        """
+        super().__init__(username, password)
+        self.stats = stats
+        self._lock = threading.Lock()
+        # The challenge, last nonce and nonce count for each server
+        self._servers = {}
+
+    def __call__(self, r: requests.PreparedRequest) -> requests.PreparedRequest:
+        """Start the request from the challenge last received from its server whichever thread received it."""
+        self.init_per_thread_state()
+        with self._lock:
+            chal, last_nonce, nonce_count = self._servers.get(urlsplit(r.url).netloc, ({}, "", 0))
+        self._thread_local.chal = dict(chal)
+        self._thread_local.last_nonce = last_nonce
+        self._thread_local.nonce_count = nonce_count
+        return super().__call__(r)
+
+    def build_digest_header(self, method: str, url: str) -> str | None:
+        """Build the Authorization header, counting the uses of a nonce across all threads."""
+        server = urlsplit(url).netloc
+        state = self._thread_local
+        with self._lock:
+            shared = self._servers.get(server)
+            if shared is not None and shared[0].get("nonce") == state.chal.get("nonce"):
+                state.last_nonce, state.nonce_count = shared[1], shared[2]
+            header = super().build_digest_header(method, url)
+            self._servers[server] = (dict(state.chal), state.last_nonce, state.nonce_count)
+        return header
+
+    def handle_401(self, r: requests.Response, **kwargs) -> requests.Response:
+        """Count the challenge and answer it."""
+        if r.status_code == 401 and self.stats is not None:
+            self.stats.count("challenges")
+        return super().handle_401(r, **kwargs)
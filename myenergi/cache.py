@@ -0,0 +1,190 @@
+"""Provide persistent caches of the history returned by the myenergi API and of the server used by each hub.
+
+The history for a day which has finished never changes so it is kept permanently once it has been fetched.
+The history for the current day (and any later day) is still being added to so it is only kept for a short time.
+
+History is stored in an SQLite database keyed by serial number, resolution and date. The resolution is the name
+of the endpoint used to obtain the history so that minute and hourly history are held separately.
+
+    with myenergi.API(serial, password, cache=HistoryCache()) as mye:
+        history = mye.get_zappi_history(serial, History.HOUR, "2023-07-22")
+
+The director tells the client which server (ASN) handles a hub. This rarely changes, so the ASNCache keeps it in a
+small JSON file for ttl seconds. The client then needs no director call on construction. The server is looked up
+again if the cached one does not respond or a response names a different server.
+
+    with myenergi.API(serial, password, asn_cache=ASNCache()) as mye:
+        print(mye.get_zappi_serials())
+"""
+
+import json
+import os
+import sqlite3
+import threading
+import time
+from datetime import datetime, timezone
+
+# Only export the history cache
+__all__ = ["ASNCache", "HistoryCache", "DEFAULT_CACHE_DIR"]
+
+DEFAULT_CACHE_DIR = os.path.expanduser("~/.cache/myenergi")
+
+
+class HistoryCache:
+    """
+    A persistent cache of history data held in an SQLite database.
+
+    Args:
+        path (str): The location of the database file
+        ttl (float): The number of seconds to keep history for the current day
+    """
+
+    def __init__(self, path: str = os.path.join(DEFAULT_CACHE_DIR, "history.sqlite"), ttl: float = 300) -> None:
+        """Open the database and create the history table if it does not exist.
+
+        Args:
+            path (str, optional): The location of the database file. Defaults to ~/.cache/myenergi/history.sqlite
+            ttl (float, optional): Seconds to keep history for the current day. Defaults to 300.
+        """
+        if path != ":memory:":
+            os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        self.ttl = ttl
+        # The connection is shared by the threads used to fetch history in parallel so access is serialised
+        self._lock = threading.Lock()
+        self._connection = sqlite3.connect(path, check_same_thread=False)
+        with self._lock, self._connection:
+            self._connection.execute("CREATE TABLE IF NOT EXISTS history (serial INTEGER, resolution TEXT, "
+                                     "date TEXT, fetched REAL, data TEXT, PRIMARY KEY (serial, resolution, date))")
+
+    def __enter__(self) -> "HistoryCache":
+        """Entry function for the history cache."""
+        return self
+
+    def __exit__(self, exc_type, exc_value, exc_traceback) -> None:
+        """Exit function for the history cache."""
+        self.close()
+
+    def close(self) -> None:
+        """Close the database."""
+        self._connection.close()
+
+    def get(self, serial: int, resolution: str, date: str) -> dict | None:
+        """Return the cached results for a day or None if they are not cached or have expired.
+
+        Args:
+            serial (int): The serial number of the device
+            resolution (str): The name of the history endpoint
+            date (str): The date of the history in the format YYYY-MM-DD
+        """
+        with self._lock:
+            row = self._connection.execute("SELECT fetched, data FROM history WHERE serial = ? AND resolution = ? "
+                                           "AND date = ?", (int(serial), resolution, date)).fetchone()
+        if row is None:
+            return None
+        fetched, data = row
+        if self._is_complete(date) or time.time() - fetched < self.ttl:
+            return json.loads(data)
+        return None
+
+    def put(self, serial: int, resolution: str, date: str, results: dict) -> None:
+        """Store the results for a day.
+
+        Args:
+            serial (int): The serial number of the device
+            resolution (str): The name of the history endpoint
+            date (str): The date of the history in the format YYYY-MM-DD
+            results (dict): The json returned by the history endpoint
+        """
+        with self._lock, self._connection:
+            self._connection.execute("INSERT OR REPLACE INTO history VALUES (?, ?, ?, ?, ?)",
+                                     (int(serial), resolution, date, time.time(), json.dumps(results)))
+
+    def clear(self) -> None:
+        """Remove all cached history."""
+        with self._lock, self._connection:
+            self._connection.execute("DELETE FROM history")
+
+    @staticmethod
+    def _is_complete(date: str) -> bool:
+        """Return whether a day has finished. The myenergi API provides history by UTC date.
+
+        Args:
+            date (str): The date in the format YYYY-MM-DD
+        """
+        return date < datetime.now(timezone.utc).strftime("%Y-%m-%d")
+
+
+class ASNCache:
+    """
+    A persistent cache of the server (ASN) which handles each hub, held in a JSON file.
+
+    Args:
+        path (str): The location of the JSON file
+        ttl (float): The number of seconds to keep the server for a hub
+    """
+
+    def __init__(self, path: str = os.path.join(DEFAULT_CACHE_DIR, "asn.json"), ttl: float = 7 * 86400) -> None:
+        """Set up the cache. The file is created when the first server is stored.
+
+        Args:
+            path (str, optional): The location of the JSON file. Defaults to ~/.cache/myenergi/asn.json
+            ttl (float, optional): Seconds to keep the server for a hub. Defaults to a week.
+        """
+        self.path = path
+        self.ttl = ttl
+        self._lock = threading.Lock()
+
+    def get(self, serial: str) -> str | None:
+        """Return the cached server for a hub or None if it is not cached or has expired.
+
+        Args:
+            serial (str): The serial number of the hub
+        """
+        with self._lock:
+            entry = self._load().get(str(serial))
+        if entry is None or time.time() - entry["fetched"] >= self.ttl:
+            return None
+        return entry["asn"]
+
+    def put(self, serial: str, asn: str) -> None:
+        """Store the server for a hub.
+
+        Args:
+            serial (str): The serial number of the hub
+            asn (str): The host name of the server
+        """
+        with self._lock:
+            entries = self._load()
+            entries[str(serial)] = {"asn": asn, "fetched": time.time()}
+            self._save(entries)
+
+    def forget(self, serial: str) -> None:
+        """Remove the server for a hub so that it is looked up again.
+
+        Args:
+            serial (str): The serial number of the hub
+        """
+        with self._lock:
+            entries = self._load()
+            if entries.pop(str(serial), None) is not None:
+                self._save(entries)
+
+    def _load(self) -> dict:
+        """Return the entries in the file, or no entries if it is missing or cannot be read."""
+        try:
+            with open(self.path) as file:
+                return json.load(file)
+        except (OSError, ValueError):
+            return {}
+
+    def _save(self, entries: dict) -> None:
+        """Write the entries to a temporary file and move it into place so that readers never see part of a file.
+
+        Args:
+            entries (dict): The entries to write
+        """
+        os.makedirs(os.path.dirname(os.path.abspath(self.path)), exist_ok=True)
+        temporary = f"{self.path}.{os.getpid()}.tmp"
+        with open(temporary, "w") as file:
+            json.dump(entries, file)
+        os.replace(temporary, self.path)
@@ -0,0 +1,144 @@
+"""Confirm that changes requested of a Zappi have taken effect.
+
+The myenergi API accepts a command before the Zappi has acted on it, so the client polls the status of the Zappi
+until it reports the requested value. Only the lightweight cgi-jstatus-Z<serial> endpoint is polled. The first
+poll is made after initial_delay seconds and the wait is multiplied by backoff after each poll, up to max_delay,
+until the deadline passes and a TimeoutError is raised.
+
+Confirmations run in a thread pool so that changes to several Zappis are confirmed in parallel. The caller gets
+a Future which completes when the change has been seen or fails with the error which stopped the confirmation.
+"""
+
+import asyncio
+import logging
+import time
+from concurrent.futures import Future, ThreadPoolExecutor
+
+import myenergi.error
+from myenergi.const import MyenergiType, ZappiData
+
+# Only export the confirmation engine and its helpers
+__all__ = ["ConfirmationEngine", "backoff_delays", "confirmed", "wait_for"]
+
+# Defaults for how long to wait for a change and how often to poll
+TIMEOUT = 60
+INITIAL_DELAY = 1
+MAX_DELAY = 8
+BACKOFF = 2
+
+
+def backoff_delays(initial: float = INITIAL_DELAY, maximum: float = MAX_DELAY, factor: float = BACKOFF):
+    """Generate the waits between polls, starting at initial and multiplying by factor up to maximum."""
+    delay = initial
+    while True:
+        yield delay
+        delay = min(delay * factor, maximum)
+
+
+def confirmed() -> Future:
+    """Return a Future which has already completed, for changes which did not need to be made."""
+    future = Future()
+    future.set_result(None)
+    return future
+
+
+class ConfirmationEngine:
+    """
+    Poll the status of Zappis in a thread pool until they report requested values.
+
+    Args:
+        api (API): The myenergi API client used to poll the status
+        timeout (float): Seconds to wait for a change before giving up
+        initial_delay (float): Seconds to wait before the first poll
+        max_delay (float): The longest wait between polls
+        backoff (float): The factor the wait is multiplied by after each poll
+        workers (int): The number of changes which can be confirmed in parallel
+    """
+
+    def __init__(self, api, timeout: float = TIMEOUT, initial_delay: float = INITIAL_DELAY,
+                 max_delay: float = MAX_DELAY, backoff: float = BACKOFF, workers: int = 4) -> None:
+        """Set up the thread pool used to confirm changes.
+
+        Args:
+            api (API): The myenergi API client used to poll the status
+            timeout (float, optional): Seconds to wait for a change. Defaults to TIMEOUT.
+            initial_delay (float, optional): Seconds to wait before the first poll. Defaults to INITIAL_DELAY.
+            max_delay (float, optional): The longest wait between polls. Defaults to MAX_DELAY.
+            backoff (float, optional): Factor to multiply the wait by after each poll. Defaults to BACKOFF.
+            workers (int, optional): Number of changes confirmed in parallel. Defaults to 4.
+        """
+        self.logger = logging.getLogger(__name__)
+        self.api = api
+        self.timeout = timeout
+        self.initial_delay = initial_delay
+        self.max_delay = max_delay
+        self.backoff = backoff
+        self._executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="myenergi-confirm")
+
+    def submit(self, serial: int, info: ZappiData, expected, timeout: float = None) -> Future:
+        """Start confirming that a Zappi reports the expected value without waiting for it.
+
+        Args:
+            serial (int): The serial number of the zappi
+            info (ZappiData): The field which should change
+            expected: The value the field should change to
+            timeout (float, optional): Seconds to wait for the change. Defaults to the timeout of the engine.
+
+        Returns:
+            Future: Completes when the change has been seen or fails with TimeoutError
+        """
+        return self._executor.submit(self.confirm, serial, info, expected, timeout)
+
+    def confirm(self, serial: int, info: ZappiData, expected, timeout: float = None) -> None:
+        """Poll the status of a Zappi until it reports the expected value.
+
+        Args:
+            serial (int): The serial number of the zappi
+            info (ZappiData): The field which should change
+            expected: The value the field should change to
+            timeout (float, optional): Seconds to wait for the change. Defaults to the timeout of the engine.
+        """
+        deadline = time.monotonic() + (self.timeout if timeout is None else timeout)
+        for delay in backoff_delays(self.initial_delay, self.max_delay, self.backoff):
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                raise myenergi.error.TimeoutError(f"Timed out waiting for {info.name} for Zappi SN:{serial} "
+                                                  f"to switch to {expected}")
+            time.sleep(min(delay, remaining))
+            self.api.refresh_status(MyenergiType.ZAPPI, serial, boost_times=False)
+            if self.api.get_zappi_info(serial, info) == expected:
+                self.logger.info("%s for Zappi SN:%s has been switched to %s", info.name, serial, expected)
+                return
+
+    def close(self) -> None:
+        """Wait for the outstanding confirmations and shut down the thread pool."""
+        self._executor.shutdown(wait=True)
+
+
+async def wait_for(api, serial: int, info: ZappiData, expected, timeout: float = TIMEOUT,
+                   initial_delay: float = INITIAL_DELAY, max_delay: float = MAX_DELAY,
+                   backoff: float = BACKOFF) -> None:
+    """Poll the status of a Zappi with the asyncio client until it reports the expected value.
+
+    Args:
+        api (AsyncAPI): The asyncio myenergi API client used to poll the status
+        serial (int): The serial number of the zappi
+        info (ZappiData): The field which should change
+        expected: The value the field should change to
+        timeout (float, optional): Seconds to wait for the change. Defaults to TIMEOUT.
+        initial_delay (float, optional): Seconds to wait before the first poll. Defaults to INITIAL_DELAY.
+        max_delay (float, optional): The longest wait between polls. Defaults to MAX_DELAY.
+        backoff (float, optional): Factor to multiply the wait by after each poll. Defaults to BACKOFF.
+    """
+    loop = asyncio.get_running_loop()
+    deadline = loop.time() + timeout
+    for delay in backoff_delays(initial_delay, max_delay, backoff):
+        remaining = deadline - loop.time()
+        if remaining <= 0:
+            raise myenergi.error.TimeoutError(f"Timed out waiting for {info.name} for Zappi SN:{serial} "
+                                              f"to switch to {expected}")
+        await asyncio.sleep(min(delay, remaining))
+        await api.refresh_status(MyenergiType.ZAPPI, serial, boost_times=False)
+        if api.get_zappi_info(serial, info) == expected:
+            api.logger.info("%s for Zappi SN:%s has been switched to %s", info.name, serial, expected)
+            return
@@ -1,8 +1,9 @@
 """Provide constants and dataclasses used by the myenergi API."""
 
-from dataclasses import dataclass, field
-from datetime import date, datetime, time
+from dataclasses import InitVar, dataclass, field
+from datetime import date, datetime, time, timezone, tzinfo
 from enum import Enum
+from typing import ClassVar
 from myenergi.apiconstruct import baseclass
 
 
@@ -31,8 +32,8 @@ class MyEnergiEndpoint(Enum):
     EDDI = "cgi-jstatus-E"
     EDDI_MODE = "cgi-eddi-mode-Z"
     EDDI_PRIORITY = "cgi-set-heater-priority-E"
-    EDDI_HISTORY_MINUTE = "cgi-jhour-E"
-    EDDI_HISTORY_HOUR = "cgi-jday-E"
+    EDDI_HISTORY_MINUTE = "cgi-jday-E"
+    EDDI_HISTORY_HOUR = "cgi-jdayhour-E"
     EDDI_BOOST_TIME = "cgi-boost-time-E"
     EDDI_BOOST = "cgi-eddi-boost-E"
     DIRECTOR_URL = "https://director.myenergi.net"
@@ -100,6 +101,15 @@ class History(Enum):
     HOUR = "ZAPPI_HISTORY_HOUR"
 
 
+class Rollup(Enum):
+    """Periods the history statistics can be totalled over."""
+    QUARTER_HOUR = "15min"
+    HOUR = "hour"
+    DAY = "day"
+    WEEK = "week"
+    MONTH = "month"
+
+
 class EddiData(Enum):
     """Data returned for the Eddi."""
     DATE = "dat"
@@ -375,7 +385,34 @@ class ZappiStats(Enum):
     HOME_GRID = 'hog'
 
 
-@dataclass
+class EddiStats(Enum):
+    """Human readable names for the Eddi History Statistics."""
+    GRID_IMPORTED = 'imp'
+    GRID_EXPORTED = 'exp'
+    SOLAR_GENERATED = 'gep'
+    SOLAR_USED = 'gen'
+    HEATER1_DIVERTED = 'h1d'
+    HEATER2_DIVERTED = 'h2d'
+    HEATER1_BOOSTED = 'h1b'
+    HEATER2_BOOSTED = 'h2b'
+
+
+def history_timestamp(year: int, month: int, day: int, hour: int, minute: int, tz: tzinfo = None) -> datetime:
+    """Create the timestamp for a history record directly from its integer fields.
+
+    History is returned in UTC so the timestamp is naive UTC unless a timezone is passed to convert it to.
+
+    Args:
+        year, month, day, hour, minute (int): The date and time fields of the history record
+        tz (tzinfo, optional): The timezone to convert the timestamp to. Defaults to None.
+    """
+    timestamp = datetime(year, month, day, hour, minute)
+    if tz is not None:
+        timestamp = timestamp.replace(tzinfo=timezone.utc).astimezone(tz)
+    return timestamp
+
+
+@dataclass(slots=True)
 class minute_data:
     """_This dataclass describes the history data by minute provided by the Zappi"""
     dow: WeekDay
@@ -401,16 +438,16 @@ class minute_data:
     pect3: int = 0
     nect3: int = 0
     timestamp: datetime = field(init=False)
+    tz: InitVar[tzinfo] = None
 
-    def __post_init__(self):
-        self.timestamp = datetime.strptime(str(self.dom) + ":" + str(self.mon) + ":" + str(self.yr) + ":" +
-                                           str(self.hr) + ":" + str(self.min), "%d:%m:%Y:%H:%M")
+    def __post_init__(self, tz):
+        self.timestamp = history_timestamp(self.yr, self.mon, self.dom, self.hr, self.min, tz)
         self.v1 = round(self.v1/10, 1)
         self.frq = round(self.frq/100, 1)
         self.hog = self.imp - self.gen - self.h1b
         self.hos = self.gep - self.exp - self.h1d
         for stat in ZappiStats:
-            setattr(self, stat, round(getattr(self, stat) / 60 / 1000, 3))
+            setattr(self, stat.value, round(getattr(self, stat.value) / 60 / 1000, 3))
 
 
 @dataclass
@@ -426,7 +463,7 @@ class minute_history:
                     **self.history_data[index])
 
 
-@dataclass
+@dataclass(slots=True)
 class hourly_data:
     """_This dataclass describes the hourly history data provided by the Zappi"""
     dow: WeekDay
@@ -443,10 +480,10 @@ class hourly_data:
     gen: int = 0
     hr: range(23) = 0
     timestamp: datetime = field(init=False)
+    tz: InitVar[tzinfo] = None
 
-    def __post_init__(self):
-        self.timestamp = datetime.strptime(str(self.dom) + ":" + str(self.mon) + ":" +
-                                           str(self.yr) + ":" + str(self.hr) + ":0", "%d:%m:%Y:%H:%M")
+    def __post_init__(self, tz):
+        self.timestamp = history_timestamp(self.yr, self.mon, self.dom, self.hr, 0, tz)
         self.hog = self.imp - self.gen - self.h1b
         self.hos = self.gep - self.exp - self.h1d
         for stat in ZappiStats:
@@ -467,7 +504,69 @@ class hourly_history:
                     **self.history_data[index])
 
 
-@dataclass
+@dataclass(slots=True)
+class eddi_minute_data:
+    """_This dataclass describes the history data by minute provided by the Eddi, with the energy diverted to and
+    boosted into each heater."""
+    dow: WeekDay
+    dom: range(1, 31)
+    mon: range(1, 12)
+    yr: range(1000, 9999)
+    hr: range(23) = 0
+    min: range(59) = 0
+    imp: int = 0
+    exp: int = 0
+    gep: int = 0
+    gen: int = 0
+    h1d: int = 0
+    h2d: int = 0
+    h1b: int = 0
+    h2b: int = 0
+    v1: int = 0
+    frq: int = 0
+    pect1: int = 0
+    nect1: int = 0
+    pect2: int = 0
+    nect2: int = 0
+    pect3: int = 0
+    nect3: int = 0
+    timestamp: datetime = field(init=False)
+    tz: InitVar[tzinfo] = None
+
+    def __post_init__(self, tz):
+        self.timestamp = history_timestamp(self.yr, self.mon, self.dom, self.hr, self.min, tz)
+        self.v1 = round(self.v1/10, 1)
+        self.frq = round(self.frq/100, 1)
+        for stat in EddiStats:
+            setattr(self, stat.value, round(getattr(self, stat.value) / 60 / 1000, 3))
+
+
+@dataclass(slots=True)
+class eddi_hourly_data:
+    """_This dataclass describes the hourly history data provided by the Eddi"""
+    dow: WeekDay
+    dom: range(1, 31)
+    mon: range(1, 12)
+    yr: range(1000, 9999)
+    hr: range(23) = 0
+    imp: int = 0
+    exp: int = 0
+    gep: int = 0
+    gen: int = 0
+    h1d: int = 0
+    h2d: int = 0
+    h1b: int = 0
+    h2b: int = 0
+    timestamp: datetime = field(init=False)
+    tz: InitVar[tzinfo] = None
+
+    def __post_init__(self, tz):
+        self.timestamp = history_timestamp(self.yr, self.mon, self.dom, self.hr, 0, tz)
+        for stat in EddiStats:
+            setattr(self, stat.value, round(getattr(self, stat.value) / 3600 / 1000, 2))
+
+
+@dataclass(slots=True)
 class daily_data:
     """_This dataclass describes the daily history data entry created from the Zappi hourly history"""
     timestamp: datetime
@@ -488,6 +587,102 @@ class daily_history:
     history_data: list[daily_data] = field(default_factory=list)
 
 
+@dataclass
+class history_range:
+    """_This dataclass describes the history obtained for a range of dates for one or more devices.
+
+    The history for each serial number is held in a dict keyed by date string in date order. Any dates which
+    could not be obtained are held in failures with the error that was raised for them."""
+    history_type: History
+    history: dict[int, dict[str, hourly_history]] = field(default_factory=dict)
+    failures: dict[int, dict[str, Exception]] = field(default_factory=dict)
+
+
+@dataclass
+class device_change:
+    """_This dataclass describes the fields of a device which changed between two status queries.
+
+    Each changed field maps to a tuple of the old and new values. A device which has appeared or disappeared
+    has None as its old or new values."""
+    device: MyenergiType
+    serial: int
+    changes: dict[str, tuple] = field(default_factory=dict)
+
+
+class status_changes(dict):
+    """_This dict holds the names of the fields which changed for each serial number after a status refresh.
+
+    The status version before and after the refresh is kept as well, so that a caller can tell whether another
+    refresh changed the devices since it last looked."""
+
+    def __init__(self, changes: dict = None, previous: int = 0, version: int = 0) -> None:
+        super().__init__(changes or {})
+        self.previous = previous
+        self.version = version
+
+
+@dataclass
+class zappi_mode_command:
+    """_This dataclass describes a command to set the mode of a Zappi to one of the names in ZappiMode."""
+    serial: int
+    mode: str
+    device: ClassVar[MyenergiType] = MyenergiType.ZAPPI
+
+
+@dataclass
+class zappi_boost_command:
+    """_This dataclass describes a command to START or STOP a Zappi boost, the kWh are only needed to start one."""
+    serial: int
+    boost: str
+    kwh: int = 0
+    device: ClassVar[MyenergiType] = MyenergiType.ZAPPI
+
+
+@dataclass
+class zappi_smart_boost_command:
+    """_This dataclass describes a command to boost a Zappi by a number of kWh by a time in the format HHMM."""
+    serial: int
+    kwh: int
+    boost_time: str
+    device: ClassVar[MyenergiType] = MyenergiType.ZAPPI
+
+
+@dataclass
+class zappi_min_green_command:
+    """_This dataclass describes a command to set the minimum green limit of a Zappi."""
+    serial: int
+    percentage: int
+    device: ClassVar[MyenergiType] = MyenergiType.ZAPPI
+
+
+@dataclass
+class eddi_boost_command:
+    """_This dataclass describes a command to boost an Eddi heater for a number of minutes, zero stops the boost."""
+    serial: int
+    heater: int = 1
+    boost_time: int = 0
+    device: ClassVar[MyenergiType] = MyenergiType.EDDI
+
+
+@dataclass
+class eddi_mode_command:
+    """_This dataclass describes a command to set the mode of an Eddi."""
+    serial: int
+    mode: EddiMode
+    device: ClassVar[MyenergiType] = MyenergiType.EDDI
+
+
+@dataclass
+class command_result:
+    """_This dataclass describes the outcome of a command, the error is None if the command succeeded."""
+    command: object
+    error: Exception = None
+
+    @property
+    def succeeded(self) -> bool:
+        return self.error is None
+
+
 @dataclass
 class boosttime:
     """_This dataclass describes the data for a Zappi boost time."""
@@ -513,7 +708,7 @@ class boosttimes:
             boost for boost in self.boost_times if boost.bdd != "00000000"]
 
 
-@dataclass
+@dataclass(slots=True)
 class eddi(baseclass):
     """_This dataclass describes the data returned for a Eddi."""
     dat: date
@@ -543,12 +738,8 @@ class eddi(baseclass):
     timestamp: datetime = None
     boost_times: boosttimes = None
 
-    def __post_init__(self):
-        super().__post_init__()
-        self.timestamp = datetime.combine(self.dat, self.tim)
 
-
-@dataclass
+@dataclass(slots=True)
 class libbi(baseclass):
     """_This dataclass describes the data returned for a Libbi."""
     dat: date
@@ -592,12 +783,8 @@ class libbi(baseclass):
     vol: int
     timestamp: datetime = None
 
-    def __post_init__(self):
-        super().__post_init__()
-        self.timestamp = datetime.combine(self.dat, self.tim)
 
-
-@dataclass
+@dataclass(slots=True)
 class harvi(baseclass):
     """_This dataclass describes the data returned for a Harvi."""
     dat: date
@@ -616,12 +803,8 @@ class harvi(baseclass):
     deviceClass: str
     timestamp: datetime = None
 
-    def __post_init__(self):
-        super().__post_init__()
-        self.timestamp = datetime.combine(self.dat, self.tim)
-
 
-@dataclass
+@dataclass(slots=True)
 class zappi(baseclass):
     """_This dataclass describes the data returned for a Zappi."""
     bsm: int
@@ -681,12 +864,18 @@ class zappi(baseclass):
     timestamp: datetime = None
     boost_times: boosttimes = None
 
+    # The slots dataclass is a new class so zero argument super() cannot be used in its methods
     def __post_init__(self):
-        super().__post_init__()
-        self.timestamp = datetime.combine(self.dat, self.tim)
+        baseclass.__post_init__(self)
         # Voltage is supplied as an integer in decivolts so need to divide by 10
         self.vol = round(self.vol/10, 1)
 
+    def update(self, changes: dict) -> set:
+        changed = baseclass.update(self, changes)
+        if "vol" in changes:
+            self.vol = round(self.vol/10, 1)
+        return changed
+
 
 @dataclass
 class devices:
@@ -16,9 +16,36 @@ class TimeoutError(MyEnergiError):
 
 class ResponseError(MyEnergiError):
     def __init__(self, error):
-        super().__init__(f"myenergi nonzero response: {MyEnergiResponse(int(error))}")
+        self.status = MyEnergiResponse(int(error))
+        super().__init__(f"myenergi nonzero response: {self.status}")
 
 
 class ParameterError(MyEnergiError):
     def __init__(self, error):
         super().__init__(f"myenergi parameter error: {error}")
+
+
+class RequestTimeoutError(TimeoutError):
+    def __init__(self, msg):
+        super().__init__(msg)
+
+
+class ConnectionError(MyEnergiError):
+    def __init__(self, msg):
+        super().__init__(msg)
+
+
+class HTTPError(MyEnergiError):
+    def __init__(self, status_code, msg):
+        self.status_code = status_code
+        super().__init__(f"myenergi HTTP error {status_code}: {msg}")
+
+
+class CircuitOpenError(MyEnergiError):
+    def __init__(self, msg):
+        super().__init__(msg)
+
+
+class ParseError(MyEnergiError):
+    def __init__(self, msg):
+        super().__init__(msg)
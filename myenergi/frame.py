@@ -0,0 +1,173 @@
+"""Provide a columnar representation of the history returned by the myenergi API.
+
+A HistoryFrame holds one numpy array per history field rather than one dataclass instance per minute or hour.
+The timestamps are held as an array of seconds since the epoch (UTC) and the scaling of the statistics and the
+derived home grid (hog) and home solar (hos) values are calculated for the whole array at once. The statistics can
+be totalled over periods from 15 minutes to a month with rollup, which groups the whole array at once as well.
+
+This needs the optional numpy dependency.
+"""
+
+from dataclasses import dataclass, field
+from datetime import tzinfo
+
+import numpy as np
+
+from myenergi.const import EddiStats, History, MyenergiType, Rollup, ZappiStats
+
+# Only export the history frame
+__all__ = ["HistoryFrame"]
+
+# Raw fields returned for each type of device and resolution of history, any missing from a record are zero
+HISTORY_FIELDS = {
+    (MyenergiType.ZAPPI, History.MINUTE): ("imp", "exp", "gep", "gen", "h1d", "h1b", "v1", "frq",
+                                           "pect1", "nect1", "pect2", "nect2", "pect3", "nect3"),
+    (MyenergiType.ZAPPI, History.HOUR): ("imp", "exp", "gep", "gen", "h1d", "h1b"),
+    (MyenergiType.EDDI, History.MINUTE): ("imp", "exp", "gep", "gen", "h1d", "h2d", "h1b", "h2b", "v1", "frq",
+                                          "pect1", "nect1", "pect2", "nect2", "pect3", "nect3"),
+    (MyenergiType.EDDI, History.HOUR): ("imp", "exp", "gep", "gen", "h1d", "h2d", "h1b", "h2b"),
+}
+# The energy statistics of each type of device
+DEVICE_STATS = {
+    MyenergiType.ZAPPI: ZappiStats,
+    MyenergiType.EDDI: EddiStats,
+}
+# The statistics are returned in joules over the period and are divided by this to give the figures in kWh
+STAT_DIVISOR = {
+    History.MINUTE: 60 * 1000,
+    History.HOUR: 3600 * 1000,
+}
+# The length of the rollup periods which are a fixed number of seconds
+PERIOD_SECONDS = {
+    Rollup.QUARTER_HOUR: 15 * 60,
+    Rollup.HOUR: 3600,
+    Rollup.DAY: 86400,
+}
+# The epoch was a Thursday, the fourth day of a week starting on Monday
+EPOCH_WEEKDAY = 3
+
+
+@dataclass
+class HistoryFrame:
+    """_This dataclass describes history data held as one array per field.
+
+    The ZappiStats or EddiStats fields are scaled in the same way as the history dataclasses but are not rounded.
+    Voltage (v1) is in volts, frequency (frq) in Hz and the CT fields are left as returned.
+    A frame created by rollup has the period it totals and the start of each period as its timestamps."""
+    serial: int
+    history_type: History
+    timestamp: np.ndarray = field(default_factory=lambda: np.zeros(0, dtype=np.int64))
+    columns: dict[str, np.ndarray] = field(default_factory=dict)
+    period: Rollup = None
+    device: MyenergiType = MyenergiType.ZAPPI
+
+    def __getattr__(self, name: str) -> np.ndarray:
+        """Return the array for a field so that frame.imp works in the same way as for the dataclasses."""
+        if name != "columns" and name in self.columns:
+            return self.columns[name]
+        raise AttributeError(f"{type(self).__name__} has no field {name}")
+
+    def __getitem__(self, name: str) -> np.ndarray:
+        """Return the array for a field."""
+        return self.columns[name]
+
+    def __len__(self) -> int:
+        """Return the number of records in the frame."""
+        return len(self.timestamp)
+
+    @property
+    def datetimes(self) -> np.ndarray:
+        """Return the timestamps as an array of numpy UTC datetimes."""
+        return self.timestamp.astype("datetime64[s]")
+
+    @classmethod
+    def from_records(cls, serial: int, history_type: History, records: list,
+                     device: MyenergiType = MyenergiType.ZAPPI) -> "HistoryFrame":
+        """Create a frame from the list of records returned by a history endpoint.
+        Zappi frames also have the home grid (hog) and home solar (hos) columns.
+
+        Args:
+            serial (int): The serial number of the device
+            history_type (History): Whether the records are by Minute or by Hour
+            records (list): The records for the serial number from the history endpoint
+            device (MyenergiType, optional): The type of device, a Zappi or an Eddi. Defaults to ZAPPI.
+        """
+        count = len(records)
+
+        def column(name: str) -> np.ndarray:
+            return np.fromiter((record.get(name, 0) for record in records), dtype=np.int64, count=count)
+
+        timestamp = ((column("yr") - 1970).astype("datetime64[Y]").astype("datetime64[M]")
+                     + (column("mon") - 1).astype("timedelta64[M]")).astype("datetime64[D]")
+        timestamp = timestamp + (column("dom") - 1).astype("timedelta64[D]")
+        timestamp = timestamp.astype(np.int64) * 86400 + column("hr") * 3600 + column("min") * 60
+        columns = {name: column(name) for name in HISTORY_FIELDS[(device, history_type)]}
+        if device == MyenergiType.ZAPPI:
+            columns[ZappiStats.HOME_GRID.value] = (columns[ZappiStats.GRID_IMPORTED.value] -
+                                                   columns[ZappiStats.SOLAR_USED.value] -
+                                                   columns[ZappiStats.ZAPPI_IMPORTED.value])
+            columns[ZappiStats.HOME_SOLAR.value] = (columns[ZappiStats.SOLAR_GENERATED.value] -
+                                                    columns[ZappiStats.GRID_EXPORTED.value] -
+                                                    columns[ZappiStats.ZAPPI_DIVERTED.value])
+        for stat in DEVICE_STATS[device]:
+            columns[stat.value] = columns[stat.value] / STAT_DIVISOR[history_type]
+        if history_type == History.MINUTE:
+            # Voltage is supplied in decivolts and frequency in centihertz
+            columns["v1"] = columns["v1"] / 10
+            columns["frq"] = columns["frq"] / 100
+        return cls(serial, history_type, timestamp, columns, device=device)
+
+    def rollup(self, period: Rollup, stats: list = None, decimals: int = 3, tz: tzinfo = None) -> "HistoryFrame":
+        """Total statistics over each period, such as each day or month, with one vectorised sum per statistic.
+        The totals are only rounded once they have been summed. Periods without any history are left out.
+
+        Args:
+            period (Rollup): The period to total over
+            stats (list, optional): The ZappiStats or EddiStats to total. Defaults to all of them.
+            decimals (int, optional): The decimal places to round the totals to, or None to leave them unrounded.
+                Defaults to 3.
+            tz (tzinfo, optional): A fixed offset timezone, such as from get_zappi_timezone, whose days, weeks and
+                months are used. Weeks start on Monday. Defaults to UTC.
+        """
+        offset = 0 if tz is None else int(tz.utcoffset(None).total_seconds())
+        local = self.timestamp + offset
+        if period == Rollup.MONTH:
+            days = (local // 86400).astype("datetime64[D]")
+            starts = days.astype("datetime64[M]").astype("datetime64[D]").astype(np.int64) * 86400
+        elif period == Rollup.WEEK:
+            days = local // 86400
+            starts = (days - (days + EPOCH_WEEKDAY) % 7) * 86400
+        else:
+            starts = local // PERIOD_SECONDS[period] * PERIOD_SECONDS[period]
+        if np.all(starts[1:] >= starts[:-1]):
+            # History is normally in time order so each period is a run of records which can be summed in place
+            first = np.flatnonzero(np.diff(starts, prepend=starts[:1] - 1))
+            keys = starts[first]
+
+            def total(values: np.ndarray) -> np.ndarray:
+                return np.add.reduceat(values, first) if len(first) else values[:0]
+        else:
+            keys, groups = np.unique(starts, return_inverse=True)
+
+            def total(values: np.ndarray) -> np.ndarray:
+                return np.bincount(groups, weights=values, minlength=len(keys))
+        columns = {}
+        for stat in stats or DEVICE_STATS[self.device]:
+            name = DEVICE_STATS[self.device](getattr(stat, "value", stat)).value
+            columns[name] = total(self.columns[name])
+            if decimals is not None:
+                columns[name] = columns[name].round(decimals)
+        return HistoryFrame(self.serial, self.history_type, keys - offset, columns, period, self.device)
+
+    @classmethod
+    def concat(cls, frames: list) -> "HistoryFrame":
+        """Join frames for the same device and resolution into one frame, such as the frames for a range of days.
+
+        Args:
+            frames (list): The frames to join in the order they should appear
+        """
+        first = frames[0]
+        return cls(first.serial, first.history_type,
+                   np.concatenate([frame.timestamp for frame in frames]),
+                   {name: np.concatenate([frame.columns[name] for frame in frames]) for name in first.columns},
+                   first.period, first.device)
@@ -0,0 +1,204 @@
+"""Provide optional per endpoint instrumentation of the calls made to the myenergi API.
+
+When an API client is given a Metrics instance it records, for each MyEnergiEndpoint:
+
+- the number of requests and how many of them failed
+- the time spent waiting for the server (latency)
+- the size of the responses in bytes
+- the time spent decoding the JSON
+- the time spent building the dataclasses or HistoryFrames from the JSON
+
+Comparing the latency with the decode and build times shows whether a poller is bound by the network or the CPU.
+The metrics are read with snapshot and can be pushed to any number of exporters with export. An exporter is any
+callable which takes the snapshot, such as LogExporter.
+
+    metrics = Metrics(exporters=[LogExporter()])
+    with myenergi.API(serial, password, metrics=metrics) as mye:
+        mye.refresh_devices()
+        metrics.export()
+"""
+
+import contextlib
+import logging
+import threading
+import time
+from dataclasses import asdict, dataclass
+from urllib.parse import urlsplit
+
+from myenergi.const import MyEnergiEndpoint
+
+# Only export the metrics and exporters
+__all__ = ["Metrics", "EndpointMetrics", "LogExporter", "endpoint_for"]
+
+# The endpoints which are called, longest first so that the most specific prefix matches
+ENDPOINTS = sorted((endpoint for endpoint in MyEnergiEndpoint if isinstance(endpoint.value, str) and
+                    endpoint.value.startswith("cgi-")), key=lambda endpoint: len(endpoint.value), reverse=True)
+
+
+def endpoint_for(url: str) -> MyEnergiEndpoint | None:
+    """Return the endpoint a URL calls or None if it is not a known endpoint.
+
+    Args:
+        url (str): The URL of the request
+    """
+    if url.rstrip("/") == MyEnergiEndpoint.DIRECTOR_URL.value:
+        return MyEnergiEndpoint.DIRECTOR_URL
+    path = urlsplit(url).path.lstrip("/")
+    return next((endpoint for endpoint in ENDPOINTS if path.startswith(endpoint.value)), None)
+
+
+@dataclass
+class EndpointMetrics:
+    """_This dataclass describes the calls made to one endpoint. Times are totals in seconds."""
+    calls: int = 0
+    errors: int = 0
+    bytes: int = 0
+    latency: float = 0.0
+    latency_max: float = 0.0
+    decode: float = 0.0
+    builds: int = 0
+    build: float = 0.0
+
+
+class Metrics:
+    """
+    Record the latency, response size, decode time, build time and errors of the calls to each endpoint.
+
+    Args:
+        exporters (list): Callables which are passed the snapshot when export is called
+    """
+
+    def __init__(self, exporters: list = None) -> None:
+        """Start with no calls recorded.
+
+        Args:
+            exporters (list, optional): Callables passed the snapshot by export. Defaults to None.
+        """
+        self.exporters = list(exporters or [])
+        self._lock = threading.Lock()
+        self._endpoints = {}
+
+    def _entry(self, endpoint: MyEnergiEndpoint | None) -> EndpointMetrics:
+        """Return the metrics for an endpoint, creating them on the first call. Must be called with the lock held.
+
+        Args:
+            endpoint (MyEnergiEndpoint): The endpoint called, None for an unknown endpoint
+        """
+        name = endpoint.name if endpoint is not None else "OTHER"
+        entry = self._endpoints.get(name)
+        if entry is None:
+            entry = self._endpoints[name] = EndpointMetrics()
+        return entry
+
+    def record_request(self, url: str, latency: float, size: int = 0, decode: float = 0.0,
+                       failed: bool = False) -> None:
+        """Record a request to the REST API.
+
+        Args:
+            url (str): The URL of the request
+            latency (float): Seconds until the response was received
+            size (int, optional): Size of the response body in bytes. Defaults to 0.
+            decode (float, optional): Seconds taken to decode the JSON. Defaults to 0.0.
+            failed (bool, optional): Whether the request failed. Defaults to False.
+        """
+        endpoint = endpoint_for(url)
+        with self._lock:
+            entry = self._entry(endpoint)
+            entry.calls += 1
+            entry.errors += failed
+            entry.bytes += size
+            entry.latency += latency
+            entry.latency_max = max(entry.latency_max, latency)
+            entry.decode += decode
+
+    def record_error(self, url: str) -> None:
+        """Count an error reported in the body of a successful response, such as a non-zero status.
+
+        Args:
+            url (str): The URL of the request
+        """
+        endpoint = endpoint_for(url)
+        with self._lock:
+            self._entry(endpoint).errors += 1
+
+    def record_build(self, endpoint: MyEnergiEndpoint, seconds: float) -> None:
+        """Record the time taken to build the dataclasses or HistoryFrame from a response.
+
+        Args:
+            endpoint (MyEnergiEndpoint): The endpoint the response came from
+            seconds (float): Seconds taken to build the results
+        """
+        with self._lock:
+            entry = self._entry(endpoint)
+            entry.builds += 1
+            entry.build += seconds
+
+    @contextlib.contextmanager
+    def build_timer(self, endpoint: MyEnergiEndpoint):
+        """Time the block of code building the results from a response.
+
+        Args:
+            endpoint (MyEnergiEndpoint): The endpoint the response came from
+        """
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.record_build(endpoint, time.perf_counter() - started)
+
+    def snapshot(self) -> dict:
+        """Return the metrics for each endpoint called, keyed by the name of the endpoint."""
+        with self._lock:
+            return {name: asdict(entry) for name, entry in self._endpoints.items()}
+
+    def reset(self) -> None:
+        """Forget the calls recorded so far."""
+        with self._lock:
+            self._endpoints = {}
+
+    def export(self) -> dict:
+        """Pass the snapshot to each exporter. An exporter which fails is logged and the others are still called.
+
+        Returns:
+            dict: The snapshot which was exported
+        """
+        snapshot = self.snapshot()
+        for exporter in self.exporters:
+            try:
+                exporter(snapshot)
+            except Exception:
+                logging.getLogger(__name__).exception("Myenergi metrics exporter failed")
+        return snapshot
+
+
+class LogExporter:
+    """
+    Export the metrics by logging a line for each endpoint.
+
+    Args:
+        logger (logging.Logger): The logger to write to
+        level (int): The level to log at
+    """
+
+    def __init__(self, logger: logging.Logger = None, level: int = logging.INFO) -> None:
+        """Set up where the metrics are logged.
+
+        Args:
+            logger (logging.Logger, optional): The logger to write to. Defaults to the logger of this module.
+            level (int, optional): The level to log at. Defaults to logging.INFO.
+        """
+        self.logger = logger or logging.getLogger(__name__)
+        self.level = level
+
+    def __call__(self, snapshot: dict) -> None:
+        """Log the metrics for each endpoint.
+
+        Args:
+            snapshot (dict): The snapshot from Metrics
+        """
+        for name, entry in snapshot.items():
+            calls = entry["calls"] or 1
+            self.logger.log(self.level, "%s: %s calls %s errors %s bytes latency %.3fs decode %.4fs "
+                            "build %.4fs mean", name, entry["calls"], entry["errors"], entry["bytes"],
+                            entry["latency"] / calls, entry["decode"] / calls,
+                            entry["build"] / (entry["builds"] or 1))
@@ -0,0 +1,232 @@
+"""Provide a long running monitor of the status of myenergi devices.
+
+The Monitor keeps a single API client open and polls the status of all devices with one cgi-jstatus-* call
+on each poll. Subscribers are called with only the fields which have changed since the previous poll.
+The changes are taken from the field names returned by refresh_devices. Every field of every device is only
+compared when another caller has refreshed the statuses since the previous poll, as those changes are not returned.
+
+The interval between polls adapts to what the devices are doing. It is shortened to min_interval while a
+Zappi is charging or when its state changes, returns to interval after any other change and is lengthened
+by backoff up to max_interval each time a poll finds nothing has changed.
+
+    with myenergi.API(serial, password) as mye:
+        monitor = Monitor(mye)
+        monitor.subscribe(print)
+        monitor.run()
+"""
+
+import logging
+import threading
+from dataclasses import fields
+
+import myenergi.error
+from myenergi.api import API
+from myenergi.const import (MyenergiType, ZappiData, ZappiState, ZappiStatus,
+                            device_change)
+
+# Only export the monitor
+__all__ = ["Monitor"]
+
+# The device types reported by the monitor
+DEVICE_TYPES = (MyenergiType.ZAPPI, MyenergiType.EDDI, MyenergiType.HARVI, MyenergiType.LIBBI)
+# Fields which change on every poll or are not refreshed by the status query and so are not reported
+IGNORED_FIELDS = frozenset({"dat", "tim", "timestamp", "boost_times"})
+# Zappi states which mean a car is charging
+CHARGING_STATES = frozenset({ZappiState.Charging, ZappiState.Boosting})
+CHARGING_STATUS = frozenset({ZappiStatus.C2})
+
+
+class Monitor:
+    """
+    Poll the status of the myenergi devices and call subscribers with the changes.
+
+    Args:
+        api (API): The myenergi API client to use for the status queries
+        interval (float): Seconds between polls after a change
+        min_interval (float): Seconds between polls while a Zappi is charging or its state changes
+        max_interval (float): The longest time between polls when nothing is changing
+        backoff (float): The factor the interval is multiplied by when nothing changes
+        ignore (frozenset): Names of fields whose changes are not reported
+    """
+
+    def __init__(self, api: API, interval: float = 60, min_interval: float = 10, max_interval: float = 600,
+                 backoff: float = 2, ignore: frozenset = IGNORED_FIELDS) -> None:
+        """Set up the monitor and take a snapshot of the current state of the devices.
+
+        Args:
+            api (API): The myenergi API client to use for the status queries
+            interval (float, optional): Seconds between polls after a change. Defaults to 60.
+            min_interval (float, optional): Seconds between polls while charging. Defaults to 10.
+            max_interval (float, optional): Longest time between polls. Defaults to 600.
+            backoff (float, optional): Factor to lengthen the interval by when nothing changes. Defaults to 2.
+            ignore (frozenset, optional): Fields whose changes are not reported. Defaults to IGNORED_FIELDS.
+        """
+        assert 0 < min_interval <= interval <= max_interval and backoff >= 1
+        self.logger = logging.getLogger(__name__)
+        self.api = api
+        self.interval = interval
+        self.min_interval = min_interval
+        self.max_interval = max_interval
+        self.backoff = backoff
+        self.ignore = ignore
+        self.next_interval = interval
+        self._subscribers = []
+        self._stop = threading.Event()
+        self._thread = None
+        self._version = api.status_version
+        self._snapshot = self._take_snapshot()
+
+    def subscribe(self, callback, device: MyenergiType = None) -> None:
+        """Call a function with a list of device_change entries whenever a poll finds changes.
+
+        Args:
+            callback: The function to call
+            device (MyenergiType, optional): Only report changes for this type of device. Defaults to all types.
+        """
+        self._subscribers.append((callback, device))
+
+    def unsubscribe(self, callback) -> None:
+        """Stop calling a function which was previously subscribed.
+
+        Args:
+            callback: The function to stop calling
+        """
+        self._subscribers = [(subscriber, device) for subscriber, device in self._subscribers
+                             if subscriber != callback]
+
+    def poll(self) -> list:
+        """Query the status of all devices, notify the subscribers of any changes and work out the next interval.
+
+        Returns:
+            list: The device_change entries for the devices which changed
+        """
+        refreshed = self.api.refresh_devices()
+        missed = refreshed.previous != self._version
+        self._version = refreshed.version
+        if missed:
+            # Statuses applied by refreshes made outside the monitor are not in the change sets, so compare everything
+            snapshot = self._take_snapshot()
+            changes = self._compare(self._snapshot, snapshot)
+            self._snapshot = snapshot
+        else:
+            changes = self._apply_changes(refreshed)
+        self.next_interval = self._adapt_interval(changes)
+        if changes:
+            self._notify(changes)
+        return changes
+
+    def run(self) -> None:
+        """Poll until stop is called. Errors from the API are logged and the poll is retried after backing off."""
+        self._stop.clear()
+        while not self._stop.is_set():
+            try:
+                self.poll()
+            except myenergi.error.MyEnergiError as err:
+                self.logger.error("Myenergi status poll failed: %s", err)
+                self.next_interval = min(self.next_interval * self.backoff, self.max_interval)
+            self.logger.debug("Next myenergi status poll in %s seconds", self.next_interval)
+            self._stop.wait(self.next_interval)
+
+    def start(self) -> None:
+        """Run the monitor in a background thread."""
+        self._thread = threading.Thread(target=self.run, name="myenergi-monitor", daemon=True)
+        self._thread.start()
+
+    def stop(self) -> None:
+        """Stop the monitor after the current poll and wait for the background thread if there is one."""
+        self._stop.set()
+        if self._thread is not None and self._thread is not threading.current_thread():
+            self._thread.join()
+            self._thread = None
+
+    def _take_snapshot(self) -> dict:
+        """Return the current values of the fields of every device keyed by device type and serial number."""
+        snapshot = {}
+        for device in DEVICE_TYPES:
+            for serial in self.api.get_serials(device):
+                data = self.api.get_device(serial)
+                snapshot[(device, serial)] = {entry.name: getattr(data, entry.name) for entry in fields(data)
+                                              if entry.name not in self.ignore}
+        return snapshot
+
+    def _apply_changes(self, refreshed: dict) -> list:
+        """Update the snapshot with the fields returned by refresh_devices and return the device_change entries.
+
+        Args:
+            refreshed (dict): The names of the fields which changed for each serial number
+        """
+        old = {}
+        new = {}
+        for serial, names in refreshed.items():
+            try:
+                device = self.api.get_device_type(serial)
+                data = self.api.get_device(serial)
+            except myenergi.error.ParameterError:
+                # The device was removed so drop it from the snapshot
+                key = next((key for key in self._snapshot if key[1] == serial), None)
+                if key is not None:
+                    old[key] = self._snapshot.pop(key)
+                    new[key] = {}
+                continue
+            if device not in DEVICE_TYPES:
+                continue
+            key = (device, serial)
+            before = self._snapshot.get(key, {})
+            after = dict(before)
+            after.update({name: getattr(data, name) for name in names if name not in self.ignore})
+            old[key] = before
+            new[key] = self._snapshot[key] = after
+        return self._compare(old, new)
+
+    @staticmethod
+    def _compare(old: dict, new: dict) -> list:
+        """Return the device_change entries for the differences between two snapshots.
+
+        Args:
+            old (dict): The previous snapshot
+            new (dict): The current snapshot
+        """
+        changes = []
+        for key in old.keys() | new.keys():
+            before = old.get(key, {})
+            after = new.get(key, {})
+            changed = {name: (before.get(name), after.get(name)) for name in before.keys() | after.keys()
+                       if before.get(name) != after.get(name)}
+            if changed:
+                changes.append(device_change(*key, changed))
+        return changes
+
+    def _adapt_interval(self, changes: list) -> float:
+        """Work out how long to wait before the next poll.
+
+        Args:
+            changes (list): The changes found by the latest poll
+        """
+        transition = any(change.device == MyenergiType.ZAPPI and
+                         (ZappiData.STATUS.value in change.changes or ZappiData.CHARGE_STATUS.value in change.changes)
+                         for change in changes)
+        if transition or self._charging():
+            return self.min_interval
+        if changes:
+            return self.interval
+        return min(self.next_interval * self.backoff, self.max_interval)
+
+    def _charging(self) -> bool:
+        """Return whether any Zappi is charging a car."""
+        return any(values.get(ZappiData.STATUS.value) in CHARGING_STATES or
+                   values.get(ZappiData.CHARGE_STATUS.value) in CHARGING_STATUS
+                   for (device, serial), values in self._snapshot.items() if device == MyenergiType.ZAPPI)
+
+    def _notify(self, changes: list) -> None:
+        """Call each subscriber with the changes for the device types it is interested in.
+
+        Args:
+            changes (list): The changes found by the latest poll
+        """
+        for callback, device in self._subscribers:
+            selected = [change for change in changes if device is None or change.device == device]
+            if selected:
+                try:
+                    callback(selected)
+                except Exception:
+                    self.logger.exception("Myenergi monitor subscriber failed")
@@ -0,0 +1,178 @@
+"""Provide the retry policy, circuit breaker and request counters used when calling the myenergi API.
+
+Requests which only read data (the status, history and boost time queries) can safely be repeated so they are
+retried after timeouts, connection failures and server errors with a jittered exponential backoff. Commands are
+only retried when the server reports that it is busy sending another command to the device
+(BusyServerAlreadySendingCommandToDevice), as the command has then not been sent.
+
+Each server has a circuit breaker. After threshold consecutive failures the breaker opens and requests to the
+server fail immediately with CircuitOpenError until reset_timeout seconds have passed, when requests are let
+through again to test whether the server has recovered.
+"""
+
+import random
+import threading
+import time
+from dataclasses import dataclass
+from urllib.parse import urlsplit
+
+import myenergi.error
+from myenergi.const import MyEnergiResponse, MyenergiType
+
+# Only export the resilience helpers
+__all__ = ["RetryPolicy", "CircuitBreaker", "RequestStats", "is_idempotent", "is_busy"]
+
+# Connect and read timeouts in seconds for each request
+DEFAULT_TIMEOUT = (5, 30)
+# Endpoints which only read data and so can be repeated safely
+IDEMPOTENT_ENDPOINTS = ("cgi-jstatus-", "cgi-jday", "cgi-boost-time-")
+
+
+def is_idempotent(url: str) -> bool:
+    """Return whether a URL only reads data and so can be repeated safely.
+
+    Args:
+        url (str): The URL of the request
+    """
+    return urlsplit(url).path.lstrip("/").startswith(IDEMPOTENT_ENDPOINTS)
+
+
+def is_busy(data) -> bool:
+    """Return whether a response says the server is busy sending another command to the device.
+
+    Args:
+        data (json): The json returned by the REST API
+    """
+    return (isinstance(data, dict) and
+            data.get(MyenergiType.STATUS.value) == MyEnergiResponse.BusyServerAlreadySendingCommandToDevice.value)
+
+
+@dataclass
+class RetryPolicy:
+    """_This dataclass describes how requests to the myenergi API are retried.
+
+    Failed requests which only read data are retried up to retries times. The wait before each retry doubles from
+    backoff up to max_delay and a random jitter of up to that fraction of the wait is added. Requests refused
+    because the server is busy are retried up to busy_retries times, doubling from busy_delay."""
+    retries: int = 3
+    backoff: float = 0.5
+    max_delay: float = 10
+    jitter: float = 0.5
+    busy_retries: int = 2
+    busy_delay: float = 1
+
+    def delay(self, attempt: int) -> float:
+        """Return the seconds to wait before a retry.
+
+        Args:
+            attempt (int): The number of the retry starting from 1
+        """
+        delay = min(self.backoff * 2 ** (attempt - 1), self.max_delay)
+        return delay + random.uniform(0, delay * self.jitter)
+
+    def busy_wait(self, attempt: int) -> float:
+        """Return the seconds to wait before retrying a request refused because the server is busy.
+
+        Args:
+            attempt (int): The number of the retry starting from 1
+        """
+        return self.busy_delay * 2 ** (attempt - 1)
+
+
+class CircuitBreaker:
+    """
+    Stop sending requests to a server which keeps failing.
+
+    Args:
+        host (str): The server the breaker is for
+        threshold (int): The number of consecutive failures which open the breaker
+        reset_timeout (float): Seconds before requests are let through again once the breaker is open
+    """
+
+    def __init__(self, host: str, threshold: int = 5, reset_timeout: float = 30) -> None:
+        """Set up a closed breaker for a server.
+
+        Args:
+            host (str): The server the breaker is for
+            threshold (int, optional): Consecutive failures which open the breaker. Defaults to 5.
+            reset_timeout (float, optional): Seconds before requests are let through again. Defaults to 30.
+        """
+        self.host = host
+        self.threshold = threshold
+        self.reset_timeout = reset_timeout
+        self.failures = 0
+        self.opened = None
+        self._lock = threading.Lock()
+
+    @property
+    def is_open(self) -> bool:
+        """Return whether requests to the server are currently refused."""
+        return self.opened is not None and time.monotonic() - self.opened < self.reset_timeout
+
+    def check(self) -> None:
+        """Raise CircuitOpenError if requests to the server are currently refused."""
+        if self.is_open:
+            raise myenergi.error.CircuitOpenError(f"Requests to {self.host} suspended after {self.failures} "
+                                                  f"consecutive failures")
+
+    def record_success(self) -> None:
+        """Close the breaker after a successful request."""
+        with self._lock:
+            self.failures = 0
+            self.opened = None
+
+    def record_failure(self) -> None:
+        """Count a failed request and open the breaker once there have been threshold failures in a row."""
+        with self._lock:
+            self.failures += 1
+            if self.failures >= self.threshold:
+                self.opened = time.monotonic()
+
+
+class RequestStats:
+    """Count the requests made to the myenergi API, their retries and failures and how long they took.
+
+    Challenges counts the 401 responses asking for digest authentication, each of which is an extra HTTP exchange
+    on top of the requests counted."""
+
+    def __init__(self) -> None:
+        """Start with all of the counters at zero."""
+        self._lock = threading.Lock()
+        self.requests = 0
+        self.failures = 0
+        self.retries = 0
+        self.busy = 0
+        self.rejected = 0
+        self.challenges = 0
+        self.latency_total = 0.0
+        self.latency_max = 0.0
+
+    def record(self, latency: float, failed: bool = False) -> None:
+        """Count a request.
+
+        Args:
+            latency (float): Seconds the request took
+            failed (bool, optional): Whether the request failed. Defaults to False.
+        """
+        with self._lock:
+            self.requests += 1
+            self.failures += failed
+            self.latency_total += latency
+            self.latency_max = max(self.latency_max, latency)
+
+    def count(self, name: str) -> None:
+        """Add one to a counter such as retries, busy, rejected or challenges.
+
+        Args:
+            name (str): The name of the counter
+        """
+        with self._lock:
+            setattr(self, name, getattr(self, name) + 1)
+
+    def snapshot(self) -> dict:
+        """Return the current value of the counters and the mean latency in seconds."""
+        with self._lock:
+            return {"requests": self.requests, "failures": self.failures, "retries": self.retries,
+                    "busy": self.busy, "rejected": self.rejected, "challenges": self.challenges,
+                    "latency_max": self.latency_max,
+                    "latency_mean": self.latency_total / self.requests if self.requests else 0.0}
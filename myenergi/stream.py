@@ -0,0 +1,145 @@
+"""Parse the history returned by the myenergi API as it is downloaded.
+
+A day of minute history is a single object holding one large array, {"U<serial>": [{...}, {...}, ...]}.
+ArrayParser is fed the body of the response a chunk at a time and returns each element of the array as soon as
+it has been received, so the records can be processed while the rest of the day is downloading and only one
+chunk is held in memory rather than the whole response.
+
+    parser = ArrayParser(f"U{serial}")
+    for chunk in response.iter_content(STREAM_CHUNK_SIZE):
+        for record in parser.feed(chunk):
+            print(record)
+    parser.close()
+
+The array must be the first value in the object and be held under the key passed to the parser. A response which
+does not start that way, such as an error status, is decoded whole and left in document, and ParseError is raised
+if it is not a status.
+"""
+
+import codecs
+import json
+from itertools import islice
+
+import myenergi.error
+
+# Only export the streaming parser
+__all__ = ["ArrayParser", "batched", "STREAM_CHUNK_SIZE"]
+
+# Bytes to read from the response at a time
+STREAM_CHUNK_SIZE = 16 * 1024
+# Characters between the elements of an array
+SEPARATORS = " \t\n\r,"
+# Characters between the tokens before the array
+WHITESPACE = " \t\n\r"
+
+
+def batched(iterable, size: int):
+    """Yield lists of up to size items from an iterable.
+
+    Args:
+        iterable: The items to group
+        size (int): The number of items in each list
+    """
+    iterator = iter(iterable)
+    while batch := list(islice(iterator, size)):
+        yield batch
+
+
+class ArrayParser:
+    """
+    Incrementally decode the elements of the array held under a key at the start of a JSON object.
+
+    Args:
+        key (str): The key of the array, such as U<serial> for history
+    """
+
+    def __init__(self, key: str) -> None:
+        """Start before the beginning of the document.
+
+        Args:
+            key (str): The key of the array
+        """
+        self.key = key
+        self.document = None
+        self._decoder = json.JSONDecoder()
+        self._utf8 = codecs.getincrementaldecoder("utf-8")()
+        self._buffer = ""
+        self._prefix = ("{", json.dumps(key), ":", "[")
+        self._in_array = False
+        self._whole = False
+        self._finished = False
+
+    def feed(self, chunk: bytes) -> list:
+        """Add the next chunk of the document and return the array elements which are now complete.
+
+        Args:
+            chunk (bytes): The next part of the body of the response
+        """
+        self._buffer += self._utf8.decode(chunk)
+        if self._whole:
+            return []
+        if not self._in_array:
+            start = self._match_prefix()
+            if start is None:
+                return []
+            self._in_array = True
+            self._buffer = self._buffer[start:]
+        items = []
+        position = 0
+        while not self._finished:
+            # Skip to the start of the next element
+            while position < len(self._buffer) and self._buffer[position] in SEPARATORS:
+                position += 1
+            if position == len(self._buffer):
+                break
+            if self._buffer[position] == "]":
+                self._finished = True
+                position += 1
+                break
+            try:
+                item, end = self._decoder.raw_decode(self._buffer, position)
+            except json.JSONDecodeError:
+                # The element has not been completely received yet
+                break
+            if end == len(self._buffer) and not isinstance(item, (dict, list, str)):
+                # A number or literal at the end of the chunk may continue in the next one
+                break
+            items.append(item)
+            position = end
+        self._buffer = self._buffer[position:]
+        return items
+
+    def _match_prefix(self) -> int | None:
+        """Return the position after the opening of the array once the object has been seen to start with the key.
+        If the document starts some other way it is kept whole to be decoded by close.
+        """
+        position = 0
+        for token in self._prefix:
+            while position < len(self._buffer) and self._buffer[position] in WHITESPACE:
+                position += 1
+            received = self._buffer[position:position + len(token)]
+            if received != token[:len(received)]:
+                self._whole = True
+                return None
+            if len(received) < len(token):
+                return None
+            position += len(token)
+        return position
+
+    def close(self) -> None:
+        """Check that the whole document has been received. A document without the array is decoded into document.
+
+        Raises:
+            ValueError: If the document ended part way through the array
+            ParseError: If the document is neither an object starting with the array nor a status
+        """
+        self._buffer += self._utf8.decode(b"", final=True)
+        if self._in_array:
+            if not self._finished:
+                raise ValueError("JSON document ended before the end of the array")
+        else:
+            document = json.loads(self._buffer)
+            if not isinstance(document, dict) or self.key in document or "status" not in document:
+                raise myenergi.error.ParseError(f"Expected an object starting with the {self.key} array")
+            self.document = document
+        self._buffer = ""
@@ -7,6 +7,7 @@ It will then import a summary of this information into an influxdb database.
 
 import argparse
 import logging
+import os
 from datetime import datetime
 
 import myenergi
@@ -23,6 +24,8 @@ def get_options():
         parser.add_argument('-p', '--password', required=True, help='myenergi password')
     parser.add_argument('-t', '--start', required=False, type=int, default=1, help='starting number of days ago')
     parser.add_argument('-e', '--end', required=False, type=int, default=4, help='ending number of days ago')
+    parser.add_argument('-c', '--cache', required=False, type=str, help='history cache file',
+                        default=os.path.join(myenergi.cache.DEFAULT_CACHE_DIR, "history.sqlite"))
     args = parser.parse_args()
     if "myenergi_serial" in env:
         args.serial = env['myenergi_serial']
@@ -40,7 +43,8 @@ def main():
     # Setup the local logger
     logger = get_logger(destination = "stdout")
 
-    with myenergi.API(args.serial, args.password) as mye:
+    with myenergi.API(args.serial, args.password, cache=myenergi.HistoryCache(args.cache),
+                      asn_cache=myenergi.ASNCache(), eager=False) as mye:
         zappiserials = mye.get_serials(myenergi.const.MyenergiType.ZAPPI)
         for serial in zappiserials:
             logger.info("querying Zappi: %s", serial)
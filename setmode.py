@@ -2,7 +2,7 @@
 """Python script to set the Zappi mode.
 
 This script will check the current mode and then set to the desired mode if different
-It will then wait until the mode has been successfully set before exiting
+It will then wait until the mode has been successfully set on every Zappi before exiting
 """
 
 import argparse
@@ -39,14 +39,17 @@ def main() -> None:
     # Set up the local logger
     logger = get_logger(args.logger)
 
-    with myenergi.API(args.serial, args.password) as mye:
+    with myenergi.API(args.serial, args.password, asn_cache=myenergi.ASNCache(), eager=False) as mye:
         zappi_serials = mye.get_zappi_serials()
-        if zappi_serials is None:
+        if not zappi_serials:
             logger.error("Unable to set mode as no Zappi Detected")
             exit(2)
         else:
-            for serial in zappi_serials:
-                mye.set_zappi_mode(serial, args.mode)
+            # Set the mode of every Zappi at once and wait for all of the changes to be confirmed
+            commands = [myenergi.const.zappi_mode_command(serial, args.mode) for serial in zappi_serials]
+            for result in mye.apply(commands):
+                if not result.succeeded:
+                    logger.error("Unable to set mode for Zappi SN:%s: %s", result.command.serial, result.error)
 
 
 if __name__ == "__main__":
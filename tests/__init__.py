@@ -0,0 +1 @@
+"""Offline stand ins for the myenergi servers used by the unit tests and the benchmarks."""
@@ -0,0 +1,191 @@
+"""Example responses and an offline HTTP layer shared by the unit tests and the benchmarks.
+
+The responses are built from the files in examples, with the fields returned by the current API which are missing
+from the older examples filled in. A FakeHub answers the URLs of the myenergi API from them and a FakeSession
+passes the requests of an API client to it, so that the clients can be tested and benchmarked without a network or
+a hub.
+"""
+
+import copy
+import json
+import pathlib
+from functools import cache
+from unittest import mock
+
+import requests
+
+import myenergi
+from myenergi.const import MyEnergiEndpoint
+
+EXAMPLES = pathlib.Path(__file__).parent.parent / "examples"
+ASN = "s18.myenergi.net"
+SERIAL = "12345678"
+ZAPPI_SERIAL = 17004596
+EDDI_SERIAL = 10088888
+# Fields returned by the current API which are missing from the older example responses
+ZAPPI_DEFAULTS = {"bsm": 0, "bss": 0, "bst": 0, "div": 0, "ectp1": 0, "ectp3": 0, "pwm": 5300, "tz": 0,
+                  "zs": 2562, "zsh": 10, "newAppAvailable": False, "newBootloaderAvailable": False,
+                  "beingTamperedWith": False, "batteryDischargeEnabled": False, "g100LockoutState": "NONE",
+                  "deviceClass": "ZAPPI"}
+HARVI_DEFAULTS = {"deviceClass": "HARVI"}
+EDDI = {"dat": "26-03-2021", "tim": "10:11:35", "ectp1": 0, "ectp2": 0, "ectt1": "Internal Load",
+        "ectt2": "None", "frq": 50.04, "gen": 988, "grd": -2, "hno": 1, "pha": 1, "sno": EDDI_SERIAL, "sta": 1,
+        "vol": 2448, "ht1": "Tank 1", "ht2": "Tank 2", "tp1": 56, "tp2": 127, "pri": 1, "cmt": 254, "r1a": 1,
+        "r2a": 1, "r2b": 1, "che": 0}
+ACCEPTED = b'{"status": 0, "statustext": ""}'
+
+
+def load_example(name: str):
+    """Load one of the example API responses."""
+    with open(EXAMPLES / name) as file:
+        return json.load(file)
+
+
+def load_status() -> tuple:
+    """Return the zappi and harvi status from the example responses."""
+    zappi = {**ZAPPI_DEFAULTS, **load_example("zappi.json")["zappi"][0]}
+    harvi = {**HARVI_DEFAULTS, **load_example("harvi.json")["harvi"][0]}
+    return zappi, harvi
+
+
+@cache
+def initial_status() -> list:
+    """Return the example status every FakeHub starts from, loaded once."""
+    status = load_example("all.json")
+    status[2]["harvi"] = [{**HARVI_DEFAULTS, **harvi} for harvi in status[2]["harvi"]]
+    status[3]["asn"] = ASN
+    return status
+
+
+def encode(data) -> bytes:
+    """Return the body of a response with the json given."""
+    return json.dumps(data).encode()
+
+
+@cache
+def example_response(name: str, key: str = None) -> bytes:
+    """Return the encoded body of an example response, with the records of a history example under key."""
+    data = load_example(name)
+    return encode(data if key is None else {key: next(iter(data.values()))})
+
+
+class FakeHub:
+    """Answer myenergi API URLs from the example responses for a hub with the given zappi and eddi serials.
+
+    The responses which do not change are encoded once so that only the work of the client is timed. Mode and
+    minimum green limit commands change the status returned so that they can be confirmed."""
+
+    def __init__(self, zappis: tuple = (ZAPPI_SERIAL,), eddis: tuple = ()):
+        status = copy.deepcopy(initial_status())
+        template = {**ZAPPI_DEFAULTS, **status[1]["zappi"][0]}
+        status[0]["eddi"] = [{**EDDI, "sno": sno} for sno in eddis]
+        status[1]["zappi"] = [{**template, "sno": sno} for sno in zappis]
+        self.status = status
+        self.calls = []
+        # The number of times to fail each URL path with a server error
+        self.failures = {}
+        # Whether mode and minimum green limit commands change the status returned
+        self.apply_commands = True
+        # The number of times to refuse each URL path because the server is busy sending a command
+        self.busy = {}
+
+    def respond(self, url: str) -> tuple:
+        """Return the status code, headers and encoded json body for a URL."""
+        self.calls.append(url)
+        path = url.removeprefix(f"https://{ASN}/")
+        if self.failures.get(path, 0) > 0:
+            self.failures[path] -= 1
+            return 500, {}, b"{}"
+        if self.busy.get(path, 0) > 0:
+            self.busy[path] -= 1
+            return 200, {}, encode({"status": -26, "statustext": ""})
+        if url == MyEnergiEndpoint.DIRECTOR_URL.value:
+            return 200, {MyEnergiEndpoint.ASN_HEADER_FIELD.value: ASN}, b"{}"
+        if path == MyEnergiEndpoint.DEVICES.value:
+            return 200, {}, encode(self.status)
+        if path.startswith(MyEnergiEndpoint.ZAPPI.value):
+            sno = int(path.removeprefix(MyEnergiEndpoint.ZAPPI.value))
+            return 200, {}, encode({"zappi": [zappi for zappi in self.status[1]["zappi"] if zappi["sno"] == sno]})
+        for endpoint, field in ((MyEnergiEndpoint.ZAPPI_MODE, "zmo"), (MyEnergiEndpoint.ZAPPI_MINGREEN, "mgl")):
+            if path.startswith(endpoint.value):
+                sno, value = path.removeprefix(endpoint.value).split("-")[:2]
+                if self.apply_commands and int(value):
+                    next(zappi for zappi in self.status[1]["zappi"] if zappi["sno"] == int(sno))[field] = int(value)
+                return 200, {}, ACCEPTED
+        if path.startswith("cgi-boost-time-"):
+            return 200, {}, example_response("boosttimes.json")
+        for endpoint, example in ((MyEnergiEndpoint.ZAPPI_HISTORY_HOUR, "zappihistoryhour.json"),
+                                  (MyEnergiEndpoint.ZAPPI_HISTORY_MINUTE, "zappihistory.json")):
+            if path.startswith(endpoint.value):
+                sno = path.removeprefix(endpoint.value).split("-")[0]
+                return 200, {}, example_response(example, f"U{sno}")
+        return 200, {}, ACCEPTED
+
+
+class FakeResponse:
+    """A minimal requests.Response for a FakeHub answer which decodes the body like requests does."""
+
+    def __init__(self, status_code: int, headers: dict, content: bytes):
+        self.status_code = status_code
+        self.headers = headers
+        self.content = content
+
+    def json(self):
+        return json.loads(self.content)
+
+    def iter_content(self, chunk_size: int = 1):
+        for start in range(0, len(self.content), chunk_size):
+            yield self.content[start:start + chunk_size]
+
+    def close(self) -> None:
+        pass
+
+    def __enter__(self) -> "FakeResponse":
+        return self
+
+    def __exit__(self, *args) -> None:
+        self.close()
+
+    def raise_for_status(self) -> None:
+        raise requests.exceptions.HTTPError(f"{self.status_code} error")
+
+
+class FakeSession:
+    """A stand in for requests.Session which answers from a FakeHub."""
+
+    def __init__(self, hub: FakeHub):
+        self.hub = hub
+        self.headers = {}
+        self.auth = None
+
+    def get(self, url: str, **kwargs) -> FakeResponse:
+        if not url.startswith((f"https://{ASN}/", MyEnergiEndpoint.DIRECTOR_URL.value)):
+            raise requests.exceptions.ConnectionError(f"Unable to connect to {url}")
+        return FakeResponse(*self.hub.respond(url))
+
+    def mount(self, prefix: str, adapter) -> None:
+        pass
+
+    def close(self) -> None:
+        pass
+
+
+def offline_sessions(**hub_kwargs):
+    """Return a patch which gives API clients created while it is active a FakeSession for a new FakeHub.
+
+    Args:
+        hub_kwargs: The arguments for each FakeHub
+    """
+    return mock.patch("myenergi.api.requests.Session", side_effect=lambda: FakeSession(FakeHub(**hub_kwargs)))
+
+
+def offline_api(hub: FakeHub = None, **kwargs) -> myenergi.API:
+    """Create an API client which talks to a FakeHub rather than the myenergi servers.
+
+    Args:
+        hub (FakeHub, optional): The hub to answer requests. Defaults to a hub with one zappi.
+        kwargs: Further arguments for the API client
+    """
+    hub = hub or FakeHub()
+    with mock.patch("myenergi.api.requests.Session", return_value=FakeSession(hub)):
+        return myenergi.API(SERIAL, "password", **kwargs)
@@ -0,0 +1,333 @@
+#!/usr/bin/env python3
+"""A local stand in for the myenergi director and servers for load testing and offline integration tests.
+
+The server answers the director request with the ASN header naming itself and implements the status, history,
+boost time and command endpoints behind HTTP digest authentication, like the real servers. The hub can have any
+number of Zappis, Eddis and Harvis, built from the example responses, and history is generated for every day of
+the last years years by rescaling the example day, so it is different for each device and day but the same on
+every run.
+
+Each response can be delayed by latency seconds, or a random time between two values, and a fraction of requests
+can be failed with a server error (error_rate) or, for commands, refused because the server is busy sending
+another command to the device (busy_rate).
+
+    with FakeServer(zappis=200, latency=0.05) as server:
+        with myenergi.API(server.serial, server.password, director_url=server.url) as mye:
+            print(len(mye.get_zappi_serials()))
+
+Run a server from the top of the repository with: python -m tests.fakeserver --zappis 200 --port 8080
+"""
+
+import argparse
+import copy
+import hashlib
+import json
+import multiprocessing
+import random
+import re
+import secrets
+import threading
+import time
+from contextlib import contextmanager
+from datetime import date, timedelta
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from myenergi.const import MyEnergiEndpoint, MyEnergiResponse
+
+from tests.fakehub import EDDI, load_example, load_status
+
+REALM = "MyEnergi Telemetry"
+FIRMWARE = "3401S3.051"
+# The first serial number of each type of device
+FIRST_SERIALS = {"zappi": 16000001, "eddi": 21000001, "harvi": 11000001}
+# Fields of the history records which are energy and so are rescaled for each device and day
+ENERGY_FIELDS = re.compile(r"^(imp|exp|gen|gep|h\dd|h\db|[pn]ect\d)$")
+HISTORY = re.compile(r"^cgi-jday(hour)?-([ZE])(\d+)-(\d{4})-(\d{1,2})-(\d{1,2})$")
+STATUS = re.compile(r"^cgi-jstatus-([ZEHL])(\d*)$")
+BOOST_TIMES = re.compile(r"^cgi-boost-time-([ZE])(\d+)$")
+ZAPPI_MODE = re.compile(r"^cgi-zappi-mode-Z(\d+)-(\d+)-")
+MIN_GREEN = re.compile(r"^cgi-set-min-green-Z(\d+)-(\d+)$")
+COMMAND = re.compile(r"^cgi-(eddi-mode|eddi-boost|set-heater-priority)-[ZE](\d+)")
+DEVICE_TYPES = {"Z": "zappi", "E": "eddi", "H": "harvi", "L": "libbi"}
+
+
+def status_code(response: MyEnergiResponse) -> dict:
+    """Return the body of a response carrying a myenergi status code."""
+    return {"status": response.value, "statustext": ""}
+
+
+class FakeServer:
+    """
+    Serve a simulated myenergi hub on localhost.
+
+    Args:
+        zappis (int): The number of Zappis
+        eddis (int): The number of Eddis
+        harvis (int): The number of Harvis
+        years (int): The number of years of history available
+        latency (float | tuple): Seconds to delay each response, or the range to pick a delay from
+        error_rate (float): The fraction of requests answered with a server error
+        busy_rate (float): The fraction of commands refused because the server is busy
+        serial (str): The serial number of the hub, the user name for digest authentication
+        password (str): The password for digest authentication
+        port (int): The port to listen on, 0 to pick a free port
+        seed (int): Seed for the generated history and the injected errors
+    """
+
+    def __init__(self, zappis: int = 1, eddis: int = 0, harvis: int = 1, years: int = 3,
+                 latency: float | tuple = 0.0, error_rate: float = 0.0, busy_rate: float = 0.0,
+                 serial: str = "12345678", password: str = "password", port: int = 0, seed: int = 0) -> None:
+        """Build the devices of the hub and bind the server, which starts answering when start is called."""
+        self.serial = serial
+        self.password = password
+        self.latency = latency if isinstance(latency, tuple) else (latency, latency)
+        self.error_rate = error_rate
+        self.busy_rate = busy_rate
+        self.seed = seed
+        self.nonce = secrets.token_hex(16)
+        self.first_day = date.today() - timedelta(days=365 * years)
+        self.requests = 0
+        self.challenges = 0
+        self._random = random.Random(seed)
+        self._lock = threading.Lock()
+        self._httpd = ThreadingHTTPServer(("127.0.0.1", port), FakeRequestHandler)
+        self._httpd.daemon_threads = True
+        self._httpd.fake = self
+        self._thread = None
+        self.asn = f"127.0.0.1:{self._httpd.server_address[1]}"
+        self.devices = self._build_devices(zappis, eddis, harvis)
+        self._boost_times = load_example("boosttimes.json")
+        self._history = {"minute": next(iter(load_example("zappihistory.json").values())),
+                         "hour": next(iter(load_example("zappihistoryhour.json").values()))}
+
+    @property
+    def url(self) -> str:
+        """Return the URL of the director to pass to the API clients."""
+        return f"http://{self.asn}"
+
+    def __enter__(self) -> "FakeServer":
+        """Start the server on entry to the context."""
+        self.start()
+        return self
+
+    def __exit__(self, exc_type, exc_value, exc_traceback) -> None:
+        """Stop the server on exit from the context."""
+        self.stop()
+
+    def start(self) -> None:
+        """Answer requests in a background thread."""
+        self._thread = threading.Thread(target=self._httpd.serve_forever, name="myenergi-fakeserver", daemon=True)
+        self._thread.start()
+
+    def stop(self) -> None:
+        """Stop answering requests and close the socket."""
+        self._httpd.shutdown()
+        self._httpd.server_close()
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+
+    def _build_devices(self, zappis: int, eddis: int, harvis: int) -> dict:
+        """Return the status of each device keyed by device type and serial number."""
+        zappi, harvi = load_status()
+        templates = {"zappi": zappi, "eddi": EDDI, "harvi": harvi}
+        counts = {"zappi": zappis, "eddi": eddis, "harvi": harvis}
+        return {device: {FIRST_SERIALS[device] + index: {**copy.deepcopy(templates[device]),
+                                                           "sno": FIRST_SERIALS[device] + index}
+                         for index in range(counts[device])}
+                for device in templates}
+
+    def status(self) -> list:
+        """Return the response of cgi-jstatus-* for every device."""
+        with self._lock:
+            return [{"eddi": list(self.devices["eddi"].values())}, {"zappi": list(self.devices["zappi"].values())},
+                    {"harvi": list(self.devices["harvi"].values())}, {"asn": self.asn, "fwv": FIRMWARE}]
+
+    def history(self, device: str, serial: int, day: date, hourly: bool) -> list:
+        """Return a day of history for a device, the example day rescaled by a factor fixed by the device and day.
+
+        Args:
+            device (str): The type of device
+            serial (int): The serial number of the device
+            day (date): The day of history
+            hourly (bool): Whether to return history by hour rather than by minute
+        """
+        if serial not in self.devices[device] or not self.first_day <= day <= date.today():
+            return []
+        scale = random.Random(f"{self.seed}-{serial}-{day}").uniform(0.5, 1.5)
+        fields = {"yr": day.year, "mon": day.month, "dom": day.day, "dow": day.strftime("%a")}
+        records = self._history["hour" if hourly else "minute"]
+        if device == "eddi":
+            # Divert a share of the generation to each heater of an Eddi
+            records = [{**record, "h1d": record.get("gep", 0) // 3, "h2d": record.get("gep", 0) // 6}
+                       for record in records]
+        return [{**{key: round(value * scale) if ENERGY_FIELDS.match(key) else value
+                    for key, value in record.items()}, **fields}
+                for record in records]
+
+    def answer(self, path: str) -> tuple:
+        """Return the status code and json for an authenticated request.
+
+        Args:
+            path (str): The path of the request without the leading /
+        """
+        with self._lock:
+            self.requests += 1
+            failed = self._random.random() < self.error_rate
+            busy = self._random.random() < self.busy_rate
+            delay = self._random.uniform(*self.latency)
+        if delay:
+            time.sleep(delay)
+        if failed:
+            return 500, {}
+        if path == "":
+            # The director, which only names the server in the ASN header
+            return 200, {}
+        if path == MyEnergiEndpoint.DEVICES.value:
+            return 200, self.status()
+        if match := STATUS.match(path):
+            device = DEVICE_TYPES[match[1]]
+            with self._lock:
+                devices = self.devices.get(device, {})
+                if match[2]:
+                    if int(match[2]) not in devices:
+                        return 200, status_code(MyEnergiResponse.SerialNumberNotFound)
+                    return 200, {device: [devices[int(match[2])]]}
+                return 200, {device: list(devices.values())}
+        if match := HISTORY.match(path):
+            serial = int(match[3])
+            day = date(int(match[4]), int(match[5]), int(match[6]))
+            return 200, {f"U{serial}": self.history(DEVICE_TYPES[match[2]], serial, day, bool(match[1]))}
+        if match := BOOST_TIMES.match(path):
+            if int(match[2]) not in self.devices[DEVICE_TYPES[match[1]]]:
+                return 200, status_code(MyEnergiResponse.SerialNumberNotFound)
+            return 200, self._boost_times
+        for pattern, field in ((ZAPPI_MODE, "zmo"), (MIN_GREEN, "mgl")):
+            if match := pattern.match(path):
+                return 200, self._command("zappi", int(match[1]), busy, field, int(match[2]))
+        if match := COMMAND.match(path):
+            return 200, self._command("eddi", int(match[2]), busy)
+        return 404, {}
+
+    def _command(self, device: str, serial: int, busy: bool, field: str = None, value: int = 0) -> dict:
+        """Carry out a command, setting a field of the device status to a value if it is not zero."""
+        if busy:
+            return status_code(MyEnergiResponse.BusyServerAlreadySendingCommandToDevice)
+        with self._lock:
+            if serial not in self.devices[device]:
+                return status_code(MyEnergiResponse.SerialNumberNotFound)
+            if field is not None and value:
+                self.devices[device][serial][field] = value
+        return status_code(MyEnergiResponse.Success)
+
+    def authorized(self, method: str, authorization: str) -> bool:
+        """Return whether the Authorization header of a request is a valid digest for the current nonce.
+
+        Args:
+            method (str): The HTTP method of the request
+            authorization (str): The Authorization header
+        """
+        if not authorization.startswith("Digest "):
+            return False
+        params = {key: quoted or plain for key, quoted, plain in
+                  re.findall(r'(\w+)=(?:"([^"]*)"|([^\s,]*))', authorization)}
+        if params.get("username") != self.serial or params.get("nonce") != self.nonce:
+            return False
+        ha1 = hashlib.md5(f"{self.serial}:{REALM}:{self.password}".encode()).hexdigest()
+        ha2 = hashlib.md5(f"{method}:{params.get('uri')}".encode()).hexdigest()
+        expected = hashlib.md5(f"{ha1}:{self.nonce}:{params.get('nc')}:{params.get('cnonce')}:"
+                               f"{params.get('qop')}:{ha2}".encode()).hexdigest()
+        return secrets.compare_digest(expected, params.get("response", ""))
+
+
+class FakeRequestHandler(BaseHTTPRequestHandler):
+    """Answer a request to a FakeServer, challenging it unless it carries a valid digest."""
+
+    # Keep connections open between requests like the real servers
+    protocol_version = "HTTP/1.1"
+    # Send the headers and body without waiting for the client to acknowledge the headers
+    disable_nagle_algorithm = True
+
+    def handle(self) -> None:
+        # A client which stops reading a streamed response part way through drops the connection
+        try:
+            super().handle()
+        except (ConnectionResetError, BrokenPipeError):
+            pass
+
+    def do_GET(self) -> None:
+        fake = self.server.fake
+        if not fake.authorized("GET", self.headers.get("Authorization", "")):
+            with fake._lock:
+                fake.challenges += 1
+            self._send(401, {}, {"WWW-Authenticate": f'Digest realm="{REALM}", qop="auth", nonce="{fake.nonce}", '
+                                                     f'algorithm=MD5'})
+            return
+        code, data = fake.answer(self.path.lstrip("/"))
+        self._send(code, data, {MyEnergiEndpoint.ASN_HEADER_FIELD.value: fake.asn})
+
+    def _send(self, code: int, data, headers: dict) -> None:
+        body = json.dumps(data).encode()
+        self.send_response(code)
+        for name, value in headers.items():
+            self.send_header(name, value)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format: str, *args) -> None:
+        pass
+
+
+def _serve(urls: multiprocessing.Queue, kwargs: dict) -> None:
+    """Run a fake server in a child process, passing its director URL back to the parent."""
+    server = FakeServer(**kwargs)
+    urls.put(server.url)
+    server._httpd.serve_forever()
+
+
+@contextmanager
+def serve_in_process(**kwargs):
+    """Run a fake server in a child process so that it does not compete with the client for the GIL.
+
+    Args:
+        kwargs: The arguments for FakeServer
+
+    Yields:
+        str: The URL of the director
+    """
+    urls = multiprocessing.Queue()
+    process = multiprocessing.Process(target=_serve, args=(urls, kwargs), daemon=True)
+    process.start()
+    try:
+        yield urls.get(timeout=30)
+    finally:
+        process.terminate()
+        process.join()
+
+
+def main() -> None:
+    """Run a fake server until interrupted."""
+    parser = argparse.ArgumentParser(description="Serve a simulated myenergi hub on localhost")
+    parser.add_argument("--zappis", type=int, default=1, help="the number of zappis")
+    parser.add_argument("--eddis", type=int, default=0, help="the number of eddis")
+    parser.add_argument("--harvis", type=int, default=1, help="the number of harvis")
+    parser.add_argument("--years", type=int, default=3, help="the years of history available")
+    parser.add_argument("--latency", type=float, default=0.0, help="seconds to delay each response")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="fraction of requests to fail")
+    parser.add_argument("--busy-rate", type=float, default=0.0, help="fraction of commands refused as busy")
+    parser.add_argument("--port", type=int, default=8080, help="the port to listen on")
+    args = parser.parse_args()
+    server = FakeServer(args.zappis, args.eddis, args.harvis, args.years, args.latency, args.error_rate,
+                        args.busy_rate, port=args.port)
+    print(f"Serving a hub with serial {server.serial} and password {server.password}, director {server.url}")
+    server.start()
+    try:
+        threading.Event().wait()
+    except KeyboardInterrupt:
+        server.stop()
+
+
+if __name__ == "__main__":
+    main()
@@ -2,11 +2,69 @@
 """Unit test script for myenergi client.
 """
 
+import asyncio
+import copy
+import io
+import json
+import math
+import os
+import re
+import tempfile
+import threading
+import time
 import unittest
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timezone
+from unittest import mock
+
 import myenergi
+import myenergi.confirm
+import myenergi.stream
 # from myenergi.api import API
 # from myenergi.error import ParameterError
 
+from tests.fakehub import ASN, FakeHub, load_example, offline_api
+
+
+class DigestAdapter(myenergi.api.requests.adapters.BaseAdapter):
+    """A requests transport which answers from a FakeHub once the request carries a digest Authorization header
+    for the current nonce and challenges it with a 401 otherwise."""
+
+    def __init__(self, hub: FakeHub, nonce: str = "0123456789abcdef"):
+        super().__init__()
+        self.hub = hub
+        self.nonce = nonce
+        self.challenges = 0
+        self.nonce_counts = {}
+        self._lock = threading.Lock()
+
+    def send(self, request, **kwargs):
+        host = myenergi.api.urlsplit(request.url).netloc
+        authorization = request.headers.get("Authorization", "")
+        if f'nonce="{self.nonce}"' in authorization:
+            with self._lock:
+                self.nonce_counts.setdefault(host, []).append(int(re.search(r"nc=(\w+)", authorization)[1], 16))
+            # requests adds a path to the bare director URL
+            director = myenergi.const.MyEnergiEndpoint.DIRECTOR_URL.value
+            status, headers, content = self.hub.respond(director if request.url == f"{director}/" else request.url)
+        else:
+            with self._lock:
+                self.challenges += 1
+            status, headers, content = 401, {"WWW-Authenticate": f'Digest realm="MyEnergi Telemetry", qop="auth", '
+                                                                 f'nonce="{self.nonce}", algorithm=MD5'}, b"{}"
+        response = myenergi.api.requests.Response()
+        response.status_code = status
+        response.headers = myenergi.api.requests.structures.CaseInsensitiveDict(headers)
+        response._content = content
+        response.raw = io.BytesIO(response._content)
+        response.url = request.url
+        response.request = request
+        response.connection = self
+        return response
+
+    def close(self) -> None:
+        pass
+
 
 class TestAPIInitialization(unittest.TestCase):
 
@@ -44,7 +102,7 @@ class TestAPIInitialization(unittest.TestCase):
         # Test initialization with an invalid serial number
         serial = "123456789"  # Replace with an invalid serial number
         password = "myestsg015A"  # Replace with a valid password
-        with self.assertRaises(SystemExit):
+        with self.assertRaises(myenergi.error.MyEnergiError):
             with myenergi.API(serial=serial, password=password) as api:
                 pass
 
@@ -52,10 +110,705 @@ class TestAPIInitialization(unittest.TestCase):
         # Test initialization with an invalid password
         serial = "10657391"   # Replace with a valid serial number
         password = "not_a_password"  # Replace with an invalid password
-        with self.assertRaises(SystemExit):
+        with self.assertRaises(myenergi.error.MyEnergiError):
             with myenergi.API(serial=serial, password=password) as api:
                 pass
 
 
+class TestOfflineAPI(unittest.TestCase):
+
+    def test_initialization_queries_devices_and_boost_times(self):
+        hub = FakeHub()
+        with offline_api(hub) as api:
+            self.assertEqual(list(api.get_zappi_serials()), [17004596])
+            self.assertEqual(len(api.get_zappi_info(17004596, myenergi.const.ZappiData.BOOST_TIMES)), 1)
+            self.assertEqual(hub.calls[-1], f"https://{ASN}/cgi-boost-time-Z17004596")
+
+    def test_hourly_history(self):
+        with offline_api() as api:
+            history = api.get_zappi_history(17004596, myenergi.History.HOUR, "2021-03-25")
+            self.assertEqual(len(history.history_data), 24)
+            self.assertEqual(history.history_data[1].imp, 0.01)
+            self.assertEqual(history.history_data[1].timestamp, datetime(2021, 3, 25, 1))
+
+    def test_minute_history_in_local_time(self):
+        with offline_api() as api:
+            history = api.get_zappi_history(17004596, myenergi.History.MINUTE, "2021-03-25", local_time=True)
+            self.assertEqual(len(history.history_data), 614)
+            # The example zappi has tz 0 and dst 1
+            self.assertEqual(history.history_data[0].timestamp.isoformat(), "2021-03-25T01:15:00+01:00")
+            self.assertEqual(history.history_data[0].imp, 0.492)
+
+    def test_devices_are_found_by_serial_as_int_or_str(self):
+        with offline_api() as api:
+            self.assertEqual(api.get_zappi_info(" 17004596", myenergi.const.ZappiData.MODE),
+                             api.get_zappi_info(17004596, myenergi.const.ZappiData.MODE))
+            self.assertIs(api.get_device("10690095"), api._devices.harvi[10690095])
+            self.assertIsInstance(api.get_device(17004596), myenergi.const.zappi)
+            self.assertRaises(myenergi.error.ParameterError, api.get_zappi_info, 10690095,
+                              myenergi.const.ZappiData.MODE)
+            self.assertRaises(myenergi.error.ParameterError, api.get_device, "Z17004596")
+            self.assertRaises(myenergi.error.ParameterError, api.get_device, 1)
+
+
+class TestStatusConversion(unittest.TestCase):
+
+    def test_fields_are_converted_by_type(self):
+        with offline_api() as api:
+            myzappi = api._devices.zappi[17004596]
+        self.assertEqual(myzappi.zmo, myenergi.ZappiMode.ECO_PLUS)
+        self.assertEqual(myzappi.pst, myenergi.const.ZappiStatus.B1)
+        self.assertEqual(myzappi.ectt1, myenergi.const.LoadTypes.INTERNAL)
+        self.assertEqual(myzappi.tim, myenergi.apiconstruct.time(10, 11, 35))
+        self.assertEqual(myzappi.vol, 244.8)
+        self.assertIn(myenergi.const.zappi, myenergi.apiconstruct._converters)
+
+    def test_records_use_slots(self):
+        with offline_api() as api:
+            myzappi = api.get_device(17004596)
+            history = api.get_zappi_history(17004596, myenergi.History.HOUR, "2021-03-25")
+        for record in (myzappi, history.history_data[0]):
+            self.assertFalse(hasattr(record, "__dict__"))
+        self.assertEqual(getattr(myzappi, myenergi.const.ZappiData.VOLTAGE.value), 244.8)
+        self.assertRaises(AttributeError, setattr, myzappi, "unknown", 1)
+
+    def test_dates_are_day_first(self):
+        with offline_api() as api:
+            myharvi = api._devices.harvi[10690095]
+        self.assertEqual(myharvi.timestamp, datetime(2021, 3, 26, 10, 11, 35))
+        self.assertEqual(myenergi.apiconstruct._to_date("07-11-2020"), myenergi.apiconstruct.date(2020, 11, 7))
+        self.assertEqual(myenergi.apiconstruct._to_date("2020-11-07"), myenergi.apiconstruct.date(2020, 11, 7))
+        self.assertEqual(myenergi.apiconstruct._to_date("7/11/2020"), myenergi.apiconstruct.date(2020, 11, 7))
+        self.assertEqual(myenergi.apiconstruct._to_time("9:05"), myenergi.apiconstruct.time(9, 5))
+
+    def test_refresh_updates_devices_in_place(self):
+        hub = FakeHub()
+        with offline_api(hub) as api:
+            myzappi = api.get_device(17004596)
+            boost_times = myzappi.boost_times
+            self.assertEqual(api.refresh_devices(), {})
+            hub.status[1]["zappi"][0].update({"vol": 2400, "zmo": 1, "tim": "10:12:00"})
+            self.assertEqual(api.refresh_devices(), {17004596: {"vol", "zmo", "tim", "timestamp"}})
+            self.assertIs(api.get_device(17004596), myzappi)
+            self.assertIs(myzappi.boost_times, boost_times)
+            self.assertEqual((myzappi.vol, myzappi.zmo), (240.0, myenergi.ZappiMode.FAST))
+            self.assertEqual(myzappi.timestamp, datetime(2021, 3, 26, 10, 12))
+            rebuilt = myenergi.const.zappi(**copy.deepcopy(hub.status[1]["zappi"][0]))
+            rebuilt.boost_times = boost_times
+            self.assertEqual(myzappi, rebuilt)
+            self.assertEqual(api.refresh_status(myenergi.MyenergiType.ZAPPI, 17004596, boost_times=False), set())
+
+
+class TestHistoryRange(unittest.TestCase):
+
+    def test_daily_total_includes_every_day(self):
+        with offline_api() as api:
+            history = api.get_zappi_daily_total(17004596, "2021-03-25", 4)
+            self.assertEqual([entry.timestamp.day for entry in history.history_data], [22, 23, 24, 25])
+
+    def test_range_retries_and_reports_failures(self):
+        hub = FakeHub(zappis=(1, 2))
+        hub.failures = {"cgi-jdayhour-Z1-2021-03-24": 1, "cgi-jdayhour-Z2-2021-03-23": 5}
+        with offline_api(hub, retry=myenergi.RetryPolicy(retries=2, backoff=0)) as api:
+            history = api.get_zappi_history_range([1, 2], "2021-03-22", "2021-03-25")
+            # Each day is only retried by the retry policy of the client
+            self.assertEqual(hub.calls.count(f"https://{ASN}/cgi-jdayhour-Z2-2021-03-23"), 3)
+            self.assertEqual(list(history.history[1]), ["2021-03-22", "2021-03-23", "2021-03-24", "2021-03-25"])
+            self.assertEqual(list(history.history[2]), ["2021-03-22", "2021-03-24", "2021-03-25"])
+            self.assertEqual(list(history.failures), [2])
+            self.assertIn("2021-03-23", history.failures[2])
+
+
+class TestStreamingHistory(unittest.TestCase):
+
+    def test_parser_returns_every_element_whatever_the_chunking(self):
+        document = json.dumps({"U1": [{"imp": 1.5, "name": "caf\u00e9"}, 22, "x", [3]]}, ensure_ascii=False).encode()
+        for size in range(1, len(document) + 1):
+            parser = myenergi.stream.ArrayParser("U1")
+            items = [item for start in range(0, len(document), size)
+                     for item in parser.feed(document[start:start + size])]
+            parser.close()
+            self.assertEqual(items, [{"imp": 1.5, "name": "caf\u00e9"}, 22, "x", [3]])
+        parser = myenergi.stream.ArrayParser("U1")
+        parser.feed(b'{"status": -14}')
+        parser.close()
+        self.assertEqual(parser.document, {"status": -14})
+        parser = myenergi.stream.ArrayParser("U1")
+        parser.feed(b'{"U1": [{"imp": 1}, {"imp"')
+        self.assertRaises(ValueError, parser.close)
+
+    def test_parser_checks_the_array_key(self):
+        parser = myenergi.stream.ArrayParser("U1")
+        self.assertEqual(parser.feed(b' {\n "U1" : [] }'), [])
+        parser.close()
+        self.assertIsNone(parser.document)
+        for document in (b'{"note": "[1, 2]", "U1": [{"imp": 1}]}', b'{"U2": [{"imp": 1}]}', b'[{"imp": 1}]'):
+            parser = myenergi.stream.ArrayParser("U1")
+            self.assertEqual(parser.feed(document), [])
+            self.assertRaises(myenergi.error.ParseError, parser.close)
+
+    def test_streamed_history_matches_downloaded_history(self):
+        with offline_api() as api:
+            history = api.get_zappi_history(17004596, myenergi.History.MINUTE, "2021-03-25", local_time=True)
+            streamed = api.stream_zappi_history(17004596, myenergi.History.MINUTE, "2021-03-25", local_time=True)
+            self.assertEqual(list(streamed), history.history_data)
+            self.assertRaises(myenergi.error.ParameterError, api.stream_zappi_history, 1, myenergi.History.HOUR,
+                              "2021-03-25")
+
+    def test_history_iterator_pages_through_days_and_prefetches(self):
+        hub = FakeHub()
+        with offline_api(hub) as api:
+            days = ["2021-03-23", "2021-03-24", "2021-03-25"]
+            expected = [entry for day in days
+                        for entry in api.get_zappi_history(17004596, myenergi.History.HOUR, day).history_data]
+            hub.calls.clear()
+            rows = api.iter_zappi_history(17004596, myenergi.History.HOUR, days[0], days[-1])
+            self.assertEqual(next(rows), expected[0])
+            for _ in range(100):
+                if len(hub.calls) == 2:
+                    break
+                time.sleep(0.01)
+            self.assertEqual(hub.calls, [f"https://{ASN}/cgi-jdayhour-Z17004596-{day}" for day in days[:2]])
+            self.assertEqual([expected[0], *rows], expected)
+
+
+class TestRequestResilience(unittest.TestCase):
+
+    def test_status_retried_after_server_errors(self):
+        hub = FakeHub()
+        with offline_api(hub, retry=myenergi.RetryPolicy(backoff=0)) as api:
+            hub.failures = {"cgi-jstatus-*": 2, "cgi-zappi-mode-Z17004596-0-2-0-0000": 1}
+            api.refresh_devices()
+            with self.assertRaises(myenergi.error.HTTPError):
+                api.set_zappi_boost(17004596, "STOP")
+            stats = api.stats.snapshot()
+        self.assertEqual((stats["retries"], stats["failures"]), (2, 3))
+
+    def test_circuit_opens_after_repeated_failures(self):
+        hub = FakeHub()
+        with offline_api(hub, retry=myenergi.RetryPolicy(retries=0)) as api:
+            hub.failures = {"cgi-jstatus-*": 5}
+            for _ in range(5):
+                with self.assertRaises(myenergi.error.HTTPError):
+                    api.refresh_devices()
+            calls = len(hub.calls)
+            with self.assertRaises(myenergi.error.CircuitOpenError):
+                api.refresh_devices()
+            self.assertEqual(len(hub.calls), calls)
+            api._breaker(api._url).opened -= 30
+            api.refresh_devices()
+            self.assertEqual(api.stats.snapshot()["rejected"], 1)
+
+
+class TestDigestAuth(unittest.TestCase):
+
+    def setUp(self):
+        self.hub = FakeHub(zappis=(1, 2))
+        self.adapter = DigestAdapter(self.hub)
+        patcher = mock.patch("myenergi.api.requests.adapters.HTTPAdapter", return_value=self.adapter)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def test_each_server_is_challenged_once(self):
+        with myenergi.API("12345678", "password") as api:
+            for _ in range(3):
+                api.refresh_devices()
+            api.get_zappi_history_range([1, 2], "2021-03-20", "2021-03-27", workers=4)
+            self.assertEqual(self.adapter.challenges, 2)
+            self.assertEqual(api.stats.snapshot()["challenges"], 2)
+
+    def test_nonce_count_keeps_increasing_across_threads(self):
+        with myenergi.API("12345678", "password", eager=False) as api:
+            api.get_zappi_history_range([1, 2], "2021-03-01", "2021-03-28", workers=8)
+        counts = self.adapter.nonce_counts[ASN]
+        self.assertEqual(sorted(counts), list(range(1, len(counts) + 1)))
+
+
+class TestMetrics(unittest.TestCase):
+
+    def test_requests_and_builds_are_recorded_per_endpoint(self):
+        exported = []
+        metrics = myenergi.Metrics(exporters=[exported.append])
+        with offline_api(metrics=metrics) as api:
+            api.refresh_devices()
+            api.get_zappi_history(17004596, myenergi.History.HOUR, "2021-03-25")
+        snapshot = metrics.export()
+        self.assertEqual(exported, [snapshot])
+        self.assertEqual(snapshot["DEVICES"]["calls"], 2)
+        self.assertEqual(snapshot["DEVICES"]["builds"], 2)
+        self.assertGreater(snapshot["DEVICES"]["bytes"], 0)
+        self.assertEqual(snapshot["ZAPPI_HISTORY_HOUR"]["calls"], 1)
+        self.assertEqual(snapshot["ZAPPI_HISTORY_HOUR"]["builds"], 1)
+        self.assertEqual(snapshot["ZAPPI_BOOST_TIME"]["calls"], 1)
+
+    def test_errors_are_counted_against_the_endpoint(self):
+        hub = FakeHub()
+        metrics = myenergi.Metrics()
+        with offline_api(hub, metrics=metrics, retry=myenergi.RetryPolicy(retries=0, busy_retries=0)) as api:
+            hub.failures = {"cgi-jstatus-*": 1}
+            hub.busy = {"cgi-zappi-mode-Z17004596-0-2-0-0000": 1}
+            with self.assertRaises(myenergi.error.HTTPError):
+                api.refresh_devices()
+            with self.assertRaises(myenergi.error.ResponseError):
+                api.set_zappi_boost(17004596, "STOP")
+        snapshot = metrics.snapshot()
+        self.assertEqual(snapshot["DEVICES"]["errors"], 1)
+        self.assertEqual(snapshot["ZAPPI_MODE"], {**snapshot["ZAPPI_MODE"], "calls": 1, "errors": 1})
+
+
+class TestPayloadLogging(unittest.TestCase):
+
+    def test_payload_only_formatted_when_debug_enabled(self):
+        with offline_api() as api:
+            api.logger.setLevel("INFO")
+            self.addCleanup(api.logger.setLevel, "NOTSET")
+            # The fake hub encodes its responses with json.dumps too
+            with mock.patch("myenergi.api.json.dumps", wraps=json.dumps) as dumps:
+                api.refresh_devices()
+            self.assertFalse([call for call in dumps.call_args_list if "indent" in call.kwargs])
+
+    def test_payload_truncated_to_limit(self):
+        with offline_api() as api:
+            api.payload_log_limit = 50
+            with self.assertLogs("myenergi.api", "DEBUG") as logs:
+                api.get_zappi_history(17004596, myenergi.History.MINUTE, "2021-03-25")
+        payload = next(line for line in logs.output if "Formatted API results" in line)
+        self.assertLess(len(payload), 150)
+        self.assertTrue(payload.endswith("... (truncated at 50 characters)"))
+
+    def test_payload_formatting_stops_at_limit(self):
+        data = load_example("zappihistory.json")
+        encoded = []
+        iterencode = json.JSONEncoder.iterencode
+
+        def counting_iterencode(encoder, o):
+            for chunk in iterencode(encoder, o):
+                encoded.append(chunk)
+                yield chunk
+
+        with offline_api() as api:
+            api.payload_log_limit = 50
+            with mock.patch.object(json.JSONEncoder, "iterencode", counting_iterencode):
+                with self.assertLogs("myenergi.api", "DEBUG") as logs:
+                    api._log_payload(data)
+        self.assertTrue(logs.output[0].endswith("... (truncated at 50 characters)"))
+        self.assertLess(sum(len(chunk) for chunk in encoded), 100)
+
+
+class TestBenchmarks(unittest.TestCase):
+
+    def test_every_api_benchmark_runs_offline(self):
+        import benchmarks.bench_api
+        from tests.fakehub import offline_sessions
+        with offline_api() as api, offline_sessions():
+            for name, function, number in benchmarks.bench_api.benchmarks(api):
+                with self.subTest(name):
+                    function()
+
+
+class TestFakeServer(unittest.TestCase):
+
+    def test_client_works_end_to_end(self):
+        from tests.fakeserver import FakeServer
+        with FakeServer(zappis=3, eddis=1) as server:
+            with myenergi.API(server.serial, server.password, director_url=server.url) as api:
+                api._confirmations = myenergi.confirm.ConfirmationEngine(api, initial_delay=0.01)
+                self.assertEqual(list(api.get_zappi_serials()), [16000001, 16000002, 16000003])
+                api.set_zappi_mode(16000002, "FAST")
+                history = api.get_zappi_history_range(api.get_zappi_serials(), "2024-03-01", "2024-03-03")
+                self.assertEqual(api.stats.snapshot()["challenges"], 1)
+            self.assertEqual(server.devices["zappi"][16000002]["zmo"], myenergi.ZappiMode.FAST.value)
+        days = history.history[16000001]
+        self.assertEqual(list(days), ["2024-03-01", "2024-03-02", "2024-03-03"])
+        self.assertEqual(days["2024-03-02"].history_data[0].timestamp.day, 2)
+        self.assertNotEqual(days["2024-03-01"].history_data[10].imp, history.history[16000002]["2024-03-01"]
+                            .history_data[10].imp)
+
+    def test_eddi_history_uses_the_eddi_endpoints(self):
+        from tests.fakeserver import FakeServer
+        with FakeServer(zappis=1, eddis=2) as server:
+            with myenergi.API(server.serial, server.password, director_url=server.url) as api:
+                history = api.get_eddi_history_range([21000001, 21000002], "2024-03-01", "2024-03-02")
+                frame = api.get_eddi_history_frame(21000001, myenergi.History.HOUR, "2024-03-01", "2024-03-02")
+        day = history.history[21000001]["2024-03-02"].history_data
+        self.assertEqual(list(history.history[21000002]), ["2024-03-01", "2024-03-02"])
+        self.assertIsInstance(day[0], myenergi.const.eddi_hourly_data)
+        self.assertGreater(sum(data.h1d for data in day), sum(data.h2d for data in day))
+        self.assertEqual(frame.device, myenergi.MyenergiType.EDDI)
+        totals = frame.rollup(myenergi.Rollup.DAY, [myenergi.EddiStats.HEATER2_DIVERTED])
+        self.assertAlmostEqual(totals.h2d[1], sum(data.h2d for data in day), places=1)
+
+    def test_injected_errors_are_retried(self):
+        from tests.fakeserver import FakeServer
+        with FakeServer(zappis=2, error_rate=0.3, seed=1) as server:
+            with myenergi.API(server.serial, server.password, director_url=server.url,
+                              retry=myenergi.RetryPolicy(retries=10, backoff=0.001)) as api:
+                for _ in range(10):
+                    api.refresh_devices()
+                stats = api.stats.snapshot()
+        self.assertGreater(stats["retries"], 0)
+        self.assertEqual(stats["failures"], stats["retries"])
+
+
+class TestHistoryCache(unittest.TestCase):
+
+    def test_completed_days_are_read_from_the_cache(self):
+        hub = FakeHub()
+        with offline_api(hub, cache=myenergi.HistoryCache(":memory:")) as api:
+            first = api.get_zappi_history(17004596, myenergi.History.HOUR, "2021-03-25")
+            calls = len(hub.calls)
+            self.assertEqual(api.get_zappi_history(17004596, myenergi.History.HOUR, "2021-03-25"), first)
+            self.assertEqual(len(hub.calls), calls)
+
+    def test_current_day_expires(self):
+        today = datetime.now(timezone.utc).strftime("%Y-%m-%d")
+        with myenergi.HistoryCache(":memory:", ttl=0) as cache:
+            cache.put(1, "ZAPPI_HISTORY_HOUR", today, {"U1": []})
+            cache.put(1, "ZAPPI_HISTORY_HOUR", "2021-03-25", {"U1": []})
+            self.assertIsNone(cache.get(1, "ZAPPI_HISTORY_HOUR", today))
+            self.assertEqual(cache.get(1, "ZAPPI_HISTORY_HOUR", "2021-03-25"), {"U1": []})
+
+
+class TestASNCache(unittest.TestCase):
+
+    def setUp(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.path = os.path.join(directory.name, "asn.json")
+
+    def test_director_only_called_when_not_cached(self):
+        for expected in (1, 0):
+            hub = FakeHub()
+            with offline_api(hub, asn_cache=myenergi.ASNCache(self.path)) as api:
+                self.assertEqual(list(api.get_zappi_serials()), [17004596])
+            self.assertEqual(hub.calls.count(myenergi.const.MyEnergiEndpoint.DIRECTOR_URL.value), expected)
+
+    def test_unreachable_cached_server_is_resolved_again(self):
+        cache = myenergi.ASNCache(self.path)
+        cache.put("12345678", "s1.myenergi.net")
+        hub = FakeHub()
+        with offline_api(hub, asn_cache=cache) as api:
+            self.assertEqual(api._url, f"https://{ASN}/")
+        self.assertEqual(hub.calls[0], myenergi.const.MyEnergiEndpoint.DIRECTOR_URL.value)
+        self.assertEqual(myenergi.ASNCache(self.path).get("12345678"), ASN)
+        self.assertIsNone(myenergi.ASNCache(self.path, ttl=0).get("12345678"))
+
+
+class TestLazyAPI(unittest.TestCase):
+
+    def test_no_requests_until_needed_with_cached_server(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        cache = myenergi.ASNCache(os.path.join(directory.name, "asn.json"))
+        cache.put("12345678", ASN)
+        hub = FakeHub()
+        with offline_api(hub, asn_cache=cache, eager=False) as api:
+            self.assertEqual(hub.calls, [])
+            api.get_zappi_history(17004596, myenergi.History.HOUR, "2021-03-25")
+            self.assertEqual([call.removeprefix(f"https://{ASN}/") for call in hub.calls],
+                             ["cgi-jstatus-*", "cgi-jdayhour-Z17004596-2021-03-25"])
+
+    def test_boost_times_fetched_once_on_first_access(self):
+        hub = FakeHub()
+        with offline_api(hub, eager=False) as api:
+            self.assertEqual(len(hub.calls), 1)
+            for _ in range(2):
+                self.assertEqual(len(api.get_zappi_info(17004596, myenergi.const.ZappiData.BOOST_TIMES)), 1)
+        self.assertEqual([call.removeprefix(f"https://{ASN}/") for call in hub.calls[1:]],
+                         ["cgi-jstatus-*", "cgi-boost-time-Z17004596"])
+
+
+class TestHistoryFrame(unittest.TestCase):
+
+    def test_hourly_frame_matches_hourly_data(self):
+        with offline_api() as api:
+            history = api.get_zappi_history(17004596, myenergi.History.HOUR, "2021-03-25")
+            frame = api.get_zappi_history_frame(17004596, myenergi.History.HOUR, "2021-03-25")
+        self.assertEqual(len(frame), len(history.history_data))
+        for index, entry in enumerate(history.history_data):
+            self.assertEqual(frame.datetimes[index].item(), entry.timestamp)
+            for stat in myenergi.ZappiStats:
+                self.assertEqual(round(float(frame[stat.value][index]), 2), getattr(entry, stat.value))
+
+    def test_minute_frame_over_several_days(self):
+        with offline_api() as api:
+            frame = api.get_zappi_history_frame(17004596, myenergi.History.MINUTE, "2021-03-24", "2021-03-25")
+        records = next(iter(load_example("zappihistory.json").values()))
+        self.assertEqual(len(frame), 2 * len(records))
+        self.assertEqual(frame.datetimes[0].item(), datetime(2021, 3, 25, 0, 15))
+        self.assertAlmostEqual(frame.v1[0], 247.8)
+        self.assertAlmostEqual(frame.hog[0], (29520 - 660) / 60 / 1000)
+
+    def test_rollups_total_each_period(self):
+        with offline_api() as api:
+            frame = api.get_zappi_history_frame(17004596, myenergi.History.MINUTE, "2021-03-25")
+            tz = api.get_zappi_timezone(17004596)
+        hours = frame.rollup(myenergi.Rollup.HOUR, [myenergi.ZappiStats.GRID_IMPORTED, "exp"])
+        self.assertEqual(list(hours.columns), ["imp", "exp"])
+        self.assertEqual(hours.datetimes[1].item(), datetime(2021, 3, 25, 1))
+        expected = round(math.fsum(float(imp) for imp, hour in zip(frame.imp, frame.datetimes)
+                                   if hour.item().hour == 1), 3)
+        self.assertEqual(hours.imp[1], expected)
+        for period, start in ((myenergi.Rollup.WEEK, datetime(2021, 3, 22)),
+                              (myenergi.Rollup.MONTH, datetime(2021, 3, 1))):
+            total = frame.rollup(period, decimals=None)
+            self.assertEqual(total.datetimes.tolist(), [start])
+            self.assertAlmostEqual(total.imp[0], frame.imp.sum())
+        # The example zappi is in UTC+1 so the history after 23:00 UTC is on the next local day
+        days = frame.rollup(myenergi.Rollup.DAY, tz=tz)
+        self.assertEqual(days.datetimes.tolist(), [datetime(2021, 3, 24, 23), datetime(2021, 3, 25, 23)])
+        self.assertEqual(days.period, myenergi.Rollup.DAY)
+
+
+class TestMonitor(unittest.TestCase):
+
+    def test_poll_reports_only_changed_fields(self):
+        hub = FakeHub()
+        with offline_api(hub) as api:
+            monitor = myenergi.Monitor(api)
+            received = []
+            monitor.subscribe(received.extend, myenergi.MyenergiType.ZAPPI)
+            self.assertEqual(monitor.poll(), [])
+            hub.status[1]["zappi"][0].update({"sta": 3, "pst": "C2", "tim": "10:12:00"})
+            changes = monitor.poll()
+        self.assertEqual(received, changes)
+        self.assertEqual(len(changes), 1)
+        self.assertEqual(changes[0].serial, 17004596)
+        self.assertEqual(set(changes[0].changes), {"sta", "pst"})
+        self.assertEqual(changes[0].changes["sta"][1], myenergi.const.ZappiState.Charging)
+        self.assertEqual(monitor.next_interval, monitor.min_interval)
+
+    def test_poll_uses_change_sets_from_refresh(self):
+        hub = FakeHub()
+        with offline_api(hub) as api:
+            monitor = myenergi.Monitor(api)
+            hub.status[1]["zappi"][0].update({"sta": 3, "tim": "10:12:00"})
+            with mock.patch.object(monitor, "_take_snapshot", side_effect=AssertionError):
+                changes = monitor.poll()
+        self.assertEqual([(change.serial, set(change.changes)) for change in changes], [(17004596, {"sta"})])
+
+    def test_poll_reports_refresh_made_outside_monitor(self):
+        hub = FakeHub()
+        with offline_api(hub) as api:
+            monitor = myenergi.Monitor(api)
+            hub.status[1]["zappi"][0].update({"sta": 3, "pst": "C2"})
+            api.refresh_devices()
+            changes = monitor.poll()
+            self.assertEqual(monitor.poll(), [])
+        self.assertEqual(len(changes), 1)
+        self.assertEqual(set(changes[0].changes), {"sta", "pst"})
+
+    def test_poll_reports_refresh_made_during_poll(self):
+        hub = FakeHub()
+        with offline_api(hub) as api:
+            monitor = myenergi.Monitor(api)
+            hub.status[1]["zappi"][0].update({"sta": 3})
+            request = api._api_request
+
+            def refresh_first(url, **kwargs):
+                # Another thread applies the change while the monitor is waiting for its own query
+                if "jstatus-*" in url:
+                    api.refresh_status(myenergi.MyenergiType.ZAPPI, 17004596, boost_times=False)
+                return request(url, **kwargs)
+
+            with mock.patch.object(api, "_api_request", side_effect=refresh_first):
+                changes = monitor.poll()
+        self.assertEqual([set(change.changes) for change in changes], [{"sta"}])
+
+    def test_interval_backs_off_when_nothing_changes(self):
+        with offline_api() as api:
+            monitor = myenergi.Monitor(api, interval=60, min_interval=10, max_interval=200, backoff=2)
+            intervals = []
+            for _ in range(3):
+                monitor.poll()
+                intervals.append(monitor.next_interval)
+        self.assertEqual(intervals, [120, 200, 200])
+
+
+class TestConfirmation(unittest.TestCase):
+
+    def test_modes_confirmed_in_parallel_with_status_polls(self):
+        hub = FakeHub(zappis=(1, 2, 3))
+        with offline_api(hub) as api:
+            api._confirmations = myenergi.confirm.ConfirmationEngine(api, initial_delay=0.05, max_delay=0.05)
+            hub.calls.clear()
+            started = time.monotonic()
+            futures = [api.set_zappi_mode(serial, "STOP", wait=False) for serial in (1, 2, 3)]
+            for future in futures:
+                future.result()
+            elapsed = time.monotonic() - started
+            self.assertEqual([api.get_zappi_info(serial, myenergi.const.ZappiData.MODE) for serial in (1, 2, 3)],
+                             [myenergi.ZappiMode.STOP] * 3)
+            self.assertTrue(api.get_zappi_info(1, myenergi.const.ZappiData.BOOST_TIMES))
+        self.assertLess(elapsed, 0.15)
+        polls = [call for call in hub.calls if "jstatus" in call or "boost-time" in call]
+        self.assertEqual(sorted(polls), [f"https://{ASN}/cgi-jstatus-Z{serial}" for serial in (1, 2, 3)])
+
+    def test_minimum_green_limit_times_out(self):
+        hub = FakeHub()
+        hub.apply_commands = False
+        with offline_api(hub) as api:
+            api._confirmations = myenergi.confirm.ConfirmationEngine(api, initial_delay=0.01, max_delay=0.02)
+            with self.assertRaises(myenergi.error.TimeoutError):
+                api.set_zappi_minimum_green_limit(17004596, 55, timeout=0.1)
+
+    def test_engine_created_once_across_threads(self):
+        with offline_api(confirm_workers=12) as api:
+            with ThreadPoolExecutor(max_workers=8) as executor:
+                engines = set(map(id, executor.map(lambda _: api.confirmations, range(32))))
+            self.assertEqual(len(engines), 1)
+            self.assertEqual(api.confirmations._executor._max_workers, 12)
+
+    def test_zero_timeout_is_not_the_default(self):
+        with offline_api() as api:
+            engine = myenergi.confirm.ConfirmationEngine(api, timeout=60)
+            with self.assertRaises(myenergi.error.TimeoutError):
+                engine.confirm(17004596, myenergi.const.ZappiData.MODE, myenergi.ZappiMode.STOP, timeout=0)
+            engine.close()
+
+
+class TestApplyCommands(unittest.TestCase):
+
+    def test_commands_for_each_device_in_order_with_busy_retry(self):
+        hub = FakeHub(zappis=(1, 2))
+        hub.busy["cgi-zappi-mode-Z2-1-0-0-0000"] = 1
+        commands = [myenergi.const.zappi_mode_command(1, "STOP"),
+                    myenergi.const.zappi_mode_command(2, "FAST"),
+                    myenergi.const.zappi_boost_command(1, "START", 5),
+                    myenergi.const.zappi_min_green_command(2, 50)]
+        with offline_api(hub, retry=myenergi.RetryPolicy(busy_delay=0.01)) as api:
+            api._confirmations = myenergi.confirm.ConfirmationEngine(api, initial_delay=0.01, max_delay=0.01)
+            hub.calls.clear()
+            results = api.apply(commands)
+            self.assertEqual(api.get_zappi_info(2, myenergi.const.ZappiData.MINIMUM_GREEN_LIMIT), 50)
+        self.assertEqual([result.command for result in results], commands)
+        self.assertTrue(all(result.succeeded for result in results))
+        sent = [call.removeprefix(f"https://{ASN}/") for call in hub.calls if "jstatus" not in call]
+        self.assertEqual([call for call in sent if "Z1" in call], ["cgi-zappi-mode-Z1-4-0-0-0000",
+                                                                   "cgi-zappi-mode-Z1-0-10-5-0000"])
+        self.assertEqual([call for call in sent if "Z2" in call], ["cgi-zappi-mode-Z2-1-0-0-0000"] * 2 +
+                         ["cgi-set-min-green-Z2-50"])
+
+    def test_failures_are_returned_per_command(self):
+        hub = FakeHub()
+        hub.busy["cgi-zappi-mode-Z17004596-0-2-0-0000"] = 5
+        commands = [myenergi.const.zappi_boost_command(17004596, "STOP"), myenergi.const.eddi_boost_command(999, 1, 10)]
+        with offline_api(hub, retry=myenergi.RetryPolicy(busy_retries=1, busy_delay=0.01)) as api:
+            results = api.apply(commands)
+        # The busy command is only retried by the retry policy of the client
+        self.assertEqual(hub.calls.count(f"https://{ASN}/cgi-zappi-mode-Z17004596-0-2-0-0000"), 2)
+        self.assertEqual(results[0].error.status,
+                         myenergi.const.MyEnergiResponse.BusyServerAlreadySendingCommandToDevice)
+        self.assertIsInstance(results[1].error, myenergi.error.ParameterError)
+
+    def test_boost_start_without_kwh_is_rejected(self):
+        hub = FakeHub()
+        with offline_api(hub) as api:
+            hub.calls.clear()
+            results = api.apply([myenergi.const.zappi_boost_command(17004596, "START", 0)])
+        self.assertIsInstance(results[0].error, myenergi.error.ParameterError)
+        self.assertEqual(hub.calls, [])
+
+
+class TestAsyncAPI(unittest.TestCase):
+
+    def run_async(self, hub: FakeHub, coroutine, delay: float = 0.01):
+        """Run a coroutine against an AsyncAPI whose requests are answered by a FakeHub."""
+        import httpx
+        inflight = {"now": 0, "max": 0}
+
+        async def handler(request):
+            inflight["now"] += 1
+            inflight["max"] = max(inflight["max"], inflight["now"])
+            await asyncio.sleep(delay)
+            inflight["now"] -= 1
+            status, headers, content = hub.respond(str(request.url))
+            return httpx.Response(status, headers=headers, content=content)
+
+        async def main():
+            api = myenergi.AsyncAPI("12345678", "password", concurrency=3)
+            api._client = httpx.AsyncClient(transport=httpx.MockTransport(handler))
+            async with api:
+                return await coroutine(api)
+
+        return asyncio.run(main()), inflight["max"]
+
+    def test_boost_times_fetched_concurrently(self):
+        hub = FakeHub(zappis=(1, 2, 3, 4, 5))
+
+        async def serials(api):
+            return list(api.get_zappi_serials())
+
+        result, concurrency = self.run_async(hub, serials)
+        self.assertEqual(result, [1, 2, 3, 4, 5])
+        self.assertEqual(concurrency, 3)
+
+    def test_daily_total_matches_blocking_client(self):
+        hub = FakeHub()
+
+        async def daily(api):
+            return await api.get_zappi_daily_total(17004596, "2021-03-25", 4)
+
+        result, _ = self.run_async(hub, daily)
+        with offline_api(FakeHub()) as api:
+            self.assertEqual(result, api.get_zappi_daily_total(17004596, "2021-03-25", 4))
+
+    def test_streamed_history_matches_blocking_client(self):
+        async def stream(api):
+            return [entry async for entry in api.stream_zappi_history(17004596, myenergi.History.HOUR, "2021-03-25")]
+
+        result, _ = self.run_async(FakeHub(), stream)
+        with offline_api(FakeHub()) as api:
+            self.assertEqual(result, api.get_zappi_history(17004596, myenergi.History.HOUR, "2021-03-25").history_data)
+
+    def test_streamed_bodies_count_against_concurrency(self):
+        import httpx
+        hub = FakeHub(zappis=(1, 2, 3, 4, 5))
+        bodies = {"open": 0, "max": 0}
+
+        class Body(httpx.AsyncByteStream):
+            def __init__(self, content):
+                self.content = content
+                bodies["open"] += 1
+                bodies["max"] = max(bodies["max"], bodies["open"])
+
+            async def __aiter__(self):
+                for start in range(0, len(self.content), 256):
+                    await asyncio.sleep(0.001)
+                    yield self.content[start:start + 256]
+
+            async def aclose(self):
+                bodies["open"] -= 1
+
+        async def handler(request):
+            status, headers, content = hub.respond(str(request.url))
+            return httpx.Response(status, headers=headers, stream=Body(content))
+
+        async def read(api, serial):
+            return [entry async for entry in api.stream_zappi_history(serial, myenergi.History.HOUR, "2021-03-25")]
+
+        async def main():
+            api = myenergi.AsyncAPI("12345678", "password", concurrency=3)
+            api._client = httpx.AsyncClient(transport=httpx.MockTransport(handler))
+            async with api:
+                return await asyncio.gather(*(read(api, serial) for serial in (1, 2, 3, 4, 5)))
+
+        results = asyncio.run(main())
+        self.assertEqual([len(entries) for entries in results], [24] * 5)
+        self.assertEqual(bodies["max"], 3)
+        self.assertEqual(bodies["open"], 0)
+
+    def test_history_iterator_matches_blocking_client(self):
+        async def rows(api):
+            return [entry async for entry in api.iter_zappi_history(17004596, myenergi.History.HOUR, "2021-03-24",
+                                                                    "2021-03-25")]
+
+        result, _ = self.run_async(FakeHub(), rows)
+        with offline_api(FakeHub()) as api:
+            self.assertEqual(result, list(api.iter_zappi_history(17004596, myenergi.History.HOUR, "2021-03-24",
+                                                                 "2021-03-25")))
+        self.assertEqual(len(result), 48)
+
+
 if __name__ == "__main__":
     unittest.main()